@@ -0,0 +1,119 @@
+"""
+Benchmark of the Multiword Expression merging in CorpusPreprocessor.n_gram_inclusion().
+
+The compiled MultiwordExpressionMatcher is compared with the former implementation, which searched every bigram in the
+list of all expressions. Both implementations are run on synthetic documents that are drawn from the tokens of the
+expressions in data_preprocessing/MWE.json plus filler tokens. The script has to be run from the root directory of the
+project:
+
+    python benchmarks/benchmark_n_gram_inclusion.py
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from multiword_expressions import MultiwordExpressionMatcher
+
+
+def legacy_n_gram_inclusion(tokens: list, mutliword_expressions: list, MWE_reversed: dict) -> list:
+    """
+    The former implementation of n_gram_inclusion() for a single document.
+
+    Args:
+        tokens: The tokenized document.
+        mutliword_expressions: The list of all expressions.
+        MWE_reversed: The mapping from the string representation of an expression to the merged token.
+
+    Returns:
+        The tokenized document with merged bigrams.
+    """
+    new_doc = []
+    skipped = False
+    for i, token in enumerate(tokens):
+        if skipped:
+            skipped = False
+            continue
+        if i < len(tokens) - 1:
+            bigram = [token, tokens[i + 1]]
+            if bigram in mutliword_expressions:
+                new_doc.append(MWE_reversed[str(bigram)])
+                skipped = True
+            else:
+                new_doc.append(token)
+        else:
+            new_doc.append(token)
+
+    return new_doc
+
+
+def generate_documents(MWE: dict, n_documents: int, document_length: int, seed: int = 42) -> list:
+    """
+    Generates tokenized documents in which roughly every tenth token starts a Multiword Expression.
+
+    Args:
+        MWE: The Multiword Expressions.
+        n_documents: The number of documents.
+        document_length: The number of tokens per document.
+        seed: The seed of the random generator.
+
+    Returns:
+        The list of tokenized documents.
+    """
+    rng = random.Random(seed)
+    expressions = list(MWE.values())
+    vocabulary = sorted({token for entry in expressions for token in entry}) + [f"filler{i}" for i in range(5000)]
+
+    documents = []
+    for _ in range(n_documents):
+        tokens = []
+        while len(tokens) < document_length:
+            if rng.random() < 0.1:
+                tokens.extend(rng.choice(expressions))
+            else:
+                tokens.append(rng.choice(vocabulary))
+        documents.append(tokens[:document_length])
+
+    return documents
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mwe", default="data_preprocessing/MWE.json")
+    parser.add_argument("--mwe-reversed", default="data_preprocessing/MWE_reversed.json")
+    parser.add_argument("--documents", type=int, default=50)
+    parser.add_argument("--length", type=int, default=2000)
+    args = parser.parse_args()
+
+    with open(args.mwe, 'r', encoding='utf-8') as json_file:
+        MWE = json.load(json_file)
+    with open(args.mwe_reversed, 'r', encoding='utf-8') as json_file:
+        MWE_reversed = json.load(json_file)
+
+    documents = generate_documents(MWE, args.documents, args.length)
+    n_tokens = sum(len(doc) for doc in documents)
+
+    start = time.perf_counter()
+    mutliword_expressions = list(MWE.values())
+    legacy_result = [legacy_n_gram_inclusion(doc, mutliword_expressions, MWE_reversed) for doc in documents]
+    legacy_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    matcher = MultiwordExpressionMatcher.from_files(args.mwe, args.mwe_reversed)
+    matcher_result = [matcher.merge(doc) for doc in documents]
+    matcher_time = time.perf_counter() - start
+
+    print(f"{len(MWE)} Multiword Expressions (longest: {matcher.max_length} tokens), "
+          f"{len(documents)} documents with {n_tokens} tokens")
+    print(f"legacy list scan:    {legacy_time:8.3f}s ({n_tokens / legacy_time:12.0f} tokens/sec)")
+    print(f"compiled trie:       {matcher_time:8.3f}s ({n_tokens / matcher_time:12.0f} tokens/sec)")
+    print(f"speedup:             {legacy_time / matcher_time:8.1f}x")
+
+    # Both implementations agree, as long as the expressions are bigrams only.
+    if matcher.max_length <= 2:
+        print(f"identical results:   {legacy_result == matcher_result}")
@@ -0,0 +1,517 @@
+"""
+Benchmark suite of the corpus pipeline.
+
+Every public method of CorpusManager, CorpusPreprocessor and CorpusAnalyzer and one training pass of the LDA model are
+benchmarked on a synthetic PolX corpus (see synthetic_corpus.py). The corpus, the language resources and all outputs
+are written to a temporary working directory, so the suite runs offline and does not touch the data of the project. By
+default, the lemmatization uses a stub spacy model, which tokenizes with spacy's German rules and uses every token as
+its own lemma; pass --spacy-model de_core_news_lg to benchmark the real model.
+
+Every benchmark is repeated and the median wall time, the CPU time, the peak memory and the throughput are reported
+(see instrumentation.py). The results can be saved as baseline and later runs can be compared with it. A benchmark is
+reported as regression if its median wall time exceeds the baseline by more than the threshold; in this case the
+script exits with status 1. Baselines are only comparable on the same machine and with the same configuration.
+
+    python benchmarks/run_benchmarks.py --save-baseline
+    python benchmarks/run_benchmarks.py --compare
+    python benchmarks/run_benchmarks.py --documents 100000 --only "clean|n_gram_inclusion"
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import re
+import shutil
+import statistics
+import sys
+import tempfile
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import spacy
+from spacy.language import Language
+from gensim.models import LdaModel
+from corpus_analyzer import CorpusAnalyzer
+from corpus_manager import CorpusManager
+from corpus_preprocessor import CorpusPreprocessor
+from instrumentation import instrumentation
+import lda
+from synthetic_corpus import german_vocabulary, multiword_expressions, generate_documents, write_xml, write_json, \
+    write_language_resources
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+
+@Language.component("benchmark_stub_lemmatizer")
+def benchmark_stub_lemmatizer(doc):
+    """
+    The lemmatizer of the stub spacy model. Every token is its own lemma.
+    """
+    for token in doc:
+        token.lemma_ = token.text
+    return doc
+
+
+def stub_german_model() -> spacy.language.Language:
+    """
+    Creates a German spacy pipeline that does not need to be downloaded. It consists of spacy's German tokenizer and a
+    stub lemmatizer.
+
+    Returns:
+        The stub model.
+    """
+    german_model = spacy.blank("de")
+    german_model.add_pipe("benchmark_stub_lemmatizer")
+    german_model.meta["name"] = "benchmark_stub"
+    return german_model
+
+
+def copy_corpus(corpus: dict) -> dict:
+    """
+    Copies a corpus for a benchmark that modifies it. The methods of the pipeline replace the fields of a document
+    instead of changing them in place, hence copying the dictionaries of the documents suffices.
+
+    Args:
+        corpus: The corpus.
+
+    Returns:
+        The copy.
+    """
+    return {key: dict(doc_data) for key, doc_data in corpus.items()}
+
+
+def count_tokens(corpus: dict) -> int:
+    """
+    Counts the tokens of a corpus, i.e. the tokens of the processed texts or the words of the full texts.
+
+    Args:
+        corpus: The corpus.
+
+    Returns:
+        The number of tokens.
+    """
+    return sum(len(doc_data['processed_text']) if 'processed_text' in doc_data else len(doc_data['fulltext'].split())
+               for doc_data in corpus.values())
+
+
+class BenchmarkSuite:
+    """
+    This class prepares the synthetic corpus and the intermediate results of the pipeline and provides the benchmarks.
+    Every method bench_<name> prepares a benchmark and returns a tuple with the function that is measured (without
+    arguments), the number of documents and the number of tokens it processes. The preparation is not measured.
+    """
+
+    def __init__(self, n_documents: int = 1000, mean_length: int = 500, length_distribution: str = "lognormal",
+                 sigma: float = 0.8, vocabulary_size: int = 50000, seed: int = 42, num_topics: int = 20):
+        """
+        The constructor of the class BenchmarkSuite. It has to be called in the working directory of the suite. The
+        synthetic corpus is generated and preprocessed once; the results of every preprocessing step are kept as input
+        of the benchmarks of the following step.
+
+        Args:
+            n_documents: The number of documents of the synthetic corpus.
+            mean_length: The mean number of words per document.
+            length_distribution: The distribution of the document lengths (see synthetic_corpus.document_lengths()).
+            sigma: The shape of the lognormal length distribution.
+            vocabulary_size: The number of words of the synthetic vocabulary.
+            seed: The seed of the corpus.
+            num_topics: The number of topics of the LDA model.
+        """
+        self.configuration = {"documents": n_documents, "mean_length": mean_length,
+                              "length_distribution": length_distribution, "sigma": sigma,
+                              "vocabulary_size": vocabulary_size, "seed": seed, "num_topics": num_topics}
+
+        for directory in ("data/processed", "data_outputs", "data_preprocessing"):
+            os.makedirs(directory, exist_ok=True)
+
+        vocabulary = german_vocabulary(vocabulary_size, seed)
+        expressions = multiword_expressions(vocabulary, seed=seed)
+        write_language_resources("data_preprocessing", vocabulary, expressions)
+
+        def documents():
+            return generate_documents(n_documents, vocabulary, expressions, mean_length, length_distribution, sigma,
+                                      seed=seed)
+
+        write_xml(documents(), os.path.join("data", "polx_synthetic.xml"))
+        write_json(documents(), os.path.join("data/processed", "polx_synthetic.json"))
+
+        self.raw = CorpusManager("polx_synthetic", "polx_synthetic.xml").corpus
+
+        # The intermediate results of prepare_for_topic_modeling().
+        preprocessor = CorpusPreprocessor(CorpusManager.from_documents("polx_synthetic", copy_corpus(self.raw)))
+        self.pre_cleaned = self._snapshot(preprocessor, preprocessor.pre_clean)
+        self.lemmatized = self._snapshot(preprocessor, preprocessor.lemmatize)
+        self.normalized = self._snapshot(preprocessor, preprocessor.normalize)
+        self.tokenized = self._snapshot(preprocessor, preprocessor.tokenize)
+        self.merged = self._snapshot(preprocessor, preprocessor.n_gram_inclusion)
+        self.processed = self._snapshot(preprocessor, lambda: preprocessor.clean(custom_stopwords=True,
+                                                                                  remove_rare_terms=3))
+
+        analyzer = CorpusAnalyzer(CorpusManager.from_documents("polx_synthetic", copy_corpus(self.processed)))
+        with contextlib.redirect_stdout(io.StringIO()):
+            analyzer.calculate_term_relevance("dateninstitut")
+        self.analyzed = analyzer.corpus
+        analyzer.serialize_corpus_binary("polx_synthetic_binary")
+
+        self.dictionary, self.bag_of_words_model = lda.build_bag_of_words(analyzer)
+        self.processed_texts = [doc_data['processed_text'] for doc_data in self.processed.values()]
+
+        self.raw_tokens = count_tokens(self.raw)
+        self.processed_tokens = count_tokens(self.processed)
+
+    @staticmethod
+    def _snapshot(preprocessor: CorpusPreprocessor, step) -> dict:
+        """
+        A helper method for the constructor. Runs a preprocessing step and copies the corpus afterward.
+        """
+        with contextlib.redirect_stdout(io.StringIO()):
+            step()
+        return copy_corpus(preprocessor.corpus)
+
+    def benchmarks(self) -> list:
+        """
+        This method lists the names of all benchmarks in the order of their definition, e.g. 'CorpusManager.view' for the
+        method bench_CorpusManager_view().
+
+        Returns:
+            The names of the benchmarks.
+        """
+        return [name[len("bench_"):].replace("_", ".", 1) for name in vars(BenchmarkSuite) if name.startswith("bench_")]
+
+    def _manager(self, corpus: dict, cls=CorpusManager):
+        """
+        A helper method that creates a CorpusManager (or a subclass) for a copy of a corpus.
+        """
+        corpus_manager = CorpusManager.from_documents("polx_synthetic", copy_corpus(corpus))
+        return corpus_manager if cls is CorpusManager else cls(corpus_manager)
+
+    # CorpusManager
+
+    def bench_CorpusManager_deserialize_corpus_from_xml(self):
+        return lambda: CorpusManager("polx_synthetic", "polx_synthetic.xml"), len(self.raw), self.raw_tokens
+
+    def bench_CorpusManager_deserialize_corpus_from_xml_streaming(self):
+        return (lambda: CorpusManager("polx_synthetic", "polx_synthetic.xml", streaming=True), len(self.raw),
+                self.raw_tokens)
+
+    def bench_CorpusManager_deserialize_corpus_from_json(self):
+        return (lambda: CorpusManager("polx_synthetic", "polx_synthetic.json", from_xml=False), len(self.raw),
+                self.raw_tokens)
+
+    def bench_CorpusManager_serialize_corpus(self):
+        corpus_manager = self._manager(self.analyzed)
+        return (lambda: corpus_manager.serialize_corpus("polx_synthetic_serialized.json"), len(self.analyzed),
+                self.processed_tokens)
+
+    def bench_CorpusManager_serialize_corpus_binary(self):
+        corpus_manager = self._manager(self.analyzed)
+        return (lambda: corpus_manager.serialize_corpus_binary("polx_synthetic_serialized"), len(self.analyzed),
+                self.processed_tokens)
+
+    def bench_CorpusManager_deserialize_corpus_from_binary(self):
+        return (lambda: CorpusManager("polx_synthetic", "polx_synthetic_binary", from_binary=True),
+                len(self.analyzed), self.processed_tokens)
+
+    def bench_CorpusManager_encode_processed_text(self):
+        corpus_manager = self._manager(self.processed)
+        return corpus_manager.encode_processed_text, len(self.processed), self.processed_tokens
+
+    def bench_CorpusManager_decode_processed_text(self):
+        corpus_manager = self._manager(self.processed)
+        corpus_manager.encode_processed_text()
+        return corpus_manager.decode_processed_text, len(self.processed), self.processed_tokens
+
+    def bench_CorpusManager_is_encoded(self):
+        corpus_manager = self._manager(self.processed)
+        return corpus_manager.is_encoded, len(self.processed), self.processed_tokens
+
+    def bench_CorpusManager_get_tokens(self):
+        corpus_manager = self._manager(self.processed)
+        corpus_manager.encode_processed_text()
+        return (lambda: [corpus_manager.get_tokens(key) for key in corpus_manager.corpus], len(self.processed),
+                self.processed_tokens)
+
+    def bench_CorpusManager_build_index(self):
+        corpus_manager = self._manager(self.analyzed)
+        return corpus_manager.build_index, len(self.analyzed), self.processed_tokens
+
+    def bench_CorpusManager_view(self):
+        corpus_manager = self._manager(self.analyzed)
+        return (lambda: len(corpus_manager.view().where_relevance(0.0, "dateninstitut").where_length(150)
+                            .where_title("Dateninstitut")), len(self.analyzed), self.processed_tokens)
+
+    def bench_CorpusManager_filter_by_title(self):
+        corpus_manager = self._manager(self.analyzed)
+        return lambda: corpus_manager.filter_by_title("Dateninstitut"), len(self.analyzed), None
+
+    def bench_CorpusManager_filter_by_relevance(self):
+        corpus_manager = self._manager(self.analyzed)
+        return lambda: corpus_manager.filter_by_relevance(0.01, "dateninstitut"), len(self.analyzed), None
+
+    def bench_CorpusManager_filter_by_length(self):
+        corpus_manager = self._manager(self.analyzed)
+        return lambda: corpus_manager.filter_by_length(150), len(self.analyzed), self.processed_tokens
+
+    # CorpusPreprocessor
+
+    def bench_CorpusPreprocessor_pre_clean(self):
+        preprocessor = self._manager(self.raw, CorpusPreprocessor)
+        return preprocessor.pre_clean, len(self.raw), self.raw_tokens
+
+    def bench_CorpusPreprocessor_lemmatize(self):
+        preprocessor = self._manager(self.pre_cleaned, CorpusPreprocessor)
+        return preprocessor.lemmatize, len(self.raw), self.raw_tokens
+
+    def bench_CorpusPreprocessor_normalize(self):
+        preprocessor = self._manager(self.lemmatized, CorpusPreprocessor)
+        return preprocessor.normalize, len(self.raw), self.raw_tokens
+
+    def bench_CorpusPreprocessor_tokenize(self):
+        preprocessor = self._manager(self.normalized, CorpusPreprocessor)
+        return preprocessor.tokenize, len(self.tokenized), count_tokens(self.tokenized)
+
+    def bench_CorpusPreprocessor_n_gram_inclusion(self):
+        preprocessor = self._manager(self.tokenized, CorpusPreprocessor)
+        return preprocessor.n_gram_inclusion, len(self.tokenized), count_tokens(self.tokenized)
+
+    def bench_CorpusPreprocessor_clean(self):
+        preprocessor = self._manager(self.merged, CorpusPreprocessor)
+        return (lambda: preprocessor.clean(custom_stopwords=True, remove_rare_terms=3), len(self.merged),
+                count_tokens(self.merged))
+
+    def bench_CorpusPreprocessor_remove_rare_terms(self):
+        preprocessor = self._manager(self.merged, CorpusPreprocessor)
+        return lambda: preprocessor.remove_rare_terms(3), len(self.merged), count_tokens(self.merged)
+
+    def bench_CorpusPreprocessor_remove_custom_stopwords(self):
+        preprocessor = self._manager(self.merged, CorpusPreprocessor)
+        return preprocessor.remove_custom_stopwords, len(self.merged), count_tokens(self.merged)
+
+    def bench_CorpusPreprocessor_prepare_for_topic_modeling(self):
+        preprocessor = self._manager(self.raw, CorpusPreprocessor)
+        return preprocessor.prepare_for_topic_modeling, len(self.raw), self.raw_tokens
+
+    # CorpusAnalyzer
+
+    def bench_CorpusAnalyzer_mine_term_frequency(self):
+        analyzer = self._manager(self.processed, CorpusAnalyzer)
+        return analyzer.mine_term_frequency, len(self.processed), self.processed_tokens
+
+    def bench_CorpusAnalyzer_calculate_term_relevance(self):
+        analyzer = self._manager(self.processed, CorpusAnalyzer)
+        return lambda: analyzer.calculate_term_relevance("dateninstitut"), len(self.processed), self.processed_tokens
+
+    def bench_CorpusAnalyzer_calculate_term_relevances(self):
+        analyzer = self._manager(self.processed, CorpusAnalyzer)
+        return (lambda: analyzer.calculate_term_relevances(["dateninstitut", "daten", "digitalisierung"]),
+                len(self.processed), self.processed_tokens)
+
+    def bench_CorpusAnalyzer_fit_tfidf(self):
+        analyzer = self._manager(self.processed, CorpusAnalyzer)
+        return analyzer.fit_tfidf, len(self.processed), self.processed_tokens
+
+    def bench_CorpusAnalyzer_calculate_temporal_term_occurrence(self):
+        analyzer = self._manager(self.processed, CorpusAnalyzer)
+        return analyzer.calculate_temporal_term_occurrence, len(self.processed), self.processed_tokens
+
+    def bench_CorpusAnalyzer_calculate_temporal_term_matrix(self):
+        analyzer = self._manager(self.processed, CorpusAnalyzer)
+        return analyzer.calculate_temporal_term_matrix, len(self.processed), self.processed_tokens
+
+    def bench_CorpusAnalyzer_calculate_cooccurrence(self):
+        analyzer = self._manager(self.processed, CorpusAnalyzer)
+        return analyzer.calculate_cooccurrence, len(self.processed), self.processed_tokens
+
+    def bench_CorpusAnalyzer_count_cooccurrences(self):
+        analyzer = self._manager(self.processed, CorpusAnalyzer)
+        return analyzer.count_cooccurrences, len(self.processed), self.processed_tokens
+
+    # LDA
+
+    def bench_lda_build_bag_of_words(self):
+        corpus_manager = self._manager(self.processed)
+        return lambda: lda.build_bag_of_words(corpus_manager), len(self.processed), self.processed_tokens
+
+    def bench_lda_training_pass(self):
+        # One pass over the corpus with the parameters of the project.
+        lda_parameters = {**lda.LDA_PARAMETERS, "passes": 1, "eval_every": None}
+        return (lambda: LdaModel(corpus=self.bag_of_words_model, id2word=self.dictionary,
+                                 num_topics=self.configuration["num_topics"], **lda_parameters),
+                len(self.processed), self.processed_tokens)
+
+    def bench_lda_coherence_index(self):
+        return (lambda: lda.CoherenceIndex.from_texts(self.processed_texts, self.dictionary), len(self.processed),
+                self.processed_tokens)
+
+    def run(self, name: str, repeat: int = 3) -> dict:
+        """
+        This method runs a benchmark several times. Every repetition is prepared anew, so every repetition processes
+        the same input.
+
+        Args:
+            name: The name of the benchmark.
+            repeat: The number of repetitions.
+
+        Returns:
+            A dictionary with the median and minimal wall time, the median CPU time, the peak memory, the number of
+            documents and tokens and the throughput of the median wall time.
+        """
+        records = []
+
+        for _ in range(repeat):
+            function, documents, tokens = getattr(self, f"bench_{name.replace('.', '_', 1)}")()
+
+            with contextlib.redirect_stdout(io.StringIO()):
+                with instrumentation.stage(name, documents=documents, tokens=tokens) as record:
+                    function()
+
+            records.append(record)
+            # The records of the instrumented methods within the benchmark are not needed.
+            instrumentation.records.clear()
+
+        wall_seconds = statistics.median(record["wall_seconds"] for record in records)
+
+        return {
+            "wall_seconds": wall_seconds,
+            "min_wall_seconds": min(record["wall_seconds"] for record in records),
+            "cpu_seconds": statistics.median(record["cpu_seconds"] + record["children_cpu_seconds"]
+                                             for record in records),
+            "peak_rss_mb": records[-1]["peak_rss_mb"],
+            "documents": documents,
+            "tokens": tokens,
+            "documents_per_second": documents / wall_seconds if documents is not None and wall_seconds > 0 else None,
+            "tokens_per_second": tokens / wall_seconds if tokens is not None and wall_seconds > 0 else None,
+            "repeat": repeat
+        }
+
+
+def compare(results: dict, baseline: dict, threshold: float = 0.25, noise_seconds: float = 0.005) -> list:
+    """
+    Compares the results of a run with a baseline.
+
+    Args:
+        results: The results of the run (name -> result of BenchmarkSuite.run()).
+        baseline: The saved baseline (see save_baseline()).
+        threshold: The relative increase of the median wall time above which a benchmark is a regression.
+        noise_seconds: The absolute increase of the median wall time below which a benchmark is never a regression.
+
+    Returns:
+        The names of the benchmarks that regressed.
+    """
+    regressions = []
+
+    print(f"\n{'benchmark':62} {'baseline':>10} {'current':>10} {'ratio':>7}")
+    for name, result in results.items():
+        reference = baseline["results"].get(name)
+        if reference is None:
+            print(f"{name:62} {'-':>10} {result['wall_seconds'] * 1000:8.1f}ms {'new':>7}")
+            continue
+
+        ratio = result["wall_seconds"] / reference["wall_seconds"] if reference["wall_seconds"] > 0 else float("inf")
+        regressed = ratio > 1 + threshold and result["wall_seconds"] - reference["wall_seconds"] > noise_seconds
+        if regressed:
+            regressions.append(name)
+
+        print(f"{name:62} {reference['wall_seconds'] * 1000:8.1f}ms {result['wall_seconds'] * 1000:8.1f}ms "
+              f"{ratio:6.2f}x{'  REGRESSION' if regressed else ''}")
+
+    return regressions
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--documents", type=int, default=1000, help="the number of documents (1k to 1M)")
+    parser.add_argument("--mean-length", type=int, default=500, help="the mean number of words per document")
+    parser.add_argument("--length-distribution", choices=["lognormal", "uniform", "fixed"], default="lognormal")
+    parser.add_argument("--sigma", type=float, default=0.8, help="the shape of the lognormal length distribution")
+    parser.add_argument("--vocabulary-size", type=int, default=50000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--repeat", type=int, default=3, help="the number of repetitions of every benchmark")
+    parser.add_argument("--only", default=None, help="a regular expression that selects the benchmarks by name")
+    parser.add_argument("--spacy-model", default="stub",
+                        help="'stub' (default) or the name of the spacy model used for the lemmatization")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="the path and filename of the baseline")
+    parser.add_argument("--save-baseline", action="store_true", help="save the results as baseline")
+    parser.add_argument("--compare", action="store_true", help="compare the results with the baseline")
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="the relative slowdown above which a benchmark is reported as regression")
+    parser.add_argument("--output", default=None, help="if given, the results are saved to this json file")
+    parser.add_argument("--workdir", default=None,
+                        help="the working directory of the suite. By default, a temporary directory is used and deleted.")
+    args = parser.parse_args()
+
+    if args.spacy_model == "stub":
+        CorpusPreprocessor.german_model = stub_german_model()
+    else:
+        CorpusPreprocessor.german_model_name = args.spacy_model
+
+    # The paths are resolved before the working directory is changed.
+    baseline_path = os.path.abspath(args.baseline)
+    output_path = os.path.abspath(args.output) if args.output is not None else None
+    cwd = os.getcwd()
+    workdir = args.workdir or tempfile.mkdtemp(prefix="polx_benchmarks_")
+    os.makedirs(workdir, exist_ok=True)
+    os.chdir(workdir)
+
+    try:
+        print(f"Generating and preprocessing {args.documents} synthetic documents in '{workdir}'...")
+        suite = BenchmarkSuite(args.documents, args.mean_length, args.length_distribution, args.sigma,
+                               args.vocabulary_size, args.seed)
+        configuration = {**suite.configuration, "spacy_model": args.spacy_model}
+
+        instrumentation.enable()
+
+        results = {}
+        print(f"\n{'benchmark':62} {'median':>10} {'cpu':>10} {'tokens/sec':>12} {'peak rss':>10}")
+        for name in suite.benchmarks():
+            if args.only is not None and not re.search(args.only, name):
+                continue
+
+            result = suite.run(name, args.repeat)
+            results[name] = result
+
+            tokens_per_second = f"{result['tokens_per_second']:12.0f}" if result['tokens_per_second'] else f"{'-':>12}"
+            peak_rss = f"{result['peak_rss_mb']:8.1f}MB" if result['peak_rss_mb'] is not None else f"{'-':>10}"
+            print(f"{name:62} {result['wall_seconds'] * 1000:8.1f}ms {result['cpu_seconds'] * 1000:8.1f}ms "
+                  f"{tokens_per_second} {peak_rss}")
+
+        instrumentation.disable()
+    finally:
+        os.chdir(cwd)
+        if args.workdir is None:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        "created": datetime.now().isoformat(timespec='seconds'),
+        "machine": {"platform": platform.platform(), "processor": platform.processor(), "cpus": os.cpu_count(),
+                    "python": platform.python_version()},
+        "configuration": configuration,
+        "results": results
+    }
+
+    if output_path is not None:
+        with open(output_path, 'w', encoding='utf-8') as json_file:
+            json.dump(report, json_file, indent=2, ensure_ascii=False)
+        print(f"\nThe results have been saved to '{args.output}'")
+
+    regressions = []
+    if args.compare:
+        with open(baseline_path, 'r', encoding='utf-8') as json_file:
+            baseline = json.load(json_file)
+
+        if baseline["configuration"] != configuration:
+            print(f"\nWarning: the configuration of the baseline differs: {baseline['configuration']}")
+
+        regressions = compare(results, baseline, args.threshold)
+        print(f"\n{len(regressions)} regression(s) with a threshold of {args.threshold:.0%}.")
+
+    if args.save_baseline:
+        with open(baseline_path, 'w', encoding='utf-8') as json_file:
+            json.dump(report, json_file, indent=2, ensure_ascii=False)
+        print(f"The baseline has been saved to '{args.baseline}'")
+
+    sys.exit(1 if regressions else 0)
@@ -0,0 +1,357 @@
+"""
+Generator of synthetic PolX corpora for the benchmarks.
+
+The documents imitate the exports of PolX: every document has the metadata fields of the XML export and a German-like
+full text. The words of the full texts are generated from German syllables and drawn from a Zipf distribution, so a few
+(stop) words are very frequent and most words are rare. The texts contain sentences, paragraphs, punctuation, numbers,
+e-mail addresses, missing spaces after full stops and planted Multiword Expressions, so every step of the preprocessing
+has work to do. The length of the documents follows a configurable distribution. The same seed always results in the
+same corpus.
+
+Besides the corpus, the language resources of the preprocessing (MWE.json, MWE_reversed.json and a custom stop word
+list) are generated from the same vocabulary. Example:
+
+    python benchmarks/synthetic_corpus.py --documents 100000 --format xml --output data/polx_synthetic.xml
+"""
+import argparse
+import json
+import os
+from datetime import datetime, timedelta
+from xml.sax.saxutils import escape
+import numpy as np
+
+# Frequent German function words. They are the most frequent words of every synthetic corpus.
+FUNCTION_WORDS = ["der", "die", "und", "in", "den", "von", "zu", "das", "mit", "sich", "des", "auf", "für", "ist", "im",
+                  "dem", "nicht", "ein", "eine", "als", "auch", "es", "an", "werden", "aus", "er", "hat", "dass", "sie",
+                  "nach", "wird", "bei", "einer", "um", "am", "sind", "noch", "wie", "einem", "über"]
+
+# Domain terms of the project. They are inserted at a moderate rank of the vocabulary.
+DOMAIN_WORDS = ["Dateninstitut", "Daten", "Digitalisierung", "Datenschutz", "Bundesregierung", "Forschung",
+                "Verwaltung", "Infrastruktur", "Plattform", "Datenstrategie"]
+
+ONSETS = ["b", "d", "f", "g", "h", "k", "l", "m", "n", "p", "r", "s", "t", "w", "z", "sch", "st", "sp", "br", "kr",
+          "tr", "pf", "gr", "fl", "bl", "schw", "v", "ch"]
+NUCLEI = ["a", "e", "i", "o", "u", "ä", "ö", "ü", "ei", "au", "ie", "eu", "e", "e", "a"]
+CODAS = ["", "", "n", "r", "t", "s", "ch", "ng", "ck", "l", "m", "st", "nd", "rt", "ft", "tz"]
+SUFFIXES = ["ung", "heit", "keit", "schaft", "lich", "isch", "en", "er", "ern", "ig", "bar", "tion", "nis", "ismus"]
+
+SOURCES = [("Bund", "BT", "Deutscher Bundestag"), ("Bund", "BR", "Bundesrat"), ("Land", "BY", "Bayerischer Landtag"),
+           ("Land", "NW", "Landtag Nordrhein-Westfalen"), ("Land", "BE", "Abgeordnetenhaus Berlin"),
+           ("Land", "SN", "Sächsischer Landtag"), ("EU", "EP", "Europäisches Parlament")]
+TYPES = ["Antrag", "Kleine Anfrage", "Große Anfrage", "Gesetzentwurf", "Beschlussempfehlung", "Plenarprotokoll",
+         "Antwort"]
+INITIATORS = ["SPD", "CDU/CSU", "BÜNDNIS 90/DIE GRÜNEN", "FDP", "DIE LINKE", "AfD", "Bundesregierung", ""]
+
+
+def german_vocabulary(size: int = 50000, seed: int = 42) -> list:
+    """
+    Generates a German-like vocabulary. The words are built from German syllables and suffixes; roughly every third
+    word is a capitalized noun and some words are compounds. The vocabulary starts with the function words, followed by
+    the generated words with the domain terms inserted at rank 200.
+
+    Args:
+        size: The number of words.
+        seed: The seed of the random generator.
+
+    Returns:
+        The list of unique words in the order of their frequency rank.
+    """
+    rng = np.random.default_rng(seed)
+    words = list(FUNCTION_WORDS)
+    used = {word.lower() for word in FUNCTION_WORDS + DOMAIN_WORDS}
+    stems = []
+
+    while len(words) < size - len(DOMAIN_WORDS):
+        if stems and rng.random() < 0.15:
+            # compound of two stems
+            word = stems[rng.integers(len(stems))] + stems[rng.integers(len(stems))]
+        else:
+            word = "".join(ONSETS[rng.integers(len(ONSETS))] + NUCLEI[rng.integers(len(NUCLEI))] +
+                           CODAS[rng.integers(len(CODAS))] for _ in range(rng.integers(1, 4)))
+            stems.append(word)
+            if rng.random() < 0.4:
+                word += SUFFIXES[rng.integers(len(SUFFIXES))]
+
+        if word in used:
+            continue
+        used.add(word)
+        words.append(word.capitalize() if rng.random() < 0.35 else word)
+
+    return words[:200] + DOMAIN_WORDS + words[200:]
+
+
+def multiword_expressions(vocabulary: list, n: int = 2000, seed: int = 42) -> list:
+    """
+    Draws Multiword Expressions, i.e. bigrams and a few trigrams of (lowercased) words of the vocabulary.
+
+    Args:
+        vocabulary: The vocabulary (see german_vocabulary()).
+        n: The number of expressions.
+        seed: The seed of the random generator.
+
+    Returns:
+        The list of unique expressions (tuples of lowercase tokens).
+    """
+    rng = np.random.default_rng(seed)
+    # Expressions consist of moderately frequent content words.
+    candidates = [word.lower() for word in vocabulary[len(FUNCTION_WORDS):5000]]
+
+    expressions = {}
+    while len(expressions) < min(n, len(candidates)):
+        length = 3 if rng.random() < 0.1 else 2
+        expression = tuple(candidates[i] for i in rng.integers(len(candidates), size=length))
+        expressions[expression] = None
+
+    return list(expressions)
+
+
+def document_lengths(n_documents: int, mean_length: int = 500, length_distribution: str = "lognormal",
+                     sigma: float = 0.8, seed: int = 42) -> np.ndarray:
+    """
+    Draws the number of words of every document.
+
+    Args:
+        n_documents: The number of documents.
+        mean_length: The mean number of words.
+        length_distribution: 'lognormal' (right-skewed like real parliamentary documents), 'uniform' (between 1 and
+            2 * mean_length) or 'fixed'.
+        sigma: The shape of the lognormal distribution. A larger sigma results in more very long documents.
+        seed: The seed of the random generator.
+
+    Returns:
+        The array of lengths (at least 1).
+    """
+    rng = np.random.default_rng(seed)
+
+    if length_distribution == "lognormal":
+        lengths = rng.lognormal(np.log(mean_length) - sigma ** 2 / 2, sigma, size=n_documents)
+    elif length_distribution == "uniform":
+        lengths = rng.integers(1, 2 * mean_length + 1, size=n_documents)
+    elif length_distribution == "fixed":
+        lengths = np.full(n_documents, mean_length)
+    else:
+        raise ValueError(f"Unknown length distribution '{length_distribution}'.")
+
+    return np.maximum(np.round(lengths), 1).astype(np.int64)
+
+
+def generate_documents(n_documents: int, vocabulary: list, expressions: list = (), mean_length: int = 500,
+                       length_distribution: str = "lognormal", sigma: float = 0.8, zipf_exponent: float = 1.05,
+                       mwe_rate: float = 0.02, seed: int = 42):
+    """
+    Generates the documents of a synthetic PolX corpus one at a time.
+
+    Args:
+        n_documents: The number of documents.
+        vocabulary: The vocabulary (see german_vocabulary()).
+        expressions: The Multiword Expressions which are planted in the texts (see multiword_expressions()).
+        mean_length: The mean number of words per document.
+        length_distribution: The distribution of the document lengths (see document_lengths()).
+        sigma: The shape of the lognormal length distribution.
+        zipf_exponent: The exponent of the Zipf distribution of the words.
+        mwe_rate: The probability that a word is replaced by a Multiword Expression.
+        seed: The seed of the random generator.
+
+    Yields:
+        The documents as dictionaries in the structure of CorpusManager.corpus (without processed text). The titles are
+        not necessarily unique, like the titles of a real export.
+    """
+    rng = np.random.default_rng(seed)
+    words = np.array(vocabulary, dtype=object)
+    expression_texts = [" ".join(expression) for expression in expressions]
+
+    cumulative_weights = np.cumsum(1.0 / np.arange(1, len(words) + 1) ** zipf_exponent)
+    cumulative_weights /= cumulative_weights[-1]
+
+    lengths = document_lengths(n_documents, mean_length, length_distribution, sigma, seed)
+    first_date = datetime(2017, 1, 1)
+    previous_title = None
+
+    for i, length in enumerate(lengths.tolist()):
+        tokens = words[np.searchsorted(cumulative_weights, rng.random(length), side="right")].tolist()
+
+        # Noise and Multiword Expressions replace single words.
+        for position in np.flatnonzero(rng.random(length) < mwe_rate + 0.015).tolist():
+            draw = rng.random()
+            if expression_texts and draw < mwe_rate / (mwe_rate + 0.015):
+                tokens[position] = expression_texts[rng.integers(len(expression_texts))]
+            elif draw < 0.85:
+                tokens[position] = str(rng.integers(1, 2030))
+            elif draw < 0.95:
+                tokens[position] = f"({tokens[position]})"
+            else:
+                tokens[position] = f"kontakt{rng.integers(100)}@example.de"
+
+        # Sentences of 5 to 25 words, paragraphs of 1 to 8 sentences.
+        text_parts = []
+        start = 0
+        sentences_in_paragraph = 0
+        while start < length:
+            end = min(length, start + int(rng.integers(5, 26)))
+            sentence = tokens[start:end]
+            sentence[0] = sentence[0][:1].upper() + sentence[0][1:]
+            text_parts.append(" ".join(sentence) + ("?" if rng.random() < 0.05 else "."))
+
+            sentences_in_paragraph += 1
+            draw = rng.random()
+            if draw < 0.02:
+                # a missing space after the full stop, which is fixed by CorpusPreprocessor.pre_clean()
+                text_parts.append("")
+            elif draw < 0.17 or sentences_in_paragraph >= 8:
+                text_parts.append("\n\n")
+                sentences_in_paragraph = 0
+            else:
+                text_parts.append(" ")
+            start = end
+
+        source_level, source_name, source_fullname = SOURCES[rng.integers(len(SOURCES))]
+        document_type = TYPES[rng.integers(len(TYPES))]
+        initiator = INITIATORS[rng.integers(len(INITIATORS))]
+
+        if previous_title is not None and rng.random() < 0.005:
+            title = previous_title
+        else:
+            topic = " ".join(words[rng.integers(len(FUNCTION_WORDS), min(3000, len(words)), size=2)].tolist())
+            if rng.random() < 0.1:
+                topic = f"Dateninstitut und {topic}"
+            title = f"{document_type} {f'der Fraktion {initiator} ' if initiator else ''}zu {topic}"
+        previous_title = title
+
+        # A few documents have no date, like in the real exports.
+        document_date = first_date + timedelta(days=int(rng.integers(0, 8 * 365))) if rng.random() > 0.01 else ""
+        document_number = f"{rng.integers(17, 21)}/{i + 1}"
+
+        yield {
+            "source_level": source_level,
+            "source_name": source_name,
+            "source_fullname": source_fullname,
+            "document_number": document_number,
+            "document_date": document_date,
+            "initiator": initiator,
+            "type": document_type,
+            "title": title,
+            "url_polx": f"https://polx.example.de/dokument/{source_name}/{document_number}",
+            "url": f"https://dokumente.example.de/{source_name.lower()}/{i + 1}.pdf",
+            "fulltext": "".join(text_parts).rstrip()
+        }
+
+
+def write_xml(documents, path: str) -> int:
+    """
+    Writes documents in the format of the PolX XML export. The file is written incrementally, so corpora with millions
+    of documents do not have to be held in memory.
+
+    Args:
+        documents: An iterable of documents (see generate_documents()).
+        path: The path and filename of the xml document.
+
+    Returns:
+        The number of written documents.
+    """
+    # The names of the XML elements that differ from the fields of CorpusManager.corpus.
+    elements = {"source_level": "source_ebene", "url_polx": "document_url_polx", "url": "document_url"}
+
+    n = 0
+    with open(path, "w", encoding="utf-8") as file:
+        file.write('<?xml version="1.0" encoding="UTF-8"?>\n<polx_export>\n<documents>\n')
+        for document in documents:
+            file.write("<document>\n")
+            for field, value in document.items():
+                if isinstance(value, datetime):
+                    value = value.date().isoformat()
+                element = elements.get(field, field)
+                file.write(f"<{element}>{escape(value) if value is not None else ''}</{element}>\n")
+            file.write("</document>\n")
+            n += 1
+        file.write("</documents>\n</polx_export>\n")
+
+    return n
+
+
+def write_json(documents, path: str) -> int:
+    """
+    Writes documents in the format of CorpusManager.serialize_corpus(). Titles are made unique with the scheme of
+    CorpusManager. The file is written incrementally.
+
+    Args:
+        documents: An iterable of documents (see generate_documents()).
+        path: The path and filename of the json document.
+
+    Returns:
+        The number of written documents.
+    """
+    used_titles = set()
+
+    n = 0
+    with open(path, "w", encoding="utf-8") as file:
+        file.write("{")
+        for document in documents:
+            title = document["title"]
+            if title in used_titles:
+                title = next(f"{title} ({i})" for i in range(2, 100) if f"{title} ({i})" not in used_titles)
+            used_titles.add(title)
+
+            document = {**document, "title": title}
+            if isinstance(document["document_date"], datetime):
+                document["document_date"] = document["document_date"].date().isoformat()
+
+            file.write(f'{"," if n else ""}\n{json.dumps(title, ensure_ascii=False)}: '
+                       f'{json.dumps(document, ensure_ascii=False)}')
+            n += 1
+        file.write("\n}\n")
+
+    return n
+
+
+def write_language_resources(directory: str, vocabulary: list, expressions: list, n_stopwords: int = 200) -> None:
+    """
+    Writes the language resources of the preprocessing in the format of the project: MWE.json, MWE_reversed.json and
+    the custom stop word list stopwords_di_unfiltered.txt.
+
+    Args:
+        directory: The directory of the files, e.g. data_preprocessing.
+        vocabulary: The vocabulary (see german_vocabulary()).
+        expressions: The Multiword Expressions (see multiword_expressions()).
+        n_stopwords: The number of custom stop words. They are the most frequent words after the function words.
+    """
+    os.makedirs(directory, exist_ok=True)
+
+    MWE = {"_".join(expression): list(expression) for expression in expressions}
+    MWE_reversed = {str(list(expression)): "_".join(expression) for expression in expressions}
+
+    with open(os.path.join(directory, "MWE.json"), "w", encoding="utf-8") as json_file:
+        json.dump(MWE, json_file, ensure_ascii=False, indent=2)
+    with open(os.path.join(directory, "MWE_reversed.json"), "w", encoding="utf-8") as json_file:
+        json.dump(MWE_reversed, json_file, ensure_ascii=False, indent=2)
+
+    stopwords = vocabulary[len(FUNCTION_WORDS):len(FUNCTION_WORDS) + n_stopwords]
+    with open(os.path.join(directory, "stopwords_di_unfiltered.txt"), "w", encoding="utf-8") as file:
+        file.write("\n".join(word.lower() for word in stopwords if word not in DOMAIN_WORDS))
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--documents", type=int, default=1000, help="the number of documents")
+    parser.add_argument("--mean-length", type=int, default=500, help="the mean number of words per document")
+    parser.add_argument("--length-distribution", choices=["lognormal", "uniform", "fixed"], default="lognormal")
+    parser.add_argument("--sigma", type=float, default=0.8, help="the shape of the lognormal length distribution")
+    parser.add_argument("--vocabulary-size", type=int, default=50000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--format", choices=["xml", "json"], default="xml")
+    parser.add_argument("--output", default="data/polx_synthetic.xml", help="the path and filename of the corpus")
+    parser.add_argument("--resources", default=None,
+                        help="if given, the language resources are written to this directory")
+    args = parser.parse_args()
+
+    vocabulary = german_vocabulary(args.vocabulary_size, args.seed)
+    expressions = multiword_expressions(vocabulary, seed=args.seed)
+    documents = generate_documents(args.documents, vocabulary, expressions, args.mean_length,
+                                   args.length_distribution, args.sigma, seed=args.seed)
+
+    n = (write_xml if args.format == "xml" else write_json)(documents, args.output)
+    print(f"{n} documents have been saved to '{args.output}'")
+
+    if args.resources is not None:
+        write_language_resources(args.resources, vocabulary, expressions)
+        print(f"The language resources have been saved to '{args.resources}'")
@@ -0,0 +1,223 @@
+import numpy as np
+from gensim import corpora, matutils
+from gensim.models import LdaModel
+
+
+class CoherenceIndex:
+    """
+    This class precomputes the sliding window statistics of a tokenized corpus for the coherence metric C_V of Röder et
+    al. (2015). CoherenceModel scans all texts again for every model to count the virtual documents (windows) in which the
+    top words of the topics occur. The texts of a topic number sweep never change, so the CoherenceIndex scans them once
+    and stores the windows of every term of the dictionary as sorted, merged intervals. The (co-)occurrence count of
+    any pair of terms is then calculated from their intervals and cached, hence evaluating a new model only costs the
+    lookups of its top words.
+    The counts are identical to the WordOccurrenceAccumulator of gensim, which is used by CoherenceModel with
+    coherence='c_v'. The accumulator slides a set of the words of the current window and removes the token that leaves
+    the window even if it occurs a second time in the window. A word is therefore present from the window in which it
+    enters up to the window after its first occurrence, which is reproduced by the intervals of this class.
+    """
+
+    # The constants of gensim for the coherence metric C_V.
+    WINDOW_SIZE = 110
+    EPSILON = 1e-12
+
+    def __init__(self, word_offsets: np.ndarray, starts: np.ndarray, ends: np.ndarray, num_windows: int,
+                 window_size: int = WINDOW_SIZE):
+        """
+        The constructor of the class CoherenceIndex. Use from_texts() to build an index of a corpus or load() to read a
+        saved index.
+
+        Args:
+            word_offsets: The intervals of the dictionary id i are starts[word_offsets[i]:word_offsets[i + 1]].
+            starts: The first window of every interval.
+            ends: The window after the last window of every interval.
+            num_windows: The number of windows of the corpus.
+            window_size: The size of the sliding window.
+        """
+        self.word_offsets = word_offsets
+        self.starts = starts
+        self.ends = ends
+        self.num_windows = num_windows
+        self.window_size = window_size
+        # The number of windows that contain a term is the total length of its intervals.
+        lengths = np.concatenate(([0], np.cumsum(ends - starts)))
+        self.occurrences = lengths[word_offsets[1:]] - lengths[word_offsets[:-1]]
+
+        self.co_occurrence_cache = {}
+
+    @classmethod
+    def from_texts(cls, processed_texts: list, dictionary: corpora.Dictionary,
+                   window_size: int = WINDOW_SIZE) -> 'CoherenceIndex':
+        """
+        This method scans the tokenized documents once and builds the window intervals of every term of the dictionary.
+        Tokens that are not part of the dictionary keep their position in the windows, but are not indexed.
+
+        Args:
+            processed_texts: The tokenized documents (an iterable).
+            dictionary: The dictionary of the topic models.
+            window_size: The size of the sliding window.
+
+        Returns:
+            The index.
+        """
+        token2id = dictionary.token2id
+
+        # The documents are iterated once, so processed_texts can be a generator.
+        encoded_texts = [np.fromiter((token2id.get(token, -1) for token in text), dtype=np.int32, count=len(text))
+                         for text in processed_texts]
+        lengths = np.fromiter((len(text) for text in encoded_texts), dtype=np.int64, count=len(encoded_texts))
+        token_ids = np.concatenate(encoded_texts).astype(np.int64) if encoded_texts else np.zeros(0, dtype=np.int64)
+        del encoded_texts
+
+        # Like gensim, a document that is shorter than the window (or empty) is a single window.
+        doc_windows = np.maximum(lengths - window_size + 1, 1)
+        window_offsets = np.concatenate(([0], np.cumsum(doc_windows)))
+        token_offsets = np.concatenate(([0], np.cumsum(lengths)))
+
+        doc_of_token = np.repeat(np.arange(len(lengths)), lengths)
+        positions = np.arange(len(token_ids)) - token_offsets[doc_of_token]
+
+        in_dictionary = token_ids >= 0
+        token_ids = token_ids[in_dictionary]
+        doc_of_token = doc_of_token[in_dictionary]
+        positions = positions[in_dictionary]
+
+        # Sort the tokens by term and position in the corpus, i.e. by term, document and position in the document.
+        n_tokens = max(len(in_dictionary), 1)
+        keys = token_ids * n_tokens + token_offsets[doc_of_token] + positions
+        order = np.argsort(keys, kind="stable")
+        keys = keys[order]
+        token_ids = token_ids[order]
+        doc_of_token = doc_of_token[order]
+        positions = positions[order]
+
+        # A token enters the first window that contains it and is removed from the window set after the first
+        # occurrence of the term at or after the beginning of that window.
+        first_window = np.maximum(positions - window_size + 1, 0)
+        first_occurrence = np.searchsorted(keys, token_ids * n_tokens + token_offsets[doc_of_token] + first_window)
+        last_window = np.minimum(positions[first_occurrence] + 1, doc_windows[doc_of_token])
+
+        starts = window_offsets[doc_of_token] + first_window
+        ends = window_offsets[doc_of_token] + last_window
+
+        # Both starts and ends are non-decreasing per term, so overlapping intervals are neighbours and can be merged.
+        new_interval = np.ones(len(starts), dtype=bool)
+        new_interval[1:] = (token_ids[1:] != token_ids[:-1]) | (starts[1:] > ends[:-1])
+        interval_starts = np.flatnonzero(new_interval)
+        interval_ends = np.append(interval_starts[1:], len(starts)) - 1
+
+        word_offsets = np.searchsorted(token_ids[interval_starts], np.arange(len(dictionary) + 1))
+
+        return cls(word_offsets, starts[interval_starts], ends[interval_ends], int(window_offsets[-1]), window_size)
+
+    @classmethod
+    def load(cls, path: str) -> 'CoherenceIndex':
+        """
+        This method reads an index that was saved with save().
+
+        Args:
+            path: The path and filename of the index (.npz).
+
+        Returns:
+            The index.
+        """
+        with np.load(path) as data:
+            index = cls(data["word_offsets"], data["starts"], data["ends"], int(data["num_windows"]),
+                        int(data["window_size"]))
+            index.co_occurrence_cache = dict(zip(map(tuple, data["cached_pairs"].tolist()),
+                                                 data["cached_counts"].tolist()))
+        return index
+
+    def save(self, path: str) -> None:
+        """
+        This method saves the index and the cached co-occurrence counts as numpy archive.
+
+        Args:
+            path: The path and filename of the index (.npz).
+        """
+        np.savez(path, word_offsets=self.word_offsets, starts=self.starts, ends=self.ends,
+                 num_windows=self.num_windows, window_size=self.window_size,
+                 cached_pairs=np.array(list(self.co_occurrence_cache), dtype=np.int64).reshape(-1, 2),
+                 cached_counts=np.array(list(self.co_occurrence_cache.values()), dtype=np.int64))
+
+    def co_occurrences(self, word_id1: int, word_id2: int) -> int:
+        """
+        This method returns the number of windows that contain both terms. The count is cached.
+
+        Args:
+            word_id1: The dictionary id of the first term.
+            word_id2: The dictionary id of the second term.
+
+        Returns:
+            The number of windows.
+        """
+        if word_id1 == word_id2:
+            return int(self.occurrences[word_id1])
+
+        pair = (word_id1, word_id2) if word_id1 < word_id2 else (word_id2, word_id1)
+        count = self.co_occurrence_cache.get(pair)
+
+        if count is None:
+            first = slice(self.word_offsets[pair[0]], self.word_offsets[pair[0] + 1])
+            second = slice(self.word_offsets[pair[1]], self.word_offsets[pair[1] + 1])
+
+            # |A ∩ B| = |A| + |B| - |A ∪ B|. The union is measured by sweeping over the intervals ordered by start.
+            starts = np.concatenate((self.starts[first], self.starts[second]))
+            ends = np.concatenate((self.ends[first], self.ends[second]))
+            order = np.argsort(starts, kind="stable")
+            starts = starts[order]
+            ends = ends[order]
+            covered = np.maximum.accumulate(ends)
+            covered = np.concatenate(([0], covered[:-1]))
+            union = int(np.maximum(ends - np.maximum(starts, covered), 0).sum())
+
+            count = int(self.occurrences[pair[0]] + self.occurrences[pair[1]]) - union
+            self.co_occurrence_cache[pair] = count
+
+        return count
+
+    def topic_coherences(self, topics: list) -> list:
+        """
+        This method calculates the coherence C_V of every topic: The normalized pointwise mutual information (NPMI) of all
+        pairs of top words forms the context vectors. The coherence of a topic is the mean cosine similarity between the
+        context vector of every top word and the context vector of all top words (one-set segmentation).
+
+        Args:
+            topics: The dictionary ids of the top words of every topic.
+
+        Returns:
+            The coherence of every topic.
+        """
+        num_windows = float(self.num_windows)
+        topic_coherences = []
+
+        for topic in topics:
+            topic = [int(word_id) for word_id in topic]
+            counts = np.array([[self.co_occurrences(w_i, w_j) for w_j in topic] for w_i in topic], dtype=np.float64)
+            probabilities = counts.diagonal() / num_windows
+
+            with np.errstate(divide="ignore", invalid="ignore"):
+                co_probabilities = counts / num_windows + CoherenceIndex.EPSILON
+                npmi = np.log(co_probabilities / np.outer(probabilities, probabilities)) / -np.log(co_probabilities)
+
+                topic_vector = npmi.sum(axis=0)
+                similarities = npmi @ topic_vector / (np.linalg.norm(npmi, axis=1) * np.linalg.norm(topic_vector))
+
+            topic_coherences.append(float(np.mean(similarities)))
+
+        return topic_coherences
+
+    def coherence(self, model: LdaModel, topn: int = 20) -> float:
+        """
+        This method calculates the coherence C_V of a topic model, i.e. the mean coherence of its topics. It returns the
+        same value as CoherenceModel(model=model, texts=processed_texts, coherence='c_v', topn=topn).get_coherence().
+
+        Args:
+            model: The topic model. Its dictionary has to be the dictionary of the index.
+            topn: The number of top words per topic.
+
+        Returns:
+            The coherence of the model.
+        """
+        topics = [matutils.argsort(topic, topn=topn, reverse=True) for topic in model.get_topics()]
+        return float(np.mean(self.topic_coherences(topics)))
@@ -2,11 +2,15 @@ import csv
 import os
 from collections import Counter, defaultdict
 from corpus_manager import CorpusManager
+from instrumentation import instrumentation
 import json
 from datetime import datetime
 from sklearn.feature_extraction.text import TfidfVectorizer
 from nltk import bigrams
 import pandas as pd
+import numpy as np
+from scipy import sparse
+from vocabulary import Vocabulary
 
 
 
@@ -21,7 +25,12 @@ class CorpusAnalyzer(CorpusManager):
         """
         self.corpus = corpus_manager.corpus
         self.name = corpus_manager.name
+        self.vocabulary = corpus_manager.vocabulary
 
+        # The fitted tfidf matrix of the corpus (see fit_tfidf()).
+        self._tfidf_cache = None
+
+    @instrumentation.instrument()
     def mine_term_frequency(self, output_path: str = "data_outputs/term_frequency.csv") -> None:
         """
         This method calculates the TF in a corpus, that is already tokenized. The calculated frequencies are serialized
@@ -35,13 +44,15 @@ class CorpusAnalyzer(CorpusManager):
         for doc in self.corpus:
             term_counter.update(self.corpus[doc]['processed_text'])
 
-        sorted_terms = term_counter.most_common()
+        # Encoded documents are counted by term ids, which are decoded afterward.
+        sorted_terms = [(self.vocabulary.term(term), frequency) for term, frequency in term_counter.most_common()]
 
         with open(output_path, mode='w', newline='', encoding='utf-8') as file:
             writer = csv.writer(file)
             writer.writerow(['Term', 'Frequency'])
             writer.writerows(sorted_terms)
 
+    @instrumentation.instrument()
     def calculate_term_relevance(self, term: str) -> None:
         """
         This method calculates the tfidf for a given term and saves it in the corpus. The tfidf is saved under the key
@@ -50,33 +61,108 @@ class CorpusAnalyzer(CorpusManager):
         Args:
             term: The term for which the tfidf is calculated.
         """
+        self.calculate_term_relevances([term])
+
+    @instrumentation.instrument()
+    def calculate_term_relevances(self, terms: list) -> None:
+        """
+        This method calculates the tfidf for several terms at once and saves it in the corpus. The tfidf is saved under
+        the key f"relevance_{term}" for every document. The tfidf matrix of the corpus is fitted only once and cached
+        (see fit_tfidf()), the values of all terms are extracted with a single column slice.
+
+        Args:
+            terms: The terms for which the tfidf is calculated.
+        """
+        tfidf_matrix, term_index, keys = self.fit_tfidf()
+
+        # check if the terms are part of the vocabulary
+        found_terms = []
+        for term in terms:
+            if term in term_index:
+                found_terms.append(term)
+            else:
+                print(f"Term '{term}' not found")
+
+        if not found_terms:
+            return None
+
+        # Extract the tfidf for all terms from the matrix.
+        tfidf_values = tfidf_matrix[:, [term_index[term] for term in found_terms]].toarray().tolist()
+
+        # save the term relevance for every document in the corpus.
+        for doc_i, doc in enumerate(keys):
+            for term_i, term in enumerate(found_terms):
+                self.corpus[doc][f"relevance_{term}"] = tfidf_values[doc_i][term_i]
+
+    @instrumentation.instrument()
+    def fit_tfidf(self) -> tuple:
+        """
+        This method fits the tfidf of the corpus. The result is cached and only fitted again, if documents were added or
+        removed or a processed text was replaced since the last call. Call invalidate_tfidf() after modifying a processed
+        text in place.
+
+        Returns:
+            A tuple with the tfidf matrix (scipy.sparse.csc_matrix, one row per document), a dictionary that maps every
+            term to its column and the list of document keys in the order of the rows.
+        """
+        if self._tfidf_cache is not None and self._tfidf_is_current(self._tfidf_cache[0]):
+            return self._tfidf_cache[1:]
 
-        # Extract documents
-        corpus = [self.corpus[doc]['processed_text'] for doc in self.corpus]
+        keys = list(self.corpus.keys())
 
         # Join tokens
-        corpus_as_strings = [' '.join(tokens) for tokens in corpus]
+        corpus_as_strings = [' '.join(self.get_tokens(doc)) for doc in keys]
 
         vectorizer = TfidfVectorizer()
 
-        # Fitting und Transformation
-        tfidf_matrix = vectorizer.fit_transform(corpus_as_strings)
+        # Fitting und Transformation. The matrix is converted to the column format for fast column slices.
+        tfidf_matrix = vectorizer.fit_transform(corpus_as_strings).tocsc()
 
-        # Extract terms
-        terms = vectorizer.get_feature_names_out()
+        # Map the terms to their columns
+        term_index = {term: i for i, term in enumerate(vectorizer.get_feature_names_out())}
 
-        # check if term is part of the vocabulary
-        if term not in terms:
-            print(f"Term '{term}' not found")
-            return None
+        self._tfidf_cache = (self._tfidf_fingerprint(), tfidf_matrix, term_index, keys)
 
-        # Extract the tfidf for the term from the matrix.
-        tfidf_values = tfidf_matrix[:, terms.tolist().index(term)].todense().tolist()
+        return tfidf_matrix, term_index, keys
 
-        # save the term relevance for every document in the corpus.
-        for doc_i, doc in enumerate(self.corpus.keys()):
-            self.corpus[doc][f"relevance_{term}"] = tfidf_values[doc_i][0]
+    def invalidate_tfidf(self) -> None:
+        """
+        This method discards the cached tfidf matrix.
+        """
+        self._tfidf_cache = None
+
+    def _tfidf_fingerprint(self) -> list:
+        """
+        A helper method for fit_tfidf(). Records the current state of the processed texts by the keys of the documents,
+        their processed texts and the lengths of the processed texts. The processed texts themselves are kept, so they
+        can be compared by identity; the ids of released objects could be reused by new ones.
+
+        Returns:
+            The fingerprint of the corpus, a list of tuples (key, processed text, length).
+        """
+        return [(doc, doc_data['processed_text'], len(doc_data['processed_text']))
+                for doc, doc_data in self.corpus.items()]
 
+    def _tfidf_is_current(self, fingerprint: list) -> bool:
+        """
+        A helper method for fit_tfidf(). Checks whether the corpus is still in the state of a fingerprint, i.e. it
+        consists of the same documents in the same order and every processed text is the same object with the same
+        length as before.
+
+        Args:
+            fingerprint: The fingerprint (see _tfidf_fingerprint()).
+
+        Returns:
+            True, if the fingerprint matches the corpus.
+        """
+        if len(fingerprint) != len(self.corpus):
+            return False
+
+        return all(doc == cached_doc and doc_data['processed_text'] is processed_text
+                   and len(processed_text) == length
+                   for (doc, doc_data), (cached_doc, processed_text, length) in zip(self.corpus.items(), fingerprint))
+
+    @instrumentation.instrument()
     def calculate_temporal_term_occurrence(self, output_filename='term_occurrence.json') -> None:
         """
         This method generates a json file which term salience within every quarter year for the data dashboard.
@@ -97,7 +183,7 @@ class CorpusAnalyzer(CorpusManager):
             document_date = doc_data.get('document_date')
             processed_text = doc_data.get('processed_text', [])
 
-            if document_date and processed_text:
+            if document_date and len(processed_text) > 0:
                 # Get year and quarter from document_date
                 year = document_date.year
                 quarter = (document_date.month - 1) // 3 + 1
@@ -109,7 +195,7 @@ class CorpusAnalyzer(CorpusManager):
 
         # Convert the term_occurrence dictionary into a list of dictionaries for JSON export
         json_data = [
-            {"term": term, "date": year_quarter, "count": count}
+            {"term": self.vocabulary.term(term), "date": year_quarter, "count": count}
             for year_quarter, terms in term_occurrence.items()
             for term, count in terms.items()
         ]
@@ -120,14 +206,124 @@ class CorpusAnalyzer(CorpusManager):
 
         print(f"Term occurrence data has been saved to 'data_outputs/{output_filename}'")
 
+    @instrumentation.instrument()
+    def calculate_temporal_term_matrix(self, period: str = 'quarter', output_filename: str = 'term_occurrence.csv',
+                                       output_format: str = 'csv') -> tuple:
+        """
+        This method counts the occurrences of every term per period for the data dashboard. In contrast to
+        calculate_temporal_term_occurrence(), the corpus is not sorted and the counts are not incremented token by token.
+        The periods and terms are mapped to integer ids and the occurrences of all documents are accumulated at once in a
+        sparse term-period matrix. Documents without valid datetime or processed text are ignored.
+
+        The result is saved in data_outputs in one of the following formats:
+            'csv': One row per term and period with the columns term, date and count, ordered by date.
+            'columnar': A json file with the list of terms, the list of periods and the columns term, date and count
+                of all non-zero entries, which contain the index of the term and period.
+
+        Args:
+            period: The length of a period, i.e. 'month' (YYYY-MM), 'quarter' (YYYY-Qn) or 'year' (YYYY).
+            output_filename: The filename for the output file or None, if the result shall not be saved.
+            output_format: The format of the output file, i.e. 'csv' or 'columnar'.
+
+        Returns:
+            A tuple with the term-period matrix (scipy.sparse.csr_matrix), the list of terms in the order of the rows and
+            the list of periods in the order of the columns.
+        """
+        period_labels = {
+            'month': lambda date: f"{date.year}-{date.month:02d}",
+            'quarter': lambda date: f"{date.year}-Q{(date.month - 1) // 3 + 1}",
+            'year': lambda date: f"{date.year}"
+        }
+        if period not in period_labels:
+            raise ValueError(f"Unknown period '{period}', choose 'month', 'quarter' or 'year'.")
+        if output_format not in ('csv', 'columnar'):
+            raise ValueError(f"Unknown output format '{output_format}', choose 'csv' or 'columnar'.")
+
+        period_label = period_labels[period]
+        period_ids = {}
+        # Encoded documents are counted by their term ids. Terms of string documents that are not part of the
+        # vocabulary get ids after the vocabulary, so the shared vocabulary is not modified.
+        term2id = self.vocabulary.term2id
+        new_terms = {}
+
+        token_arrays = []
+        count_arrays = []
+        document_periods = []
+
+        for doc_data in self.corpus.values():
+            document_date = doc_data.get('document_date')
+            processed_text = doc_data.get('processed_text', [])
+
+            if not isinstance(document_date, datetime) or len(processed_text) == 0:
+                continue
+
+            if Vocabulary.is_encoded(processed_text):
+                token_ids = np.asarray(processed_text, dtype=np.int64)
+                counts = np.ones(len(token_ids), dtype=np.int64)
+            else:
+                # Strings are counted per document first, so only the distinct terms have to be mapped to ids.
+                term_counts = Counter(processed_text)
+                token_ids = np.fromiter(
+                    (term2id[term] if term in term2id else
+                     new_terms.setdefault(term, len(self.vocabulary) + len(new_terms)) for term in term_counts),
+                    dtype=np.int64, count=len(term_counts))
+                counts = np.fromiter(term_counts.values(), dtype=np.int64, count=len(term_counts))
+
+            token_arrays.append(token_ids)
+            count_arrays.append(counts)
+            document_periods.append(period_ids.setdefault(period_label(document_date), len(period_ids)))
+
+        n_terms = len(self.vocabulary) + len(new_terms)
+
+        if token_arrays:
+            token_ids = np.concatenate(token_arrays)
+            counts = np.concatenate(count_arrays)
+            token_periods = np.repeat(np.array(document_periods, dtype=np.int64),
+                                      [len(token_array) for token_array in token_arrays])
+        else:
+            token_ids = counts = token_periods = np.zeros(0, dtype=np.int64)
+
+        # Duplicate entries of the coordinate format are summed up by the conversion.
+        matrix = sparse.coo_matrix((counts, (token_ids, token_periods)), shape=(n_terms, len(period_ids))).tocsr()
+
+        # Keep the terms that occur in a dated document and order the periods chronologically.
+        periods = sorted(period_ids)
+        occurring_terms = np.flatnonzero(matrix.getnnz(axis=1))
+        matrix = matrix[occurring_terms][:, [period_ids[label] for label in periods]]
+
+        id2term = self.vocabulary.id2term + list(new_terms)
+        terms = [id2term[term_id] for term_id in occurring_terms]
+
+        if output_filename is not None:
+            entries = matrix.tocsc().tocoo()
+            output_path = os.path.join("data_outputs", output_filename)
+
+            if output_format == 'csv':
+                with open(output_path, mode='w', newline='', encoding='utf-8') as file:
+                    writer = csv.writer(file)
+                    writer.writerow(['term', 'date', 'count'])
+                    writer.writerows(zip((terms[row] for row in entries.row.tolist()),
+                                         (periods[column] for column in entries.col.tolist()),
+                                         entries.data.tolist()))
+            else:
+                with open(output_path, 'w', encoding='utf-8') as json_file:
+                    json.dump({"terms": terms, "periods": periods, "term": entries.row.tolist(),
+                               "date": entries.col.tolist(), "count": entries.data.tolist()},
+                              json_file, ensure_ascii=False)
+
+            print(f"Term occurrence data has been saved to '{output_path}'")
+
+        return matrix, terms, periods
+
+    @instrumentation.instrument()
     def calculate_cooccurrence(self) -> None:
         """
         This method calculates all possible 2-Gram of a given corpus and serializes the result as csv.
         """
         temp = []
 
-        for value in self.corpus.values():
-            temp += value.get('processed_text')
+        for doc in self.corpus:
+            temp += self.get_tokens(doc)
 
         bi_grams = list(bigrams(temp))
 
@@ -141,3 +337,84 @@ class CorpusAnalyzer(CorpusManager):
         cooccurrence = pd.concat([cooccurrence, pd.DataFrame(rows)], ignore_index=True)
 
         cooccurrence.to_csv("data_outputs/cooccurrence.csv", index=False)
+
+    @instrumentation.instrument()
+    def count_cooccurrences(self, window: int = 2, min_count: int = 1,
+                            output_path: str = "data_outputs/cooccurrence_counts.csv", buffer_size: int = 10000000) -> None:
+        """
+        This method counts the co-occurrences of terms within every document and serializes them as csv or parquet file.
+        In contrast to calculate_cooccurrence(), the documents are not concatenated, so no pairs are counted across
+        document boundaries. A pair (a, b) is counted if b follows a at a distance of less than window tokens, i.e. the
+        default window of 2 counts the bigrams of every document.
+        The pairs are counted as integer keys of the term ids. The keys are buffered and aggregated with numpy whenever
+        the buffer is full, hence the memory depends on the number of distinct pairs and not on the number of tokens.
+
+        Args:
+            window: The size of the sliding window (at least 2).
+            min_count: Pairs which occur less often are not saved.
+            output_path: The output path and filename. If it ends with .parquet, a parquet file is written, otherwise a
+                csv file.
+            buffer_size: The number of pair keys which are buffered before they are aggregated.
+        """
+        if window < 2:
+            raise ValueError("The window has to contain at least two tokens.")
+
+        term2id = self.vocabulary.term2id
+        new_terms = {}
+
+        pair_keys = np.zeros(0, dtype=np.int64)
+        pair_counts = np.zeros(0, dtype=np.int64)
+        buffer = []
+        buffered = 0
+
+        def aggregate() -> None:
+            nonlocal pair_keys, pair_counts, buffer, buffered
+            keys = np.concatenate([pair_keys] + buffer)
+            counts = np.concatenate([pair_counts] + [np.ones(len(keys) - len(pair_keys), dtype=np.int64)])
+            pair_keys, inverse = np.unique(keys, return_inverse=True)
+            pair_counts = np.bincount(inverse, weights=counts, minlength=len(pair_keys)).astype(np.int64)
+            buffer = []
+            buffered = 0
+
+        for doc_data in self.corpus.values():
+            processed_text = doc_data.get('processed_text', [])
+
+            if Vocabulary.is_encoded(processed_text):
+                token_ids = np.asarray(processed_text, dtype=np.int64)
+            else:
+                token_ids = np.fromiter(
+                    (term2id[term] if term in term2id else
+                     new_terms.setdefault(term, len(self.vocabulary) + len(new_terms)) for term in processed_text),
+                    dtype=np.int64, count=len(processed_text))
+
+            # The pairs of every distance within the window are combined to a single key: first id * 2^32 + second id.
+            for distance in range(1, min(window, len(token_ids))):
+                keys = (token_ids[:-distance] << 32) | token_ids[distance:]
+                buffer.append(keys)
+                buffered += len(keys)
+
+            if buffered >= buffer_size:
+                aggregate()
+
+        aggregate()
+
+        frequent = pair_counts >= min_count
+        pair_keys = pair_keys[frequent]
+        pair_counts = pair_counts[frequent]
+
+        order = np.argsort(-pair_counts, kind="stable")
+        id2term = self.vocabulary.id2term + list(new_terms)
+        first_terms = [id2term[term_id] for term_id in (pair_keys[order] >> 32).tolist()]
+        second_terms = [id2term[term_id] for term_id in (pair_keys[order] & 0xFFFFFFFF).tolist()]
+        counts = pair_counts[order].tolist()
+
+        if output_path.endswith(".parquet"):
+            pd.DataFrame({"Term1": first_terms, "Term2": second_terms, "Count": counts}).to_parquet(output_path,
+                                                                                                   index=False)
+        else:
+            with open(output_path, mode='w', newline='', encoding='utf-8') as file:
+                writer = csv.writer(file)
+                writer.writerow(['Term1', 'Term2', 'Count'])
+                writer.writerows(zip(first_terms, second_terms, counts))
+
+        print(f"{len(counts)} co-occurring pairs have been saved to '{output_path}'")
@@ -0,0 +1,387 @@
+from datetime import datetime
+import numpy as np
+from vocabulary import Vocabulary
+
+
+class CorpusIndex:
+    """
+    This class provides an inverted index of a corpus. Every document gets an integer id (its position in the corpus) and
+    every indexed value is mapped to a sorted postings list, i.e. a numpy array of the ids of the documents that contain
+    the value. Queries therefore only touch the postings of the queried values instead of scanning the whole corpus, and
+    boolean queries are intersections, unions and differences of postings lists (see intersect(), union() and
+    difference()). keys() converts a postings list back to the keys of the documents.
+
+    The index contains:
+        - the trigrams of the lowercased titles for substring queries,
+        - the positions of the terms of the processed texts for term and phrase queries,
+        - the values of the metadata fields, e.g. source_level, type or initiator,
+        - the document dates and all numeric fields (relevance_* and the length of the processed text) as sorted arrays
+          for range queries.
+
+    The index is a snapshot of the corpus. Deleted documents are ignored by keys(), but the index has to be rebuilt after
+    documents were added or their processed texts or metadata were changed. is_current() detects added documents and
+    changed titles, processed texts and indexed relevance values; changes of the other metadata are not detected.
+    """
+
+    METADATA_FIELDS = ("source_level", "source_name", "source_fullname", "type", "initiator")
+
+    def __init__(self, corpus: dict, vocabulary: Vocabulary = None, metadata_fields: tuple = METADATA_FIELDS):
+        """
+        The constructor of the class CorpusIndex.
+
+        Args:
+            corpus: The corpus of a CorpusManager.
+            vocabulary: The vocabulary of the corpus. It is needed, if the processed texts are encoded.
+            metadata_fields: The metadata fields, which are indexed.
+        """
+        self.corpus = corpus
+        self.document_keys = list(corpus.keys())
+        self.all_documents = np.arange(len(self.document_keys), dtype=np.int64)
+
+        # Encoded documents are indexed by their term ids. Terms of string documents are interned by a copy of the
+        # vocabulary, so the ids are the same for both representations and the shared vocabulary is not modified.
+        self.term_vocabulary = Vocabulary(vocabulary.id2term if vocabulary is not None else None)
+
+        # Documents without title field are identified by their key, e.g. the documents of from_documents().
+        self.titles = [doc_data.get('title') or key for key, doc_data in corpus.items()]
+        self.lowercase_titles = [title.lower() for title in self.titles]
+        self.title_postings = self._build_title_postings(self.lowercase_titles)
+
+        self.metadata_postings = {field: {} for field in metadata_fields}
+        dates = []
+        numeric_values = {}
+        token_arrays = []
+
+        for doc_id, doc_data in enumerate(corpus.values()):
+            for field in metadata_fields:
+                value = doc_data.get(field)
+                if value is not None:
+                    self.metadata_postings[field].setdefault(value, []).append(doc_id)
+
+            document_date = doc_data.get('document_date')
+            if isinstance(document_date, datetime):
+                dates.append((np.datetime64(document_date, 'us'), doc_id))
+
+            for field, value in doc_data.items():
+                if field.startswith('relevance_') and isinstance(value, (int, float)):
+                    numeric_values.setdefault(field, []).append((value, doc_id))
+
+            processed_text = doc_data.get('processed_text')
+            if processed_text is not None:
+                numeric_values.setdefault('length', []).append((len(processed_text), doc_id))
+                token_arrays.append(self._encode(processed_text))
+            else:
+                token_arrays.append(np.zeros(0, dtype=np.int64))
+
+        self.metadata_postings = {field: {value: np.array(postings, dtype=np.int64) for value, postings in values.items()}
+                                  for field, values in self.metadata_postings.items()}
+
+        self.date_values, self.date_documents = self._sorted_values(dates, 'datetime64[us]')
+        self.numeric_fields = {field: self._sorted_values(values, np.float64) for field, values in numeric_values.items()}
+
+        self._build_token_postings(token_arrays)
+
+        # The values of the fields that are read by the filter_by_* methods of CorpusManager at build time (see
+        # is_current()). Processed texts are kept themselves, since the ids of released objects could be reused.
+        self.snapshots = {'title': {key: doc_data.get('title') for key, doc_data in corpus.items()},
+                          'processed_text': {key: CorpusIndex._text_state(doc_data) for key, doc_data in corpus.items()}}
+        for field in self.numeric_fields:
+            if field.startswith('relevance_'):
+                self.snapshots[field] = {key: doc_data.get(field) for key, doc_data in corpus.items()}
+
+    @staticmethod
+    def _text_state(doc_data: dict) -> tuple:
+        """
+        A helper method that records the processed text of a document and its length.
+        """
+        processed_text = doc_data.get('processed_text')
+        return processed_text, None if processed_text is None else len(processed_text)
+
+    def is_current(self, corpus: dict, fields: tuple = None) -> bool:
+        """
+        This method checks whether the index still matches a corpus, i.e. the corpus is the indexed corpus, no documents
+        were added and the given fields of no document were changed. Deleted documents do not outdate the index. Only the
+        titles, the processed texts and the indexed relevance values are checked, not the other metadata.
+
+        Args:
+            corpus: The corpus, usually the corpus of the CorpusManager that built the index.
+            fields: The fields to check, i.e. 'title', 'processed_text' or a relevance field. By default, all of them.
+
+        Returns:
+            True, if the index matches the corpus.
+        """
+        if corpus is not self.corpus or not corpus.keys() <= self.snapshots['title'].keys():
+            return False
+
+        for field in (self.snapshots if fields is None else fields):
+            snapshot = self.snapshots.get(field)
+            if snapshot is None:
+                return False
+
+            if field == 'processed_text':
+                for key, doc_data in corpus.items():
+                    processed_text, length = snapshot[key]
+                    if doc_data.get('processed_text') is not processed_text or \
+                            (processed_text is not None and len(processed_text) != length):
+                        return False
+            elif any(doc_data.get(field) != snapshot[key] for key, doc_data in corpus.items()):
+                return False
+
+        return True
+
+    def _encode(self, processed_text) -> np.ndarray:
+        """
+        A helper method for the constructor. Converts a processed text to an array of term ids.
+        """
+        if Vocabulary.is_encoded(processed_text):
+            return np.asarray(processed_text, dtype=np.int64)
+        return np.asarray(self.term_vocabulary.encode(processed_text), dtype=np.int64)
+
+    @staticmethod
+    def _sorted_values(values: list, dtype) -> tuple:
+        """
+        A helper method for the constructor. Sorts pairs of a value and a document id by the value.
+
+        Returns:
+            A tuple with the sorted values and the document ids in the same order.
+        """
+        value_array = np.array([value for value, _ in values], dtype=dtype)
+        documents = np.array([doc_id for _, doc_id in values], dtype=np.int64)
+        order = np.argsort(value_array, kind="stable")
+        return value_array[order], documents[order]
+
+    @staticmethod
+    def _build_title_postings(titles: list) -> dict:
+        """
+        A helper method for the constructor. Maps every trigram of the titles to the ids of the documents that contain it.
+        """
+        postings = {}
+        for doc_id, title in enumerate(titles):
+            for trigram in {title[i:i + 3] for i in range(len(title) - 2)}:
+                postings.setdefault(trigram, []).append(doc_id)
+        return {trigram: np.array(doc_ids, dtype=np.int64) for trigram, doc_ids in postings.items()}
+
+    def _build_token_postings(self, token_arrays: list) -> None:
+        """
+        A helper method for the constructor. Sorts all tokens of the corpus by term, document and position, so the
+        occurrences of a term are the slice token_documents[term_offsets[t]:term_offsets[t + 1]].
+        """
+        lengths = np.array([len(tokens) for tokens in token_arrays], dtype=np.int64)
+        term_ids = np.concatenate(token_arrays) if token_arrays else np.zeros(0, dtype=np.int64)
+        documents = np.repeat(np.arange(len(token_arrays), dtype=np.int64), lengths)
+        positions = np.arange(len(term_ids), dtype=np.int64) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+
+        order = np.lexsort((positions, documents, term_ids))
+        term_ids = term_ids[order]
+
+        self.token_documents = documents[order]
+        self.token_positions = positions[order]
+        n_terms = int(term_ids.max()) + 1 if len(term_ids) else 0
+        self.term_offsets = np.searchsorted(term_ids, np.arange(n_terms + 1))
+        self.max_length = int(lengths.max()) + 1 if len(lengths) else 1
+
+    def _term_id(self, term: str) -> int or None:
+        """
+        A helper method to look up the id of a term in the index.
+        """
+        term_id = self.term_vocabulary.term2id.get(term)
+        if term_id is None or term_id + 1 >= len(self.term_offsets):
+            return None
+        return term_id
+
+    def _occurrences(self, term: str) -> tuple:
+        """
+        A helper method that returns the documents and positions of all occurrences of a term.
+        """
+        term_id = self._term_id(term)
+        if term_id is None:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+        occurrences = slice(self.term_offsets[term_id], self.term_offsets[term_id + 1])
+        return self.token_documents[occurrences], self.token_positions[occurrences]
+
+    def search_title(self, keyword: str, case_sensitive: bool = False) -> np.ndarray:
+        """
+        This method finds the documents whose title contains the keyword. The candidates are the documents that
+        contain all trigrams of the lowercased keyword; only their titles are compared with the keyword.
+
+        Args:
+            keyword: The keyword.
+            case_sensitive: If True, the keyword is case-sensitive.
+
+        Returns:
+            The postings list of the matching documents.
+        """
+        lowercase_keyword = keyword.lower()
+        trigrams = {lowercase_keyword[i:i + 3] for i in range(len(lowercase_keyword) - 2)}
+
+        if trigrams:
+            candidates = CorpusIndex.intersect(*(self.title_postings.get(trigram, np.zeros(0, dtype=np.int64))
+                                                 for trigram in trigrams))
+        else:
+            candidates = self.all_documents
+
+        if case_sensitive:
+            matches = [doc_id for doc_id in candidates.tolist() if keyword in self.titles[doc_id]]
+        else:
+            matches = [doc_id for doc_id in candidates.tolist() if lowercase_keyword in self.lowercase_titles[doc_id]]
+
+        return np.array(matches, dtype=np.int64)
+
+    def search_term(self, term: str) -> np.ndarray:
+        """
+        This method finds the documents whose processed text contains the term.
+
+        Args:
+            term: The term.
+
+        Returns:
+            The postings list of the matching documents.
+        """
+        documents, _ = self._occurrences(term)
+        return CorpusIndex._unique_sorted(documents)
+
+    def search_phrase(self, phrase: list) -> np.ndarray:
+        """
+        This method finds the documents whose processed text contains the terms of the phrase in consecutive positions.
+
+        Args:
+            phrase: The terms of the phrase.
+
+        Returns:
+            The postings list of the matching documents.
+        """
+        if not phrase:
+            return np.zeros(0, dtype=np.int64)
+
+        # An occurrence of the phrase is identified by the document and the position of its first term. The occurrences
+        # of a term are sorted by document and position, so the start positions of every term are sorted as well.
+        starts = []
+        for offset, term in enumerate(phrase):
+            documents, positions = self._occurrences(term)
+            starts.append(documents * self.max_length + positions - offset)
+
+        return CorpusIndex._unique_sorted(CorpusIndex.intersect(*starts) // self.max_length)
+
+    def search_field(self, field: str, value) -> np.ndarray:
+        """
+        This method finds the documents whose metadata field has the given value.
+
+        Args:
+            field: The metadata field, e.g. 'source_level' or 'type'.
+            value: The value.
+
+        Returns:
+            The postings list of the matching documents.
+        """
+        if field not in self.metadata_postings:
+            raise KeyError(f"The field '{field}' is not indexed.")
+        return self.metadata_postings[field].get(value, np.zeros(0, dtype=np.int64))
+
+    def search_dates(self, start: datetime = None, end: datetime = None) -> np.ndarray:
+        """
+        This method finds the documents whose document_date is in the given range.
+
+        Args:
+            start: The first date of the range or None.
+            end: The last date of the range (inclusive) or None.
+
+        Returns:
+            The postings list of the matching documents.
+        """
+        lower = 0 if start is None else np.searchsorted(self.date_values, np.datetime64(start, 'us'), side='left')
+        upper = len(self.date_values) if end is None else \
+            np.searchsorted(self.date_values, np.datetime64(end, 'us'), side='right')
+        return np.sort(self.date_documents[lower:upper])
+
+    def search_range(self, field: str, minimum: float = None, maximum: float = None) -> np.ndarray:
+        """
+        This method finds the documents whose numeric field is in the given range, e.g. the relevance of a term or the
+        length of the processed text ('length').
+
+        Args:
+            field: The numeric field.
+            minimum: The minimal value (inclusive) or None.
+            maximum: The maximal value (inclusive) or None.
+
+        Returns:
+            The postings list of the matching documents.
+        """
+        if field not in self.numeric_fields:
+            raise KeyError(f"The field '{field}' is not indexed.")
+
+        values, documents = self.numeric_fields[field]
+        lower = 0 if minimum is None else np.searchsorted(values, minimum, side='left')
+        upper = len(values) if maximum is None else np.searchsorted(values, maximum, side='right')
+        return np.sort(documents[lower:upper])
+
+    def keys(self, postings: np.ndarray) -> list:
+        """
+        This method converts a postings list to the keys of the documents. Documents that were deleted from the corpus
+        since the index was built are skipped.
+
+        Args:
+            postings: The postings list.
+
+        Returns:
+            The list of keys in the order of the corpus.
+        """
+        return [self.document_keys[doc_id] for doc_id in postings.tolist() if self.document_keys[doc_id] in self.corpus]
+
+    @staticmethod
+    def intersect(*postings) -> np.ndarray:
+        """
+        Static helper method for AND queries. The shortest postings lists are intersected first.
+
+        Args:
+            *postings: The postings lists.
+
+        Returns:
+            The postings list of the documents contained in all postings lists.
+        """
+        postings = sorted(postings, key=len)
+        result = postings[0]
+        for other in postings[1:]:
+            if len(result) == 0:
+                break
+            # Every id of the shorter list is looked up in the longer list by binary search.
+            positions = np.minimum(np.searchsorted(other, result), len(other) - 1)
+            result = result[other[positions] == result] if len(other) else other
+        return result
+
+    @staticmethod
+    def _unique_sorted(values: np.ndarray) -> np.ndarray:
+        """
+        A helper method that removes the duplicates of a sorted array without sorting it again.
+        """
+        if len(values) == 0:
+            return values
+        return values[np.concatenate(([True], values[1:] != values[:-1]))]
+
+    @staticmethod
+    def union(*postings) -> np.ndarray:
+        """
+        Static helper method for OR queries.
+
+        Args:
+            *postings: The postings lists.
+
+        Returns:
+            The postings list of the documents contained in any postings list.
+        """
+        if not postings:
+            return np.zeros(0, dtype=np.int64)
+        return np.unique(np.concatenate(postings))
+
+    @staticmethod
+    def difference(postings: np.ndarray, excluded: np.ndarray) -> np.ndarray:
+        """
+        Static helper method for NOT queries.
+
+        Args:
+            postings: The postings list.
+            excluded: The postings list of the excluded documents.
+
+        Returns:
+            The postings list of the documents which are contained in postings, but not in excluded.
+        """
+        return np.setdiff1d(postings, excluded, assume_unique=True)
@@ -1,8 +1,20 @@
+import glob
+import hashlib
+import multiprocessing
 import os
+import time
 import xml.etree.ElementTree as ET
 from datetime import datetime
 import json
+from array import array
 from sklearn.feature_extraction.text import TfidfVectorizer
+from collections.abc import Mapping
+from concurrent.futures import ProcessPoolExecutor
+from corpus_index import CorpusIndex
+from corpus_store import ColumnarCorpusStore, LazyCorpus
+from corpus_view import CorpusColumns, CorpusView
+from instrumentation import instrumentation, process_peak_rss_mb
+from vocabulary import Vocabulary
 
 class CorpusManager:
     """
@@ -22,28 +34,82 @@ class CorpusManager:
                 "url_polx": (...),
                 "url": d_element.(...),
                 "fulltext": (...)
-                "fulltext_processed": list[str] (optional)
+                "processed_text": list[str] or array('I') of term ids (optional)
                 "relevance_term": float (optional)
     }
     }
+
+    If the processed texts are encoded with encode_processed_text(), every token is stored as id of the term in the
+    object variable vocabulary.
     """
-    def __init__(self, name: str, filename: str, from_xml: bool = True):
+    def __init__(self, name: str, filename: str = None, from_xml: bool = True, streaming: bool = False,
+                 from_binary: bool = False, columns: list = None, lazy: bool = False):
         """
         The constructor of the class CorpusManager.
 
         Args:
             name: The name of the corpus.
-            filename: The filename of the xml document.
+            filename: The filename of the xml document. If None, the corpus is empty (see from_documents()).
+            from_xml: If True, the corpus is loaded from a xml document, otherwise from a serialized json corpus.
+            streaming: If True, the xml document is parsed incrementally instead of building the whole element tree.
+            from_binary: If True, the corpus is loaded from the binary columnar format (see serialize_corpus_binary()).
+            columns: The document fields that are loaded from the binary columnar format. If None, all fields are loaded.
+            lazy: If True, the documents of the binary columnar format are loaded on demand (see LazyCorpus).
         """
 
         self.corpus = {}
         self.name = ""
-
-        if from_xml:
+        self.vocabulary = Vocabulary()
+        # The inverted index of the corpus (see build_index()).
+        self.index = None
+
+        if filename is None:
+            self.name = name
+        elif from_binary:
+            self.deserialize_corpus_from_binary(filename, columns=columns, lazy=lazy)
+        elif from_xml and streaming:
+            self.deserialize_corpus_from_xml_streaming(name, filename)
+        elif from_xml:
             self.deserialize_corpus_from_xml(name, filename)
         else:
             self.deserialize_corpus_from_json(filename)
 
+    @classmethod
+    def from_documents(cls, name: str, documents: dict) -> 'CorpusManager':
+        """
+        This method creates a corpus from documents that are already in memory, e.g. documents that were received by a
+        service instead of being loaded from a file.
+
+        Args:
+            name: The name of the corpus.
+            documents: The documents in the structure of the object variable corpus.
+
+        Returns:
+            The CorpusManager object.
+        """
+        corpus_manager = cls(name)
+        corpus_manager.corpus = documents
+        return corpus_manager
+
+    @classmethod
+    def from_files(cls, name: str, paths: str or list, workers: int = None) -> 'CorpusManager':
+        """
+        This method creates a corpus from several exports, e.g. the daily exports of PolX (see
+        deserialize_corpus_from_files()).
+
+        Args:
+            name: The name of the corpus.
+            paths: A directory, a glob pattern or a list of them.
+            workers: The number of worker processes. If None, all CPUs are used.
+
+        Returns:
+            The CorpusManager object.
+        """
+        corpus_manager = cls(name)
+        corpus_manager.deserialize_corpus_from_files(name, paths, workers)
+        return corpus_manager
+
+    @instrumentation.instrument()
     def deserialize_corpus_from_xml(self, name, filename) -> None:
         """
         A helper method for the constructor. Loads a query serialized as XML. It is assumed that the document is located
@@ -65,41 +131,353 @@ class CorpusManager:
             root = tree.getroot()
 
         except ET.ParseError as e:
-            print(f"XML Parsing Error: {e}")
+            raise ValueError(f"XML Parsing Error in '{xml_file_path}': {e}") from e
 
         # iterate over all document elements
         for d_element in root.findall(".//document"):
+            title = CorpusManager._resolve_title(d_element.findtext("title"), self.corpus)
+            self.corpus[title] = CorpusManager._parse_document_element(d_element, title)
+
+    @instrumentation.instrument()
+    def deserialize_corpus_from_xml_streaming(self, name, filename) -> None:
+        """
+        A helper method for the constructor. Loads a query serialized as XML like deserialize_corpus_from_xml(), but
+        parses the document incrementally. Every document element is discarded as soon as it was incorporated in
+        self.corpus, so the element tree of the whole document is never held in memory. The throughput and the peak
+        memory of the process are printed after the deserialization.
+
+        Args:
+            name: The name of the corpus.
+            filename: The filename of the xml document.
+        """
+        self.corpus = {}
+        self.name = name
+
+        start = time.perf_counter()
+
+        for title, document in CorpusManager.iter_documents_from_xml(filename):
+            self.corpus[title] = document
+
+        elapsed = time.perf_counter() - start
+        documents_per_second = len(self.corpus) / elapsed if elapsed > 0 else float("inf")
+        peak_memory = CorpusManager.peak_memory_mb()
+
+        print(f"{len(self.corpus)} documents deserialized in {elapsed:.2f}s ({documents_per_second:.1f} documents/sec, "
+              f"peak memory: {f'{peak_memory:.1f} MB' if peak_memory is not None else 'unknown'}).")
+
+    @staticmethod
+    def iter_documents_from_xml(filename: str):
+        """
+        This generator parses a query serialized as XML incrementally and yields its documents one at a time. It is
+        assumed that the document is located in the directory ./data . Titles are made unique with the same scheme as
+        in deserialize_corpus_from_xml().
+
+        Args:
+            filename: The filename of the xml document.
+
+        Yields:
+            Tuples of the (unique) title and the document as dictionary.
+        """
+        used_titles = set()
+
+        for element in CorpusManager._iter_document_elements(os.path.join("data/", filename)):
+            title = CorpusManager._resolve_title(element.findtext("title"), used_titles)
+            used_titles.add(title)
+
+            yield title, CorpusManager._parse_document_element(element, title)
+
+    @staticmethod
+    def _iter_document_elements(xml_file_path: str):
+        """
+        Static helper method that parses a xml document incrementally and yields its document elements. Every element is
+        discarded after it was processed by the caller, so the element tree of the whole document is never held in
+        memory.
+
+        Args:
+            xml_file_path: The path and filename of the xml document.
+
+        Yields:
+            The document elements.
+
+        Raises:
+            ValueError: If the xml document is not well-formed, e.g. truncated.
+        """
+        # Stack of the currently open elements. It is used to detach processed documents from their parent element.
+        open_elements = []
+
+        try:
+            for event, element in ET.iterparse(xml_file_path, events=("start", "end")):
+                if event == "start":
+                    open_elements.append(element)
+                    continue
+
+                open_elements.pop()
+
+                if element.tag != "document":
+                    continue
+
+                yield element
+
+                # free the memory of the processed document
+                element.clear()
+                if open_elements:
+                    open_elements[-1].remove(element)
+
+        except ET.ParseError as e:
+            # A truncated or corrupt export must not result in a partial corpus.
+            raise ValueError(f"XML Parsing Error in '{xml_file_path}': {e}") from e
+
+    @staticmethod
+    def _resolve_title(title: str, used_titles) -> str:
+        """
+        Static helper method to avoid collisions of titles. If a title is already used, the first free title of the form
+        "title (i)" with 1 < i < 100 is returned.
+
+        Args:
+            title: The title of the document.
+            used_titles: A container with all titles that are already used.
+
+        Returns:
+            The unique title.
+        """
+        if title in used_titles:
+            for i in range(2, 100):
+                if f"{title} ({i})" in used_titles:
+                    continue
+                else:
+                    title = f"{title} ({i})"
+                    break
+
+        return title
+
+    @staticmethod
+    def _parse_document_element(d_element: ET.Element, title: str) -> dict:
+        """
+        Static helper method to convert a document element of a query serialized as XML to a dictionary.
+
+        Args:
+            d_element: The document element.
+            title: The (unique) title of the document.
+
+        Returns:
+            The document as dictionary.
+        """
+        # instantiate datetime object
+        date_str = d_element.findtext("document_date").strip()
+        date = datetime.strptime(date_str, "%Y-%m-%d") if date_str.strip() else ""
+
+        return {
+            "source_level": d_element.findtext("source_ebene"),
+            "source_name": d_element.findtext("source_name"),
+            "source_fullname": d_element.findtext("source_fullname"),
+            "document_number": d_element.findtext("document_number"),
+            "document_date": date,
+            "initiator": d_element.findtext("initiator"),
+            "type": d_element.findtext("type"),
+            "title": title,
+            "url_polx": d_element.findtext("document_url_polx"),
+            "url": d_element.findtext("document_url"),
+            "fulltext": d_element.findtext("fulltext")
+        }
+
+    @instrumentation.instrument()
+    def deserialize_corpus_from_files(self, name: str, paths: str or list, workers: int = None) -> None:
+        """
+        A helper method for from_files(). Loads several exports, i.e. queries serialized as XML and/or corpora serialized
+        as json (see find_export_files()), and merges them into one corpus. The files are parsed in a process pool and
+        merged in the order of their paths, so the result does not depend on the number of workers.
+        In contrast to the other deserialize_* methods, the documents are not identified by their (resolved) titles, but
+        by their fingerprint (see document_fingerprint()). Hence, the key of a document is the same in every export, and
+        identical documents, e.g. documents that are contained in several exports, are kept only once. The title of a
+        document remains in its field 'title'.
+        The fingerprint ignores the fields that are derived by the preprocessing and analysis. Of several copies of a
+        document, the first copy in the order of the paths is kept, but its derived fields are taken from the first copy
+        with a processed text, e.g. a preprocessed json corpus whose path sorts after the raw xml export. Relevance
+        values are only taken together with the processed text they were calculated from (see _merge_derived_fields()).
+
+        Args:
+            name: The name of the corpus.
+            paths: A directory, a glob pattern or a list of them.
+            workers: The number of worker processes. If None, all CPUs are used; if 1, the files are parsed in the
+                current process.
+
+        Raises:
+            ValueError: If an export cannot be loaded, e.g. a truncated file. A partial corpus is never returned.
+        """
+        self.corpus = {}
+        self.name = name
+
+        files = CorpusManager.find_export_files(paths)
+        if not files:
+            raise FileNotFoundError(f"No exports were found for {paths}.")
+
+        start = time.perf_counter()
+        n_documents = 0
+        n_completed = 0
+
+        def merge(results) -> None:
+            nonlocal n_documents, n_completed
+            for documents in results:
+                for fingerprint, document in documents:
+                    n_documents += 1
+                    kept = self.corpus.setdefault(fingerprint, document)
+                    if kept is not document and CorpusManager._merge_derived_fields(kept, document):
+                        n_completed += 1
+
+        if workers == 1 or len(files) == 1:
+            merge(map(CorpusManager._load_export_file, files))
+        else:
+            # Forked workers do not have to import the modules of the project again.
+            mp_context = multiprocessing.get_context("fork") if "fork" in multiprocessing.get_all_start_methods() \
+                else None
+            with ProcessPoolExecutor(max_workers=min(workers or os.cpu_count() or 1, len(files)),
+                                     mp_context=mp_context) as executor:
+                merge(executor.map(CorpusManager._load_export_file, files))
+
+        print(f"{len(self.corpus)} documents deserialized from {len(files)} files in "
+              f"{time.perf_counter() - start:.2f}s ({n_documents - len(self.corpus)} duplicates removed, "
+              f"{n_completed} documents completed with the processed text of a duplicate).")
+
+    @staticmethod
+    def _merge_derived_fields(kept: dict, duplicate: dict) -> bool:
+        """
+        Static helper method for deserialize_corpus_from_files(). Takes the derived fields (processed_text and
+        relevance_*) of a duplicate, if the kept copy of the document has no processed text yet. The relevance values of
+        the kept copy are replaced as well, since they have to match the processed text.
+
+        Args:
+            kept: The copy of the document that is kept in the corpus. It is updated in place.
+            duplicate: Another copy of the document with the same fingerprint.
+
+        Returns:
+            True, if the derived fields of the duplicate were taken.
+        """
+        if 'processed_text' in kept or 'processed_text' not in duplicate:
+            return False
+
+        for field in [field for field in kept if field.startswith('relevance_')]:
+            del kept[field]
+
+        for field, value in duplicate.items():
+            if field == 'processed_text' or field.startswith('relevance_'):
+                kept[field] = value
+
+        return True
+
+    @staticmethod
+    def find_export_files(paths: str or list) -> list:
+        """
+        Static helper method to find the exports for deserialize_corpus_from_files(). A directory stands for all xml and
+        json files in it. Relative paths refer to the current working directory, e.g. "data/exports" or
+        "data/exports/*.xml". The vocabularies of encoded json corpora are not exports themselves.
+
+        Args:
+            paths: A directory, a glob pattern or a list of them.
+
+        Returns:
+            The sorted list of files.
+        """
+        files = set()
+
+        for pattern in ([paths] if isinstance(paths, str) else paths):
+            if os.path.isdir(pattern):
+                matches = glob.glob(os.path.join(pattern, "*.xml")) + glob.glob(os.path.join(pattern, "*.json"))
+            else:
+                matches = glob.glob(pattern)
+
+            files.update(match for match in matches if os.path.isfile(match) and
+                         not match.endswith("_vocabulary.json"))
+
+        return sorted(files)
+
+    @staticmethod
+    def _load_export_file(path: str) -> list:
+        """
+        Static helper method for deserialize_corpus_from_files(), which is run by the worker processes. Loads the
+        documents of an export. Encoded processed texts of a json corpus are decoded with its vocabulary, because the
+        term ids of different corpora do not match.
+
+        Args:
+            path: The path and filename of the xml or json file.
+
+        Returns:
+            The list of tuples of the fingerprint and the document.
+
+        Raises:
+            ValueError: If the file cannot be read or parsed, e.g. a truncated export. The message names the file.
+        """
+        try:
+            documents = CorpusManager._read_export_file(path)
+        except (OSError, ValueError) as e:
+            raise ValueError(f"The export '{path}' could not be loaded: {e}") from e
+
+        return [(CorpusManager.document_fingerprint(document), document) for document in documents]
+
+    @staticmethod
+    def _read_export_file(path: str) -> list:
+        """
+        Static helper method for _load_export_file(). Reads the documents of an xml or json export.
+
+        Args:
+            path: The path and filename of the xml or json file.
+
+        Returns:
+            The list of documents.
+        """
+        if path.endswith(".json"):
+            with open(path, "r", encoding='utf-8') as f:
+                corpus = CorpusManager.datetime_converter(json.load(f))
+
+            vocabulary = None
+            vocabulary_path = CorpusManager.vocabulary_filename(path)
+            if os.path.exists(vocabulary_path):
+                with open(vocabulary_path, "r", encoding='utf-8') as f:
+                    vocabulary = Vocabulary(json.load(f))
+
+            documents = []
+            for key, doc_data in corpus.items():
+                if vocabulary is not None and 'processed_text' in doc_data:
+                    doc_data['processed_text'] = vocabulary.decode(doc_data['processed_text'])
+                doc_data['title'] = doc_data.get('title') or key
+                documents.append(doc_data)
+        else:
+            documents = [CorpusManager._parse_document_element(element, element.findtext("title"))
+                         for element in CorpusManager._iter_document_elements(path)]
 
-            # use title as key
-            title = d_element.findtext("title")
-
-            # check if title is already used to avoid collisions
-            if title in self.corpus:
-                for i in range(2, 100):
-                    if f"{title} ({i})" in self.corpus:
-                        continue
-                    else:
-                        title = f"{title} ({i})"
-                        break
-
-            # instantiate datetime object
-            date_str = d_element.findtext("document_date").strip()
-            date = datetime.strptime(date_str, "%Y-%m-%d") if date_str.strip() else ""
-
-            self.corpus[title] = {
-                "source_level": d_element.findtext("source_ebene"),
-                "source_name": d_element.findtext("source_name"),
-                "source_fullname": d_element.findtext("source_fullname"),
-                "document_number": d_element.findtext("document_number"),
-                "document_date": date,
-                "initiator": d_element.findtext("initiator"),
-                "type": d_element.findtext("type"),
-                "title": title,
-                "url_polx": d_element.findtext("document_url_polx"),
-                "url": d_element.findtext("document_url"),
-                "fulltext": d_element.findtext("fulltext")
-            }
+        return documents
+
+    @staticmethod
+    def document_fingerprint(doc_data: dict) -> str:
+        """
+        Static helper method to identify a document by its content. The fingerprint is the sha1 hash of all fields of
+        the document besides the fields that are derived by the preprocessing and analysis (processed_text and
+        relevance_*) and the title. Json corpora store the title under which a document was incorporated, which may
+        carry a suffix " (i)" of _resolve_title(). Hence, the fingerprint does not depend on the file, its format, the
+        position of the document or its preprocessing.
+
+        Args:
+            doc_data: The document.
+
+        Returns:
+            The fingerprint as hex string.
+        """
+        content = {field: value.isoformat() if isinstance(value, datetime) else value
+                   for field, value in doc_data.items()
+                   if field not in ('title', 'processed_text') and not field.startswith('relevance_')}
+
+        return hashlib.sha1(json.dumps(content, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def peak_memory_mb():
+        """
+        Static helper method to determine the peak memory (resident set size) of the current process.
+
+        Returns:
+            The peak memory in megabyte or None, if it cannot be determined on the current platform.
+        """
+        return process_peak_rss_mb()
 
+    @instrumentation.instrument()
     def deserialize_corpus_from_json(self, filename: str) -> None:
         """
         A helper method for the constructor. Loads a serialized CorpusManager object. It is assumed that the object is
@@ -116,22 +494,194 @@ class CorpusManager:
         # Apply the datetime parser to convert 'document_date'
         self.corpus = CorpusManager.datetime_converter(self.corpus)
 
-    def serialize_corpus(self, filename: str) -> None:
+        # Restore the encoded processed texts, if the corpus was serialized with a vocabulary.
+        vocabulary_path = os.path.join("data/processed", CorpusManager.vocabulary_filename(filename))
+        if os.path.exists(vocabulary_path):
+            with open(vocabulary_path, "r", encoding='utf-8') as f:
+                self.vocabulary = Vocabulary(json.load(f))
+
+            for doc_data in self.corpus.values():
+                if 'processed_text' in doc_data:
+                    doc_data['processed_text'] = array('I', doc_data['processed_text'])
+
+    @instrumentation.instrument()
+    def serialize_corpus(self, filename: str, indent: int or None = 2) -> None:
         """
-        This method serializes a corpus.
+        This method serializes a corpus. If the processed texts are encoded, they are serialized as lists of term ids and
+        the vocabulary is saved in a second file (see vocabulary_filename()).
 
         Args:
             filename: The filename of the saved object.
+            indent: The indentation of the json document. None results in the most compact document.
         """
         with open(os.path.join("data/processed", filename), "w", encoding='utf-8') as f:
             # Apply the json_converter to ensure 'document_date' is converted to string
             corpus_serialized = CorpusManager.string_converter(self.corpus)
-            json.dump(corpus_serialized, f, ensure_ascii=False, indent=2)
+            json.dump(corpus_serialized, f, ensure_ascii=False, indent=indent, default=CorpusManager.json_default)
+
+        # Restore the datetime objects, so the corpus can still be used (e.g. serialized in the binary format).
+        CorpusManager.datetime_converter(self.corpus)
+
+        vocabulary_path = os.path.join("data/processed", CorpusManager.vocabulary_filename(filename))
+        if self.is_encoded():
+            with open(vocabulary_path, "w", encoding='utf-8') as f:
+                json.dump(self.vocabulary.id2term, f, ensure_ascii=False)
+        elif os.path.exists(vocabulary_path):
+            # Remove the outdated vocabulary of a formerly encoded corpus.
+            os.remove(vocabulary_path)
+
+    @instrumentation.instrument()
+    def serialize_corpus_binary(self, filename: str) -> None:
+        """
+        This method serializes a corpus in the binary columnar format of ColumnarCorpusStore. The metadata fields are
+        saved as columns, the full texts and processed texts as byte and term id buffers with offsets. The processed
+        texts are saved as term ids of the object variable vocabulary.
+
+        Args:
+            filename: The name of the directory of the saved corpus in ./data/processed.
+        """
+        ColumnarCorpusStore.write(os.path.join("data/processed", filename), self.name, self.corpus, self.vocabulary)
+
+    @instrumentation.instrument()
+    def deserialize_corpus_from_binary(self, filename: str, columns: list = None, mmap: bool = True,
+                                       lazy: bool = False, cache_size: int = 1024) -> None:
+        """
+        A helper method for the constructor. Loads a corpus serialized with serialize_corpus_binary(). It is assumed that
+        the corpus is located in the directory ./data/processed. Only the given columns are read from disk. The processed
+        texts are loaded as encoded uint32 arrays; if mmap is True they refer to the memory-mapped file.
+        If lazy is True, self.corpus becomes a LazyCorpus, which reads the fields of a document only when they are
+        accessed and keeps the cache_size most recently used documents in memory.
+
+        Args:
+            filename: The name of the directory of the serialized corpus.
+            columns: The document fields to load. If None, all fields are loaded.
+            mmap: If True, the files are memory-mapped instead of read into memory.
+            lazy: If True, the documents are loaded on demand.
+            cache_size: The number of documents kept in the LRU cache of a LazyCorpus.
+        """
+        store = ColumnarCorpusStore(os.path.join("data/processed", filename), mmap=mmap)
+
+        self.name = store.name
+        self.vocabulary = store.load_vocabulary()
+
+        if lazy:
+            self.corpus = LazyCorpus(store, columns=columns, cache_size=cache_size)
+        else:
+            self.corpus = store.to_corpus(columns)
+
+    def encode_processed_text(self) -> None:
+        """
+        This method encodes the tokenized processed texts of all documents as arrays of term ids (array('I')). The terms
+        are interned in the object variable vocabulary.
+        """
+        for doc_data in self.corpus.values():
+            processed_text = doc_data.get('processed_text')
+            if isinstance(processed_text, list):
+                doc_data['processed_text'] = self.vocabulary.encode(processed_text)
+
+    def decode_processed_text(self) -> None:
+        """
+        This method decodes the processed texts of all documents to lists of strings.
+        """
+        for doc_data in self.corpus.values():
+            processed_text = doc_data.get('processed_text')
+            if Vocabulary.is_encoded(processed_text):
+                doc_data['processed_text'] = self.vocabulary.decode(processed_text)
+
+    def is_encoded(self) -> bool:
+        """
+        This method checks if the processed texts of the corpus are encoded as arrays of term ids.
+
+        Returns:
+            True, if at least one processed text is encoded.
+        """
+        return any(Vocabulary.is_encoded(doc_data.get('processed_text')) for doc_data in self.corpus.values())
+
+    def get_tokens(self, key: str) -> list:
+        """
+        This method returns the processed text of a document as list of strings, regardless of its representation.
+
+        Args:
+            key: The key of the document.
+
+        Returns:
+            The tokenized document.
+        """
+        processed_text = self.corpus[key]['processed_text']
+
+        if Vocabulary.is_encoded(processed_text):
+            return self.vocabulary.decode(processed_text)
+        return processed_text
+
+    @instrumentation.instrument()
+    def build_index(self, metadata_fields: tuple = CorpusIndex.METADATA_FIELDS) -> CorpusIndex:
+        """
+        This method builds an inverted index of the corpus and saves it in the object variable index. The filter_by_*
+        methods use the index instead of scanning the corpus as long as it is present. If documents were added or their
+        titles, processed texts or relevance values were changed since, the filter_by_* methods rebuild the index first
+        (see _current_index()). After other metadata was changed, the index has to be built again manually.
+
+        Args:
+            metadata_fields: The metadata fields, which are indexed.
+
+        Returns:
+            The index.
+        """
+        self.index = CorpusIndex(self.corpus, self.vocabulary, metadata_fields)
+        return self.index
+
+    def view(self) -> CorpusView:
+        """
+        This method creates a non-destructive view of the whole corpus. The view can be filtered with its where_* methods
+        without deleting documents from the corpus, e.g. to compare several thresholds without loading the corpus again.
+
+        Returns:
+            The view of the corpus.
+        """
+        return CorpusView(CorpusColumns(self.corpus))
+
+    def _current_index(self, field: str) -> CorpusIndex or None:
+        """
+        A helper method for the filter_by_* methods. Returns the index and rebuilds it beforehand, if it is outdated
+        with respect to the filtered field (see CorpusIndex.is_current()). Otherwise, added documents would be deleted
+        and changed titles, lengths and relevance values would be read from the outdated index.
+
+        Args:
+            field: The field that is filtered, i.e. 'title', 'processed_text' or a relevance field.
+
+        Returns:
+            The current index or None, if no index was built.
+        """
+        if self.index is not None and not self.index.is_current(self.corpus, (field,)):
+            print("The index is outdated and is built again.")
+            self.build_index(tuple(self.index.metadata_postings))
+        return self.index
 
+    def _delete_all_except(self, postings) -> int:
+        """
+        A helper method for the filter_by_* methods. Deletes all documents which are not contained in a postings list of
+        the index.
+
+        Args:
+            postings: The postings list of the documents to keep.
+
+        Returns:
+            The number of deleted documents.
+        """
+        keys_to_keep = set(self.index.keys(postings))
+        keys_to_delete = [key for key in self.corpus.keys() if key not in keys_to_keep]
+
+        for key in keys_to_delete:
+            del self.corpus[key]
+
+        return len(keys_to_delete)
+
+    @instrumentation.instrument()
     def filter_by_title(self, keyword: str or list, case_sensitive: bool = False) -> None:
         """
         This method filters an object corpus with a given keyword or a list of keywords. An entry in the corpus is
-        deleted if the title does not match the keyword or a keyword in the list, respectively.
+        deleted if the title does not match the keyword or a keyword in the list, respectively. Documents without title
+        field are matched by their key.
 
         Args:
             keyword: The keyword or the list of keywords.
@@ -143,13 +693,20 @@ class CorpusManager:
         if isinstance(keyword, str):
             keyword = [keyword]
 
-        for k in self.corpus.keys():
+        if self._current_index('title') is not None:
+            i = self._delete_all_except(CorpusIndex.union(*(self.index.search_title(kw, case_sensitive)
+                                                            for kw in keyword)))
+            print(f"{i} entries in the corpus were deleted.")
+            return
+
+        for k, doc_data in self.corpus.items():
+            title = doc_data.get('title') or k
 
             if not case_sensitive:
-                if not any(kw.lower() in k.lower() for kw in keyword):
+                if not any(kw.lower() in title.lower() for kw in keyword):
                     keys_to_delete.append(k)
             else:
-                if not any(kw in k for kw in keyword):
+                if not any(kw in title for kw in keyword):
                     keys_to_delete.append(k)
 
         for k in keys_to_delete:
@@ -158,6 +715,7 @@ class CorpusManager:
 
         print(f"{i} entries in the corpus were deleted.")
 
+    @instrumentation.instrument()
     def filter_by_relevance(self, threshold: float, term: str) -> None:
         """
         This method filters an object corpus by the relevance of a given term. We assume, that the relevance of the given term
@@ -170,6 +728,10 @@ class CorpusManager:
         i = 0
         keys_to_delete = []
 
+        if self._current_index(f'relevance_{term}') is not None and f'relevance_{term}' in self.index.numeric_fields:
+            self._delete_all_except(self.index.search_range(f'relevance_{term}', minimum=threshold))
+            return
+
         for key in self.corpus.keys():
             if self.corpus[key][f'relevance_{term}'] < threshold:
                 keys_to_delete.append(key)
@@ -178,6 +740,7 @@ class CorpusManager:
             del self.corpus[k]
             i += 1
 
+    @instrumentation.instrument()
     def filter_by_length(self, threshold: int) -> None:
         """
         This method filters an object corpus by the length. Every document which has fewer tokens than the given threshold will get filtered out.
@@ -188,6 +751,10 @@ class CorpusManager:
         i = 0
         keys_to_delete = []
 
+        if self._current_index('processed_text') is not None and 'length' in self.index.numeric_fields:
+            self._delete_all_except(self.index.search_range('length', minimum=threshold))
+            return
+
         for key in self.corpus.keys():
             if len(self.corpus[key]["processed_text"]) < threshold:
                 keys_to_delete.append(key)
@@ -196,6 +763,37 @@ class CorpusManager:
             del self.corpus[k]
             i += 1
 
+    @staticmethod
+    def vocabulary_filename(filename: str) -> str:
+        """
+        Static helper method to determine the filename of the vocabulary of a serialized corpus.
+
+        Args:
+            filename: The filename of the serialized corpus.
+
+        Returns:
+            The filename of the vocabulary.
+        """
+        return f"{os.path.splitext(filename)[0]}_vocabulary.json"
+
+    @staticmethod
+    def json_default(obj) -> list or dict:
+        """
+        Static helper method for json.dump to serialize encoded processed texts as lists of term ids.
+
+        Args:
+            obj: The object that is not serializable by default.
+
+        Returns:
+            The object as list or dictionary.
+        """
+        if Vocabulary.is_encoded(obj):
+            return obj.tolist()
+        if isinstance(obj, Mapping):
+            # LazyCorpus and LazyDocument
+            return dict(obj)
+        raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
     @staticmethod
     def string_converter(corpus: dict) -> dict:
         """
@@ -1,10 +1,17 @@
-import json
 import os
 import re
-import string
+import time
+from array import array
 from collections import Counter
 from corpus_analyzer import CorpusAnalyzer
 from corpus_manager import CorpusManager
+from instrumentation import instrumentation
+from lemma_cache import LemmaCache
+from multiword_expressions import MultiwordExpressionMatcher
+from preprocessing_pipeline import PreprocessingPipeline
+from token_classifier import TokenClassifier
+from vocabulary import Vocabulary
+import numpy as np
 import spacy
 from nltk.corpus import stopwords
 import nltk
@@ -22,6 +29,18 @@ class CorpusPreprocessor(CorpusManager):
         nltk.download('stopwords')
         german_stop_words = set(stopwords.words('german'))
 
+    # The spacy language model is loaded lazily by load_german_model().
+    german_model_name = 'de_core_news_lg'
+    german_model = None
+
+    # The classification of the terms by clean() is memoized for all corpora.
+    token_classifier = TokenClassifier()
+
+    # Boundaries used to split long documents into chunks for the lemmatization.
+    paragraph_boundary = re.compile(r'(\n\s*\n)')
+    sentence_pattern = re.compile(r'(?:[^.!?]|[.!?]+(?=\S))*[.!?]*\s*')
+    word_pattern = re.compile(r'\S*\s*')
+
     def __init__(self, corpus_manager: CorpusManager):
         """
         The constructor of the class CorpusPreprocessor. We add a new key for the processed corpus to preserve the unprocessed
@@ -33,12 +52,16 @@ class CorpusPreprocessor(CorpusManager):
 
         self.corpus = corpus_manager.corpus
         self.name = corpus_manager.name
+        self.vocabulary = corpus_manager.vocabulary
 
         for doc in self.corpus:
             if 'processed_text' in self.corpus[doc]:
                 break
             self.corpus[doc]['processed_text'] = self.corpus[doc]['fulltext']
 
+        self.lemmatization_throughput = {}
+
+    @instrumentation.instrument()
     def normalize(self) -> None:
         """
         This method normalizes the full text of a document to lowercase.
@@ -46,120 +69,356 @@ class CorpusPreprocessor(CorpusManager):
         for doc in self.corpus:
             self.corpus[doc]['processed_text'] = self.corpus[doc]['processed_text'].lower()
 
-    def tokenize(self) -> None:
+    @instrumentation.instrument()
+    def tokenize(self, encode: bool = False) -> None:
         """
         This method tokenizes the full text of a document by whitespaces. The resulting full text is a list of strings.
+
+        Args:
+            encode: If true, the resulting full text is encoded as array of term ids of the object variable vocabulary.
         """
         for doc in self.corpus:
-            self.corpus[doc]['processed_text'] = self.corpus[doc]['processed_text'].split(" ")
+            tokens = self.corpus[doc]['processed_text'].split(" ")
+            self.corpus[doc]['processed_text'] = self.vocabulary.encode(tokens) if encode else tokens
+
+    @classmethod
+    def load_german_model(cls, max_length: int = 9131400) -> spacy.language.Language:
+        """
+        This method loads the large version of spacy's de_core_news language model. The model is loaded only once and
+        shared as class variable by all instances.
+
+        Args:
+            max_length: Choose max_length, depending on corpus size and available memory.
+
+        Returns:
+            The german language model.
+        """
+        if cls.german_model is None:
+            try:
+                cls.german_model = spacy.load(cls.german_model_name, disable=['parser', 'ner'])
+            except IOError:
+                os.system(f"python -m spacy download {cls.german_model_name}")
+                cls.german_model = spacy.load(cls.german_model_name, disable=['parser', 'ner'])
+
+        # Set maximum document length for the model
+        cls.german_model.max_length = max_length
+
+        return cls.german_model
 
-    def lemmatize(self, remove_stopwords: bool = True, max_length: int = 9131400) -> None:
+    @instrumentation.instrument()
+    def lemmatize(self, remove_stopwords: bool = True, max_length: int = 9131400, batch_size: int = None,
+                  n_process: int = 1, lemma_cache: LemmaCache = None, chunk_size: int = 100000) -> None:
         """
         This method lemmatizes the full text of a document. It uses the large version of spacy's
         de_core_news language model. This method optionally removes stop words utilizing nltk's german stop word list plus
         digits and punctuation marks.
+        The documents are streamed through spacy's nlp.pipe, optionally in batches and distributed over several
+        processes. The throughput is saved in the object variable lemmatization_throughput.
+        Documents longer than chunk_size characters are split at paragraph or sentence boundaries (or at whitespace, if a
+        single sentence is too long) before they are passed to spacy. The lemmas of the chunks are joined afterwards,
+        hence the memory required by spacy depends on chunk_size and not on the length of the longest document.
+        If a LemmaCache is passed, documents whose text was already lemmatized with the same model and parameters are
+        taken from the cache instead of being processed by spacy.
 
         Args:
             remove_stopwords: If true, the method removes the stop words from nltk's german stop word list.
             max_length: Choose max_length, depending on corpus size and available memory.
+            batch_size: The number of chunks which are processed by spacy as one batch.
+            n_process: The number of processes used for the lemmatization.
+            lemma_cache: A LemmaCache for the lemmatized documents.
+            chunk_size: The maximal number of characters which are passed to spacy at once. If None, every document is
+                processed as a whole.
         """
-        try:
-            german_model = spacy.load('de_core_news_lg', disable=['parser', 'ner'])
-        except IOError:
-            os.system("python -m spacy download de_core_news_lg")
-            german_model = spacy.load('de_core_news_lg', disable=['parser', 'ner'])
+        german_model = CorpusPreprocessor.load_german_model(max_length)
 
-        # Set maximum document length for the model
-        german_model.max_length = max_length
+        start = time.perf_counter()
 
+        # Look up all documents in the cache and collect the documents which have to be processed by spacy.
+        cache_keys = {}
+        pending = []
+        cache_parameters = CorpusPreprocessor._lemmatization_parameters(german_model, remove_stopwords, chunk_size)
         for doc in self.corpus:
-            try:
-                # Process the whole document at once
-                current_doc = german_model(self.corpus[doc]['processed_text'])
+            if lemma_cache is None:
+                pending.append(doc)
+                continue
+
+            cache_keys[doc] = LemmaCache.make_key(self.corpus[doc]['processed_text'], *cache_parameters)
+            lemmatized_doc = lemma_cache.get(cache_keys[doc])
+
+            if lemmatized_doc is None:
+                pending.append(doc)
+            else:
+                self.corpus[doc]['processed_text'] = lemmatized_doc
+
+        # Without batch_size, every document (chunk) is processed on its own like a single call of the model.
+        n_tokens = self._lemmatize_batched(german_model, pending, remove_stopwords, batch_size or 1, n_process,
+                                           chunk_size)
+
+        if lemma_cache is not None:
+            for doc in pending:
+                lemma_cache.put(cache_keys[doc], self.corpus[doc]['processed_text'])
+            lemma_cache.commit()
+
+        elapsed = time.perf_counter() - start
+
+        self.lemmatization_throughput = {
+            "documents": len(pending),
+            "cached_documents": len(self.corpus) - len(pending),
+            "tokens": n_tokens,
+            "seconds": elapsed,
+            "documents_per_second": len(pending) / elapsed if elapsed > 0 else 0.0,
+            "tokens_per_second": n_tokens / elapsed if elapsed > 0 else 0.0
+        }
+
+        print(f"Lemmatized {len(pending)} documents with {n_tokens} tokens in {elapsed:.2f}s "
+              f"({self.lemmatization_throughput['documents_per_second']:.1f} documents/sec, "
+              f"{self.lemmatization_throughput['tokens_per_second']:.1f} tokens/sec).")
+
+        if lemma_cache is not None:
+            print(f"{len(self.corpus) - len(pending)} documents were taken from the lemma cache "
+                  f"({lemma_cache.statistics()}).")
+
+    @staticmethod
+    def _lemmatization_parameters(german_model: spacy.language.Language, remove_stopwords: bool,
+                                  chunk_size: int) -> tuple:
+        """
+        Static helper method to collect all parameters which influence the result of the lemmatization. They are used
+        to address the documents in the LemmaCache.
 
-                lemmatized_doc = [token.lemma_ for token in current_doc if
-                                  (token.text.lower() not in CorpusPreprocessor.german_stop_words) and remove_stopwords]
+        Args:
+            german_model: The loaded spacy language model.
+            remove_stopwords: If true, the method removes the stop words from nltk's german stop word list.
+            chunk_size: The maximal number of characters which are passed to spacy at once.
+
+        Returns:
+            A tuple with the name and version of the model, remove_stopwords, chunk_size and a hash of the stop word
+            list.
+        """
+        return (
+            f"{german_model.meta.get('lang')}_{german_model.meta.get('name')}",
+            german_model.meta.get('version'),
+            remove_stopwords,
+            chunk_size,
+            LemmaCache.make_key(' '.join(sorted(CorpusPreprocessor.german_stop_words)))
+        )
+
+    def _lemmatize_batched(self, german_model: spacy.language.Language, documents: list, remove_stopwords: bool,
+                           batch_size: int, n_process: int, chunk_size: int = None) -> int:
+        """
+        A helper method for lemmatize(). Streams the chunks of the given documents through nlp.pipe and writes the
+        lemmatized documents back into the corpus. nlp.pipe preserves the order of the chunks, even if several processes
+        are used, hence all chunks of a document arrive consecutively.
+
+        Args:
+            german_model: The loaded spacy language model.
+            documents: The keys of the documents which are lemmatized.
+            remove_stopwords: If true, the method removes the stop words from nltk's german stop word list.
+            batch_size: The number of chunks which are processed by spacy as one batch.
+            n_process: The number of processes used for the lemmatization.
+            chunk_size: The maximal number of characters which are passed to spacy at once.
+
+        Returns:
+            The number of processed tokens.
+        """
+        n_tokens = 0
 
-                self.corpus[doc]['processed_text'] = ' '.join(lemmatized_doc)
+        chunks = ((chunk, doc) for doc in documents
+                  for chunk in CorpusPreprocessor.split_into_chunks(self.corpus[doc]['processed_text'], chunk_size))
 
-            except MemoryError:
-                # If memory error occurs, process the document in chunks
-                print(f"MemoryError: Processing document '{doc}' in smaller chunks.")
+        current_key = None
+        lemmatized_tokens = []
 
+        for current_chunk, doc in german_model.pipe(chunks, as_tuples=True, batch_size=batch_size,
+                                                    n_process=n_process):
+            if doc != current_key:
+                if current_key is not None:
+                    self.corpus[current_key]['processed_text'] = ' '.join(lemmatized_tokens)
+                current_key = doc
                 lemmatized_tokens = []
-                processed_text = self.corpus[doc]['processed_text']
 
-                # Split the text into chunks of 1000 words each
-                chunk_size = 1000
-                for chunk in range(0, len(processed_text), chunk_size):
-                    chunk_text = processed_text[chunk:chunk + chunk_size]
-                    current_chunk = german_model(chunk_text)
+            n_tokens += len(current_chunk)
+            lemmatized_tokens.extend(CorpusPreprocessor._filter_lemmas(current_chunk, remove_stopwords))
 
-                    lemmatized_chunk = [token.lemma_ for token in current_chunk if
-                                        (
-                                                    token.text.lower() not in CorpusPreprocessor.german_stop_words) and remove_stopwords]
+        if current_key is not None:
+            self.corpus[current_key]['processed_text'] = ' '.join(lemmatized_tokens)
 
-                    lemmatized_tokens.extend(lemmatized_chunk)
+        return n_tokens
 
-                self.corpus[doc]['processed_text'] = ' '.join(lemmatized_tokens)
+    @staticmethod
+    def split_into_chunks(text: str, chunk_size: int = None):
+        """
+        This generator splits a text into chunks of at most chunk_size characters. The text is preferably split at
+        paragraph boundaries, then at sentence boundaries and only as last resort at whitespaces, so no token is cut in
+        half. A single token which is longer than chunk_size is yielded as its own chunk. The concatenation of all
+        chunks equals the text.
+
+        Args:
+            text: The text to split.
+            chunk_size: The maximal number of characters of a chunk. If None, the whole text is yielded.
 
-    def n_gram_inclusion(self) -> None:
+        Yields:
+            The chunks of the text.
         """
-        This method includes Mulitword Expressions into the corpus.
+        if chunk_size is None or len(text) <= chunk_size:
+            yield text
+            return
+
+        chunk = []
+        length = 0
+
+        for segment in CorpusPreprocessor._segments(text, chunk_size):
+            if chunk and length + len(segment) > chunk_size:
+                yield ''.join(chunk)
+                chunk = []
+                length = 0
+            chunk.append(segment)
+            length += len(segment)
+
+        if chunk:
+            yield ''.join(chunk)
+
+    @staticmethod
+    def _segments(text: str, chunk_size: int, level: int = 0):
         """
+        A helper method for split_into_chunks(). Splits a text recursively at paragraph, sentence and word boundaries
+        until every segment is shorter than chunk_size.
+
+        Args:
+            text: The text to split.
+            chunk_size: The maximal number of characters of a segment.
+            level: The current boundary level (0: paragraphs, 1: sentences, 2: words).
 
-        with open('data_preprocessing/MWE.json', 'r', encoding='utf-8') as json_file:
-            MWE = json.load(json_file)
-        with open('data_preprocessing/MWE_reversed.json', 'r', encoding='utf-8') as json_file:
-            MWE_reversed = json.load(json_file)
+        Yields:
+            The segments of the text.
+        """
+        if len(text) <= chunk_size or level > 2:
+            yield text
+            return
+
+        if level == 0:
+            # Attach the blank lines to the preceding paragraph.
+            parts = CorpusPreprocessor.paragraph_boundary.split(text)
+            segments = [''.join(parts[i:i + 2]) for i in range(0, len(parts), 2)]
+        elif level == 1:
+            segments = CorpusPreprocessor.sentence_pattern.findall(text)
+        else:
+            segments = CorpusPreprocessor.word_pattern.findall(text)
+
+        for segment in segments:
+            if segment:
+                yield from CorpusPreprocessor._segments(segment, chunk_size, level + 1)
+
+    @staticmethod
+    def _filter_lemmas(current_doc: spacy.tokens.Doc, remove_stopwords: bool) -> list:
+        """
+        Static helper method to extract the lemmas of a processed document and to filter the stop words.
 
-        mutliword_expressions = []
-        for entry in MWE.values():
-            mutliword_expressions.append(entry)
+        Args:
+            current_doc: The document processed by spacy.
+            remove_stopwords: If true, the method removes the stop words from nltk's german stop word list.
 
-        for key, value in self.corpus.items():
-            new_doc = []
-            skipped = False
-            for i, token in enumerate(value.get('processed_text')):
-                if skipped:
-                    skipped = False
-                    continue
-                if i < len(value.get('processed_text')) - 1:
-                    bigram = [token, value.get('processed_text')[i + 1]]
-                    if bigram in mutliword_expressions:
-                        new_doc.append(MWE_reversed[str(bigram)])
-                        skipped = True
-                    else:
-                        new_doc.append(token)
-                else:
-                    new_doc.append(token)
+        Returns:
+            The list of lemmas.
+        """
+        return [token.lemma_ for token in current_doc if
+                (token.text.lower() not in CorpusPreprocessor.german_stop_words) and remove_stopwords]
+
+    @instrumentation.instrument()
+    def n_gram_inclusion(self, mwe_path: str = 'data_preprocessing/MWE.json',
+                         mwe_reversed_path: str = 'data_preprocessing/MWE_reversed.json',
+                         matcher: MultiwordExpressionMatcher = None) -> None:
+        """
+        This method includes Mulitword Expressions into the corpus. The expressions are compiled into a
+        MultiwordExpressionMatcher, which merges expressions of any length with a greedy longest match.
 
-            self.corpus[key]['processed_text'] = new_doc
+        Args:
+            mwe_path: The path and filename of the Multiword Expressions.
+            mwe_reversed_path: The path and filename of the mapping from the Multiword Expressions to the merged tokens.
+            matcher: An already compiled matcher, which is used instead of the files, e.g. when many small corpora are
+                preprocessed.
+        """
+        if matcher is None:
+            matcher = MultiwordExpressionMatcher.from_files(mwe_path, mwe_reversed_path)
+        encoded_matcher = None
 
-    def clean(self, custom_stopwords: bool = False, remove_rare_terms: int = 1) -> None:
+        for key, value in self.corpus.items():
+            processed_text = value.get('processed_text')
+
+            if Vocabulary.is_encoded(processed_text):
+                if encoded_matcher is None:
+                    encoded_matcher = matcher.encode(self.vocabulary)
+                self.corpus[key]['processed_text'] = array('I', encoded_matcher.merge(processed_text))
+            else:
+                self.corpus[key]['processed_text'] = matcher.merge(processed_text)
+
+    @instrumentation.instrument()
+    def clean(self, custom_stopwords: bool = False, remove_rare_terms: int = 1,
+              stopwords_path: str = "data_preprocessing/stopwords_di_unfiltered.txt") -> None:
         """
-        This method cleans a tokenized corpus.
+        This method cleans a tokenized corpus. The term frequencies are counted and the custom stop words are loaded
+        only once. Every distinct term is classified only once by the token_classifier, so the removed terms are known
+        before the documents are filtered. Afterward, all filters are applied in a single pass over every document:
+        Documents with strings are filtered by a set lookup per token, encoded documents by a boolean mask over the term
+        ids.
 
         Args:
             custom_stopwords: If true, custom stop words will be removed.
             remove_rare_terms: If value>0, terms that occur as often or less than specified, will be removed.
+            stopwords_path: The path and filename of the custom stop word list.
         """
-        for doc in self.corpus:
-            self.corpus[doc]['processed_text'] = [token for token in self.corpus[doc]['processed_text'] if
-                                                  not (all(char in string.punctuation for char in
-                                                           token) or  # Remove all token that are or consist of punctuation marks.
-                                                       token.isdigit() or  # Remove digits.
-                                                       not any(char.isalpha() for char in
-                                                               token) or  # Remove all token who do not contain at least one alphabetic character.
-                                                       "@" in token or  # Remove E-Mail-addresses.
-                                                       "+" in token  # Remove Phonenumbers.
-                                                       )
-                                                  ]
+        stopwords = CorpusPreprocessor.load_custom_stopwords(stopwords_path) if custom_stopwords else set()
+
+        string_documents = []
+        encoded_documents = []
+        for doc, doc_data in self.corpus.items():
+            if Vocabulary.is_encoded(doc_data['processed_text']):
+                encoded_documents.append(doc)
+            else:
+                string_documents.append(doc)
+
+        if string_documents:
+            # A term that passes the token filter is either removed completely or not at all. Hence, its frequency in
+            # the uncleaned corpus equals its frequency at every point of the cleaning and one count suffices.
+            term_counter = Counter()
+            for doc in string_documents:
+                term_counter.update(self.corpus[doc]['processed_text'])
+
+            removed_terms = stopwords | CorpusPreprocessor.token_classifier.noise(term_counter)
+            if remove_rare_terms:
+                removed_terms |= {term for term, freq in term_counter.items() if freq <= remove_rare_terms}
+
+            for doc in string_documents:
+                self.corpus[doc]['processed_text'] = [token for token in self.corpus[doc]['processed_text'] if
+                                                      token not in removed_terms]
+
+        if encoded_documents:
+            token_ids = [np.asarray(self.corpus[doc]['processed_text'], dtype=np.uint32) for doc in encoded_documents]
+
+            removed = CorpusPreprocessor.token_classifier.noise_mask(self.vocabulary).copy()
+            removed[list(self.vocabulary.ids(stopwords))] = True
             if remove_rare_terms:
-                self.remove_rare_terms(n=remove_rare_terms)
-            if custom_stopwords:
-                self.remove_custom_stopwords()
+                term_frequencies = np.bincount(np.concatenate(token_ids), minlength=len(removed))
+                removed |= term_frequencies[:len(removed)] <= remove_rare_terms
+            kept = ~removed
+
+            for doc, document_ids in zip(encoded_documents, token_ids):
+                self.corpus[doc]['processed_text'] = array('I', document_ids[kept[document_ids]].tobytes())
+
+    @staticmethod
+    def is_noise_token(token: str) -> bool:
+        """
+        Static helper method to decide if a token is removed by clean().
+
+        Args:
+            token: The token.
+
+        Returns:
+            True, if the token is noise, i.e. punctuation, a digit, contains no alphabetic character, is an E-Mail
+            address or a phone number (see TokenClassifier).
+        """
+        return CorpusPreprocessor.token_classifier.classify(token)
 
+    @instrumentation.instrument()
     def remove_rare_terms(self, n: int = 1) -> None:
         """
         This method removes all terms that occur as often or less than n in a tokenized, lemmatized and normalized corpus.
@@ -175,9 +434,10 @@ class CorpusPreprocessor(CorpusManager):
 
         # Remove all collected terms
         for doc in self.corpus:
-            self.corpus[doc]['processed_text'] = [token for token in self.corpus[doc]['processed_text'] if
-                                                  token not in singular_terms]
+            self.corpus[doc]['processed_text'] = CorpusPreprocessor._remove_tokens(
+                self.corpus[doc]['processed_text'], singular_terms)
 
+    @instrumentation.instrument()
     def remove_custom_stopwords(self, path: str = "data_preprocessing/stopwords_di_unfiltered.txt") -> None:
         """
         This method removes stop words from a custom stop word list specified by the path parameter. This method ought to
@@ -186,14 +446,45 @@ class CorpusPreprocessor(CorpusManager):
         Args:
             path: The path and filename of the stop word list.
         """
-        with open(path, 'r', encoding='utf-8') as f:
-            stopwords = set(f.read().splitlines())
+        stopwords = CorpusPreprocessor.load_custom_stopwords(path)
+        stopword_ids = self.vocabulary.ids(stopwords)
 
         for doc in self.corpus:
-            self.corpus[doc]['processed_text'] = [token for token in self.corpus[doc]['processed_text'] if
-                                                  token not in stopwords
-                                                  ]
+            processed_text = self.corpus[doc]['processed_text']
+            self.corpus[doc]['processed_text'] = CorpusPreprocessor._remove_tokens(
+                processed_text, stopword_ids if Vocabulary.is_encoded(processed_text) else stopwords)
+
+    @staticmethod
+    def _remove_tokens(processed_text, removed_tokens: set):
+        """
+        Static helper method to remove tokens from a tokenized document while preserving its representation.
+
+        Args:
+            processed_text: The tokenized document as list of strings or array of term ids.
+            removed_tokens: The set of tokens (or term ids) to remove.
+
+        Returns:
+            The filtered document.
+        """
+        if Vocabulary.is_encoded(processed_text):
+            return array('I', [token for token in processed_text if token not in removed_tokens])
+        return [token for token in processed_text if token not in removed_tokens]
+
+    @staticmethod
+    def load_custom_stopwords(path: str = "data_preprocessing/stopwords_di_unfiltered.txt") -> set:
+        """
+        Static helper method to load a custom stop word list with one stop word per line.
+
+        Args:
+            path: The path and filename of the stop word list.
 
+        Returns:
+            The set of stop words.
+        """
+        with open(path, 'r', encoding='utf-8') as f:
+            return set(f.read().splitlines())
+
+    @instrumentation.instrument()
     def pre_clean(self) -> None:
         """
         This method cleans the corpus as full text from not well-formed sentences.
@@ -203,18 +494,34 @@ class CorpusPreprocessor(CorpusManager):
         for doc in self.corpus:
             self.corpus[doc]['processed_text'] = re.sub(pattern, r'\1 \2', self.corpus[doc]['processed_text'])
 
-    def prepare_for_topic_modeling(self) -> None:
+    @instrumentation.instrument()
+    def prepare_for_topic_modeling(self, batch_size: int = None, n_process: int = 1,
+                                   lemma_cache: LemmaCache = None, encode: bool = False,
+                                   checkpoint_dir: str = None) -> None:
         """
         This method prepares a corpus for topic modeling.
+
+        Args:
+            batch_size: The number of documents which are lemmatized by spacy as one batch.
+            n_process: The number of processes used for the lemmatization.
+            lemma_cache: A LemmaCache for the lemmatized documents.
+            encode: If true, the tokenized documents are encoded as arrays of term ids.
+            checkpoint_dir: If given, the steps are run by a PreprocessingPipeline, which saves a checkpoint in this
+                directory after every step and resumes after the last valid checkpoint.
         """
+        if checkpoint_dir is not None:
+            stages = PreprocessingPipeline.topic_modeling_stages(batch_size=batch_size, n_process=n_process,
+                                                                 lemma_cache=lemma_cache, encode=encode)
+            PreprocessingPipeline(self, stages, checkpoint_dir).run()
+            return
 
         self.pre_clean()
 
-        self.lemmatize()
+        self.lemmatize(batch_size=batch_size, n_process=n_process, lemma_cache=lemma_cache)
 
         self.normalize()
 
-        self.tokenize()
+        self.tokenize(encode=encode)
 
         self.n_gram_inclusion()
 
@@ -223,11 +530,19 @@ class CorpusPreprocessor(CorpusManager):
 
 if __name__ == "__main__":
 
+    # Record the resources of every stage of the run and profile it.
+    instrumentation.enable(profile_path="data_outputs/preprocessing_run.prof")
+
     corpus_dateninstitut = CorpusManager(name="dateninstitut", filename="dateninstitut_fulltext.xml", from_xml=True)
 
     corpus_dateninstitut_preprocessor = CorpusPreprocessor(corpus_dateninstitut)
 
-    corpus_dateninstitut_preprocessor.prepare_for_topic_modeling()
+    lemma_cache = LemmaCache("data/processed/lemma_cache.sqlite")
+
+    corpus_dateninstitut_preprocessor.prepare_for_topic_modeling(lemma_cache=lemma_cache,
+                                                                 checkpoint_dir="data/processed/checkpoints")
+
+    lemma_cache.close()
 
     corpus_dateninstitut_analyzer = CorpusAnalyzer(corpus_dateninstitut)
 
@@ -235,3 +550,7 @@ if __name__ == "__main__":
 
     corpus_dateninstitut.serialize_corpus("dateninstitut_full_final.json")
 
+    corpus_dateninstitut.serialize_corpus_binary("dateninstitut_full_final")
+
+    instrumentation.save_report("data_outputs/preprocessing_run_report.json")
+
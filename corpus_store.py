@@ -0,0 +1,472 @@
+import json
+import os
+from collections import OrderedDict
+from collections.abc import Mapping, MutableMapping
+from datetime import datetime, timedelta
+import numpy as np
+from vocabulary import Vocabulary
+
+
+class ColumnarCorpusStore:
+    """
+    This class provides a binary, columnar file format for corpora as alternative to the json serialization of
+    CorpusManager. A corpus is saved as directory that contains one or more numpy files per document field (column):
+
+    manifest.json               the name of the corpus, the number of documents and the kind of every column
+    vocabulary.json             the terms of the token columns, the position of a term is its id
+    <column>.npy                date columns (days since 1970-01-01) and float columns
+    <column>.offsets.npy        string, json and token columns: the start of every document in the buffer
+    <column>.data.npy           string and json columns: the utf-8 encoded values as one byte buffer
+    <column>.ids.npy            token columns: the term ids of all documents as one uint32 buffer
+    <column>.null.npy           string and json columns: True, if the document has no value
+
+    All numpy files are loaded memory-mapped, so only the columns and documents which are actually accessed are read from
+    disk.
+    """
+
+    FORMAT_VERSION = 1
+
+    # Marks documents without date. The loaders of CorpusManager represent them by an empty string.
+    MISSING_DATE = np.iinfo(np.int64).min
+    EPOCH = datetime(1970, 1, 1)
+
+    KEY_COLUMN = "__key__"
+
+    def __init__(self, path: str, mmap: bool = True):
+        """
+        The constructor of the class ColumnarCorpusStore. Opens a saved corpus.
+
+        Args:
+            path: The path of the directory of the corpus.
+            mmap: If True, the numpy files are memory-mapped instead of read into memory.
+        """
+        self.path = path
+        self.mmap_mode = 'r' if mmap else None
+
+        with open(os.path.join(path, "manifest.json"), "r", encoding='utf-8') as f:
+            self.manifest = json.load(f)
+
+        self.name = self.manifest["name"]
+        self.columns = self.manifest["columns"]
+        self.vocabulary = None
+        self._arrays = {}
+        self._keys = None
+
+    def __len__(self) -> int:
+        return self.manifest["n_documents"]
+
+    def keys(self) -> list:
+        """
+        This method returns the keys of all documents in their original order.
+
+        Returns:
+            The list of keys.
+        """
+        if self._keys is None:
+            self._keys = self.read_column(ColumnarCorpusStore.KEY_COLUMN)
+        return self._keys
+
+    def load_vocabulary(self) -> Vocabulary:
+        """
+        This method loads the vocabulary of the token columns.
+
+        Returns:
+            The vocabulary.
+        """
+        if self.vocabulary is None:
+            with open(os.path.join(self.path, "vocabulary.json"), "r", encoding='utf-8') as f:
+                self.vocabulary = Vocabulary(json.load(f))
+        return self.vocabulary
+
+    def _array(self, filename: str) -> np.ndarray:
+        """
+        A helper method to load a numpy file of the corpus only once.
+
+        Args:
+            filename: The filename of the numpy file.
+
+        Returns:
+            The (memory-mapped) array.
+        """
+        if filename not in self._arrays:
+            self._arrays[filename] = np.load(os.path.join(self.path, filename), mmap_mode=self.mmap_mode)
+        return self._arrays[filename]
+
+    def read_value(self, column: str, i: int):
+        """
+        This method reads the value of a single document.
+
+        Args:
+            column: The name of the column.
+            i: The position of the document in the corpus.
+
+        Returns:
+            The value in the representation of CorpusManager.corpus. Token columns are returned as uint32 array that
+            refers to the memory-mapped buffer.
+        """
+        kind = self.columns[column]
+
+        if kind == "tokens":
+            offsets = self._array(f"{column}.offsets.npy")
+            return self._array(f"{column}.ids.npy")[offsets[i]:offsets[i + 1]]
+
+        if kind == "date":
+            days = int(self._array(f"{column}.npy")[i])
+            return "" if days == ColumnarCorpusStore.MISSING_DATE else ColumnarCorpusStore.EPOCH + timedelta(days=days)
+
+        if kind == "float":
+            return float(self._array(f"{column}.npy")[i])
+
+        if self._array(f"{column}.null.npy")[i]:
+            return None
+
+        offsets = self._array(f"{column}.offsets.npy")
+        value = self._array(f"{column}.data.npy")[offsets[i]:offsets[i + 1]].tobytes().decode('utf-8')
+
+        return json.loads(value) if kind == "json" else value
+
+    def has_value(self, column: str, i: int) -> bool:
+        """
+        This method checks if a document has a value in a column.
+
+        Args:
+            column: The name of the column.
+            i: The position of the document in the corpus.
+
+        Returns:
+            False, if the document had no such field when the corpus was saved.
+        """
+        kind = self.columns.get(column)
+
+        if kind is None or column == ColumnarCorpusStore.KEY_COLUMN:
+            return False
+        if kind == "float":
+            return not np.isnan(self._array(f"{column}.npy")[i])
+        if kind == "json":
+            return not self._array(f"{column}.null.npy")[i]
+        return True
+
+    def read_column(self, column: str) -> list:
+        """
+        This method reads the values of all documents of a column.
+
+        Args:
+            column: The name of the column.
+
+        Returns:
+            The list of values.
+        """
+        kind = self.columns[column]
+
+        if kind == "float":
+            return self._array(f"{column}.npy").tolist()
+
+        if kind in ("string", "json"):
+            # Decode the whole buffer at once instead of document by document.
+            offsets = self._array(f"{column}.offsets.npy").tolist()
+            data = self._array(f"{column}.data.npy").tobytes()
+            null = self._array(f"{column}.null.npy")
+            values = []
+            for i in range(len(self)):
+                if null[i]:
+                    values.append(None)
+                    continue
+                value = data[offsets[i]:offsets[i + 1]].decode('utf-8')
+                values.append(json.loads(value) if kind == "json" else value)
+            return values
+
+        return [self.read_value(column, i) for i in range(len(self))]
+
+    def to_corpus(self, columns: list = None) -> dict:
+        """
+        This method loads the corpus as dictionary in the structure of CorpusManager.corpus.
+
+        Args:
+            columns: The columns to load. If None, all columns are loaded.
+
+        Returns:
+            The corpus.
+        """
+        columns = [column for column in self.columns if column != ColumnarCorpusStore.KEY_COLUMN and
+                   (columns is None or column in columns)]
+
+        corpus = {key: {} for key in self.keys()}
+        documents = list(corpus.values())
+
+        for column in columns:
+            for document, value in zip(documents, self.read_column(column)):
+                # Documents without value are stored as NaN (floats) or null (json) and skipped.
+                if (self.columns[column] == "float" and value != value) or \
+                        (self.columns[column] == "json" and value is None):
+                    continue
+                document[column] = value
+
+        return corpus
+
+    @staticmethod
+    def write(path: str, name: str, corpus: dict, vocabulary: Vocabulary) -> None:
+        """
+        This method saves a corpus in the columnar format. Token columns that are lists of strings are encoded with the
+        given vocabulary.
+
+        Args:
+            path: The path of the directory of the corpus.
+            name: The name of the corpus.
+            corpus: The corpus in the structure of CorpusManager.corpus.
+            vocabulary: The vocabulary of the encoded token columns.
+        """
+        os.makedirs(path, exist_ok=True)
+
+        columns = {}
+        for document in corpus.values():
+            for column in document:
+                columns.setdefault(column, None)
+
+        kinds = {ColumnarCorpusStore.KEY_COLUMN: "string"}
+        ColumnarCorpusStore._write_strings(path, ColumnarCorpusStore.KEY_COLUMN, list(corpus.keys()))
+
+        missing = object()
+        for column in columns:
+            values = [document.get(column, missing) for document in corpus.values()]
+            kind = ColumnarCorpusStore._column_kind(column, values, missing)
+            kinds[column] = kind
+
+            if kind == "tokens":
+                ColumnarCorpusStore._write_tokens(path, column, values, missing, vocabulary)
+            elif kind == "date":
+                days = [ColumnarCorpusStore.MISSING_DATE if not isinstance(value, datetime) else
+                        (value - ColumnarCorpusStore.EPOCH).days for value in values]
+                np.save(os.path.join(path, f"{column}.npy"), np.array(days, dtype=np.int64))
+            elif kind == "float":
+                np.save(os.path.join(path, f"{column}.npy"),
+                        np.array([np.nan if value is missing else value for value in values], dtype=np.float64))
+            elif kind == "string":
+                ColumnarCorpusStore._write_strings(path, column, [None if value is missing else value
+                                                                  for value in values])
+            else:
+                ColumnarCorpusStore._write_strings(path, column, [None if value is missing else
+                                                                  json.dumps(value, ensure_ascii=False, default=str)
+                                                                  for value in values])
+
+        with open(os.path.join(path, "vocabulary.json"), "w", encoding='utf-8') as f:
+            json.dump(vocabulary.id2term, f, ensure_ascii=False)
+
+        with open(os.path.join(path, "manifest.json"), "w", encoding='utf-8') as f:
+            json.dump({"format_version": ColumnarCorpusStore.FORMAT_VERSION,
+                       "name": name,
+                       "n_documents": len(corpus),
+                       "columns": kinds}, f, ensure_ascii=False, indent=2)
+
+    @staticmethod
+    def _column_kind(column: str, values: list, missing) -> str:
+        """
+        Static helper method to determine the kind of column from its values.
+
+        Args:
+            column: The name of the column.
+            values: The values of all documents.
+            missing: The marker of documents without value.
+
+        Returns:
+            "tokens", "date", "float", "string" or "json".
+        """
+        present = [value for value in values if value is not missing]
+
+        if present and all(Vocabulary.is_encoded(value) or isinstance(value, list) for value in present) and \
+                (column == "processed_text" or any(Vocabulary.is_encoded(value) for value in present)):
+            return "tokens"
+        if any(isinstance(value, datetime) for value in present) and \
+                all(isinstance(value, datetime) or value == "" for value in present):
+            return "date"
+        if present and all(isinstance(value, float) for value in present):
+            return "float"
+        if all(value is None or isinstance(value, str) for value in present):
+            return "string"
+        return "json"
+
+    @staticmethod
+    def _write_strings(path: str, column: str, values: list) -> None:
+        """
+        Static helper method to save a string column as byte buffer with offsets.
+
+        Args:
+            path: The path of the directory of the corpus.
+            column: The name of the column.
+            values: The values of all documents.
+        """
+        encoded = [b"" if value is None else value.encode('utf-8') for value in values]
+
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(value) for value in encoded], out=offsets[1:])
+
+        np.save(os.path.join(path, f"{column}.offsets.npy"), offsets)
+        np.save(os.path.join(path, f"{column}.data.npy"), np.frombuffer(b"".join(encoded), dtype=np.uint8))
+        np.save(os.path.join(path, f"{column}.null.npy"), np.array([value is None for value in values], dtype=bool))
+
+    @staticmethod
+    def _write_tokens(path: str, column: str, values: list, missing, vocabulary: Vocabulary) -> None:
+        """
+        Static helper method to save a token column as uint32 buffer of term ids with offsets.
+
+        Args:
+            path: The path of the directory of the corpus.
+            column: The name of the column.
+            values: The tokenized documents.
+            missing: The marker of documents without value.
+            vocabulary: The vocabulary used to encode documents that are lists of strings.
+        """
+        encoded = []
+        for value in values:
+            if value is missing:
+                encoded.append(np.zeros(0, dtype=np.uint32))
+            elif Vocabulary.is_encoded(value):
+                encoded.append(np.asarray(value, dtype=np.uint32))
+            else:
+                encoded.append(np.asarray(vocabulary.encode(value), dtype=np.uint32))
+
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(value) for value in encoded], out=offsets[1:])
+
+        np.save(os.path.join(path, f"{column}.offsets.npy"), offsets)
+        np.save(os.path.join(path, f"{column}.ids.npy"),
+                np.concatenate(encoded) if encoded else np.zeros(0, dtype=np.uint32))
+
+
+class LazyCorpus(MutableMapping):
+    """
+    This class provides the documents of a ColumnarCorpusStore with the same Mapping interface as the dictionary
+    CorpusManager.corpus, but loads the fields of a document only when they are accessed. The memory-mapped files and
+    their offset indices are used to read single values, so corpora larger than the available memory can be processed.
+    The most recently used documents are kept in a LRU cache. Changes (new or modified fields, new or deleted documents)
+    are kept in memory and can be saved with CorpusManager.serialize_corpus_binary().
+    """
+
+    def __init__(self, store: ColumnarCorpusStore, columns: list = None, cache_size: int = 1024):
+        """
+        The constructor of the class LazyCorpus.
+
+        Args:
+            store: The opened corpus.
+            columns: The columns which are accessible. If None, all columns are accessible.
+            cache_size: The number of documents kept in the LRU cache.
+        """
+        self.store = store
+        self.columns = [column for column in store.columns if column != ColumnarCorpusStore.KEY_COLUMN and
+                        (columns is None or column in columns)]
+        self.cache_size = cache_size
+
+        # position of every document of the store, in the original order
+        self._positions = {key: i for i, key in enumerate(store.keys())}
+        # documents which were added or replaced after loading
+        self._added = {}
+        # modified and deleted fields of documents of the store
+        self._overlay = {}
+        self._deleted_fields = {}
+        self._cache = OrderedDict()
+
+    def __getitem__(self, key: str) -> MutableMapping:
+        if key in self._added:
+            return self._added[key]
+
+        if key not in self._positions:
+            raise KeyError(key)
+
+        document = self._cache.get(key)
+        if document is None:
+            document = LazyDocument(self, key, self._positions[key])
+            self._cache[key] = document
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        else:
+            self._cache.move_to_end(key)
+
+        return document
+
+    def __setitem__(self, key: str, document: Mapping) -> None:
+        self._cache.pop(key, None)
+        self._added[key] = document
+
+    def __delitem__(self, key: str) -> None:
+        if key not in self._positions and key not in self._added:
+            raise KeyError(key)
+
+        self._positions.pop(key, None)
+        self._added.pop(key, None)
+        self._overlay.pop(key, None)
+        self._deleted_fields.pop(key, None)
+        self._cache.pop(key, None)
+
+    def __iter__(self):
+        yield from self._positions
+        for key in self._added:
+            if key not in self._positions:
+                yield key
+
+    def __len__(self) -> int:
+        return len(self._positions) + sum(1 for key in self._added if key not in self._positions)
+
+    def __contains__(self, key) -> bool:
+        return key in self._positions or key in self._added
+
+
+class LazyDocument(MutableMapping):
+    """
+    This class represents a single document of a LazyCorpus. Every field is read from the store when it is accessed for
+    the first time. Modified fields are saved in the LazyCorpus, so they persist when the document is evicted from the
+    LRU cache.
+    """
+
+    def __init__(self, corpus: LazyCorpus, key: str, position: int):
+        """
+        The constructor of the class LazyDocument.
+
+        Args:
+            corpus: The LazyCorpus of the document.
+            key: The key of the document.
+            position: The position of the document in the store.
+        """
+        self.corpus = corpus
+        self.key = key
+        self.position = position
+        self._values = {}
+
+    def __getitem__(self, field: str):
+        overlay = self.corpus._overlay.get(self.key)
+        if overlay is not None and field in overlay:
+            return overlay[field]
+
+        if field in self._values:
+            return self._values[field]
+
+        if field in self.corpus._deleted_fields.get(self.key, ()) or field not in self.corpus.columns or \
+                not self.corpus.store.has_value(field, self.position):
+            raise KeyError(field)
+
+        value = self.corpus.store.read_value(field, self.position)
+        self._values[field] = value
+        return value
+
+    def __setitem__(self, field: str, value) -> None:
+        self.corpus._overlay.setdefault(self.key, {})[field] = value
+        self.corpus._deleted_fields.get(self.key, set()).discard(field)
+        self._values.pop(field, None)
+
+    def __delitem__(self, field: str) -> None:
+        if field not in self:
+            raise KeyError(field)
+
+        self.corpus._overlay.get(self.key, {}).pop(field, None)
+        self.corpus._deleted_fields.setdefault(self.key, set()).add(field)
+        self._values.pop(field, None)
+
+    def __iter__(self):
+        overlay = self.corpus._overlay.get(self.key, {})
+        deleted = self.corpus._deleted_fields.get(self.key, ())
+
+        for field in self.corpus.columns:
+            if field not in overlay and field not in deleted and self.corpus.store.has_value(field, self.position):
+                yield field
+        yield from overlay
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
@@ -0,0 +1,284 @@
+from collections.abc import Mapping
+from datetime import datetime
+import numpy as np
+
+
+class CorpusColumns:
+    """
+    This class provides a column table of the metadata of a corpus for vectorized filtering. Every column is a numpy
+    array with one entry per document in the order of the corpus. The columns are loaded lazily: The first query that
+    needs a column reads it together with all other missing columns of the query in a single pass over the corpus.
+
+    The following columns are available:
+        - 'title' and 'title_lowercase': The titles of the documents (the keys of documents without title field).
+        - 'length': The number of tokens of the processed text (0, if there is no processed text).
+        - 'relevance_<term>': The relevance of a term (NaN, if it was not calculated for a document).
+        - 'document_date': The document date (NaT, if the date is missing or invalid).
+        - Every other field of the documents as object array (None, if the field is missing).
+
+    The table is a snapshot of the corpus. Create a new table after documents were added or changed.
+    """
+
+    def __init__(self, corpus: Mapping):
+        """
+        The constructor of the class CorpusColumns.
+
+        Args:
+            corpus: The corpus of a CorpusManager.
+        """
+        self.corpus = corpus
+        self.keys = list(corpus.keys())
+        self.positions = {key: position for position, key in enumerate(self.keys)}
+        self.columns = {}
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        self.load([name])
+        return self.columns[name]
+
+    def load(self, names) -> None:
+        """
+        This method loads all missing columns in a single pass over the corpus.
+
+        Args:
+            names: The names of the columns.
+        """
+        missing = [name for name in dict.fromkeys(names) if name not in self.columns]
+
+        load_titles = 'title' in missing or 'title_lowercase' in missing
+        missing = [name for name in missing if name not in ('title', 'title_lowercase')]
+
+        if not load_titles and not missing:
+            return
+
+        titles = []
+        values = {name: [] for name in missing}
+        for key, doc_data in self.corpus.items():
+            if load_titles:
+                titles.append(doc_data.get('title') or key)
+            for name in missing:
+                if name == 'length':
+                    values[name].append(len(doc_data.get('processed_text', ())))
+                else:
+                    values[name].append(doc_data.get(name))
+
+        if load_titles:
+            titles = np.array(titles, dtype=str) if titles else np.zeros(0, dtype=str)
+            self.columns['title'] = titles
+            self.columns['title_lowercase'] = np.char.lower(titles)
+
+        for name, column in values.items():
+            if name == 'length':
+                self.columns[name] = np.array(column, dtype=np.int64)
+            elif name.startswith('relevance_'):
+                self.columns[name] = np.array([np.nan if value is None else value for value in column],
+                                              dtype=np.float64)
+            elif name == 'document_date':
+                self.columns[name] = np.array([value if isinstance(value, datetime) else None for value in column],
+                                              dtype='datetime64[us]')
+            else:
+                object_column = np.empty(len(column), dtype=object)
+                object_column[:] = column
+                self.columns[name] = object_column
+
+
+class CorpusView(Mapping):
+    """
+    This class provides a non-destructive, filtered view of a corpus. In contrast to the filter_by_* methods of
+    CorpusManager, no document is deleted or copied: A view is a read-only mapping from the keys of the selected
+    documents to the documents of the underlying corpus.
+    Views are composed by the where_* methods, which return a new view and leave the original view unchanged. A view is
+    evaluated lazily by a query plan: All columns that are needed by its predicates are loaded in a single pass (see
+    CorpusColumns) and every predicate is a vectorized mask operation over a column. The mask of a view is cached, so
+    several views that refine the same view, e.g. ten relevance thresholds, cost one mask operation each.
+    A view can be passed to CorpusManager.from_documents() to analyze the selected documents.
+    """
+
+    def __init__(self, columns: CorpusColumns, parent: 'CorpusView' = None, predicate: tuple = None):
+        """
+        The constructor of the class CorpusView. Use CorpusManager.view() to create the view of a whole corpus.
+
+        Args:
+            columns: The column table of the corpus.
+            parent: The view that is refined by this view or None.
+            predicate: The predicate of this view, i.e. a tuple of the operation and its arguments.
+        """
+        self.columns = columns
+        self.parent = parent
+        self.predicate = predicate
+        self._mask = None
+
+    @property
+    def plan(self) -> list:
+        """
+        The predicates of the view and all its parents in the order in which they were added.
+        """
+        plan = [] if self.parent is None else self.parent.plan
+        return plan + [self.predicate] if self.predicate is not None else plan
+
+    @property
+    def mask(self) -> np.ndarray:
+        """
+        The boolean mask of the selected documents in the order of the corpus.
+        """
+        if self._mask is None:
+            self.columns.load(CorpusView._required_columns(predicate) for predicate in self.plan)
+
+            mask = np.ones(len(self.columns), dtype=bool) if self.parent is None else self.parent.mask
+            if self.predicate is not None:
+                mask = mask & self._evaluate(self.predicate)
+            self._mask = mask
+
+        return self._mask
+
+    def __getitem__(self, key: str) -> dict:
+        position = self.columns.positions.get(key)
+        if position is None or not self.mask[position]:
+            raise KeyError(key)
+        return self.columns.corpus[key]
+
+    def __iter__(self):
+        keys = self.columns.keys
+        return (keys[position] for position in np.flatnonzero(self.mask).tolist())
+
+    def __len__(self) -> int:
+        return int(np.count_nonzero(self.mask))
+
+    def where_title(self, keyword: str or list, case_sensitive: bool = False) -> 'CorpusView':
+        """
+        This method selects the documents whose title contains the keyword or a keyword in the list, respectively (see
+        CorpusManager.filter_by_title()).
+
+        Args:
+            keyword: The keyword or the list of keywords.
+            case_sensitive: If True, every keyword is treated as case-sensitive.
+
+        Returns:
+            The refined view.
+        """
+        keywords = (keyword,) if isinstance(keyword, str) else tuple(keyword)
+        return CorpusView(self.columns, self, ('title', keywords, case_sensitive))
+
+    def where_relevance(self, threshold: float, term: str) -> 'CorpusView':
+        """
+        This method selects the documents whose relevance of the given term is at least threshold (see
+        CorpusManager.filter_by_relevance()).
+
+        Args:
+            threshold: The minimal relevance.
+            term: The term whose relevance is used.
+
+        Returns:
+            The refined view.
+        """
+        return CorpusView(self.columns, self, ('range', f'relevance_{term}', threshold, None))
+
+    def where_length(self, threshold: int) -> 'CorpusView':
+        """
+        This method selects the documents with at least threshold tokens (see CorpusManager.filter_by_length()).
+
+        Args:
+            threshold: The minimal document length.
+
+        Returns:
+            The refined view.
+        """
+        return CorpusView(self.columns, self, ('range', 'length', threshold, None))
+
+    def where_range(self, field: str, minimum: float = None, maximum: float = None) -> 'CorpusView':
+        """
+        This method selects the documents whose numeric field is in the given range.
+
+        Args:
+            field: The numeric field, e.g. 'length' or 'relevance_<term>'.
+            minimum: The minimal value (inclusive) or None.
+            maximum: The maximal value (inclusive) or None.
+
+        Returns:
+            The refined view.
+        """
+        return CorpusView(self.columns, self, ('range', field, minimum, maximum))
+
+    def where_dates(self, start: datetime = None, end: datetime = None) -> 'CorpusView':
+        """
+        This method selects the documents whose document_date is in the given range. Documents without valid date are
+        not selected.
+
+        Args:
+            start: The first date of the range or None.
+            end: The last date of the range (inclusive) or None.
+
+        Returns:
+            The refined view.
+        """
+        return CorpusView(self.columns, self, ('dates', start, end))
+
+    def where_field(self, field: str, value) -> 'CorpusView':
+        """
+        This method selects the documents whose field has the given value or one of the values in a set, respectively.
+
+        Args:
+            field: The field, e.g. 'source_level' or 'type'.
+            value: The value or a set of values.
+
+        Returns:
+            The refined view.
+        """
+        values = tuple(value) if isinstance(value, (set, frozenset)) else (value,)
+        return CorpusView(self.columns, self, ('field', field, values))
+
+    @staticmethod
+    def _required_columns(predicate: tuple) -> str:
+        """
+        A helper method that returns the column which a predicate reads.
+        """
+        operation = predicate[0]
+        if operation == 'title':
+            return 'title' if predicate[2] else 'title_lowercase'
+        if operation == 'dates':
+            return 'document_date'
+        return predicate[1]
+
+    def _evaluate(self, predicate: tuple) -> np.ndarray:
+        """
+        A helper method that evaluates a predicate over the column table.
+
+        Returns:
+            The boolean mask of the documents which satisfy the predicate.
+        """
+        operation = predicate[0]
+        column = self.columns[CorpusView._required_columns(predicate)]
+
+        if operation == 'title':
+            _, keywords, case_sensitive = predicate
+            mask = np.zeros(len(column), dtype=bool)
+            for keyword in keywords:
+                mask |= np.char.find(column, keyword if case_sensitive else keyword.lower()) >= 0
+            return mask
+
+        if operation == 'range':
+            _, _, minimum, maximum = predicate
+            # Comparisons with NaN are False, hence documents without value are not selected.
+            mask = ~np.isnan(column) if column.dtype.kind == 'f' else np.ones(len(column), dtype=bool)
+            if minimum is not None:
+                mask &= column >= minimum
+            if maximum is not None:
+                mask &= column <= maximum
+            return mask
+
+        if operation == 'dates':
+            _, start, end = predicate
+            mask = ~np.isnat(column)
+            if start is not None:
+                mask &= column >= np.datetime64(start, 'us')
+            if end is not None:
+                mask &= column <= np.datetime64(end, 'us')
+            return mask
+
+        if operation == 'field':
+            _, _, values = predicate
+            return np.isin(column, np.array(values, dtype=object))
+
+        raise ValueError(f"Unknown operation '{operation}'.")
@@ -0,0 +1,293 @@
+import cProfile
+import csv
+import functools
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+
+def process_peak_rss_mb(children: bool = False) -> float or None:
+    """
+    Determines the peak memory (resident set size) of the current process or of its largest terminated child process,
+    e.g. a worker of a process pool, over their whole lifetime. It is not the peak memory of a stage: it only grows and
+    stays at the peak of the heaviest stage so far (see current_rss_mb()).
+
+    Args:
+        children: If True, the peak memory of the child processes is returned.
+
+    Returns:
+        The peak memory in megabyte or None, if it cannot be determined on the current platform.
+    """
+    try:
+        import resource
+    except ImportError:
+        return None
+
+    peak = resource.getrusage(resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF).ru_maxrss
+
+    # ru_maxrss is reported in bytes on macOS and in kilobytes on Linux.
+    if sys.platform == "darwin":
+        return peak / (1024 * 1024)
+    return peak / 1024
+
+
+def current_rss_mb() -> float or None:
+    """
+    Determines the current memory (resident set size) of the current process.
+
+    Returns:
+        The memory in megabyte or None, if it cannot be determined on the current platform (only Linux is supported).
+    """
+    try:
+        with open("/proc/self/statm", "rb") as statm:
+            resident_pages = int(statm.read().split()[1])
+    except (OSError, IndexError, ValueError):
+        return None
+
+    return resident_pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+
+
+def children_cpu_seconds() -> float:
+    """
+    Determines the CPU time of all terminated child processes of the current process.
+
+    Returns:
+        The user and system time of the child processes in seconds.
+    """
+    times = os.times()
+    return times.children_user + times.children_system
+
+
+def corpus_size(obj=None, *args, **kwargs) -> tuple:
+    """
+    Counts the documents and tokens of the corpus of a CorpusManager, CorpusPreprocessor or CorpusAnalyzer. Tokens are
+    only counted for tokenized documents and for corpora that are kept in memory, so lazy corpora are not loaded.
+
+    Args:
+        obj: The object with the object variable corpus.
+        *args: The other positional arguments of the instrumented method. They are ignored.
+        **kwargs: The keyword arguments of the instrumented method. They are ignored.
+
+    Returns:
+        A tuple with the number of documents and the number of tokens (or None).
+    """
+    corpus = getattr(obj, 'corpus', None)
+    if corpus is None:
+        return None, None
+    if not isinstance(corpus, dict):
+        return len(corpus), None
+
+    tokens = 0
+    for doc_data in corpus.values():
+        processed_text = doc_data.get('processed_text')
+        if processed_text is None or isinstance(processed_text, str):
+            return len(corpus), None
+        tokens += len(processed_text)
+
+    return len(corpus), tokens
+
+
+class Instrumentation:
+    """
+    This class records the resource usage of the stages of a run, e.g. the loading, preprocessing and analysis of a
+    corpus and the training of the topic models. For every stage, the wall time, the CPU time (of the process and its
+    terminated child processes), the peak memory, the number of processed documents and tokens and the throughput are
+    recorded. Stages are recorded with the context manager stage() or the decorator instrument(); nested stages are
+    recorded with their depth.
+    The peak memory of a stage is the largest resident set size that was sampled during the stage by a background
+    thread. Short peaks between two samples may be missed; the lifetime peak of the process is recorded as well.
+    The recording is disabled by default, so instrumented methods only pay for a flag check. After enable(), the
+    records are collected and can be saved as run report in json or csv format by save_report(). Optionally, the whole
+    run is profiled by cProfile and the statistics are dumped next to the report.
+    """
+
+    def __init__(self, sample_interval: float = 0.01):
+        """
+        The constructor of the class Instrumentation.
+
+        Args:
+            sample_interval: The interval in seconds in which the memory of the open stages is sampled.
+        """
+        self.enabled = False
+        self.records = []
+        self.profiler = None
+        self.profile_path = None
+        self.sample_interval = sample_interval
+        self._depth = 0
+        self._start = time.perf_counter()
+        # The records of the stages that are currently open. Their peak memory is updated by the sampler thread.
+        self._open_records = []
+        self._sampler = None
+        self._stop_sampler = threading.Event()
+
+    def enable(self, profile_path: str = None) -> None:
+        """
+        This method starts the recording.
+
+        Args:
+            profile_path: If given, the run is profiled by cProfile and the statistics are saved under this path by
+                save_report().
+        """
+        self.enabled = True
+        self.records = []
+        self._start = time.perf_counter()
+
+        if profile_path is not None:
+            self.profile_path = profile_path
+            self.profiler = cProfile.Profile()
+            self.profiler.enable()
+
+        if current_rss_mb() is not None and (self._sampler is None or not self._sampler.is_alive()):
+            self._stop_sampler.clear()
+            self._sampler = threading.Thread(target=self._sample_memory, name="instrumentation-sampler", daemon=True)
+            self._sampler.start()
+
+    def disable(self) -> None:
+        """
+        This method stops the recording, the sampling of the memory and the profiler.
+        """
+        self.enabled = False
+        if self.profiler is not None:
+            self.profiler.disable()
+
+        self._stop_sampler.set()
+        if self._sampler is not None and self._sampler.is_alive():
+            self._sampler.join()
+        self._sampler = None
+
+    def _sample_memory(self) -> None:
+        """
+        The target of the sampler thread. Updates the peak memory of all open stages until the recording is disabled.
+        """
+        while not self._stop_sampler.wait(self.sample_interval):
+            self._update_peak_memory()
+
+    def _update_peak_memory(self) -> None:
+        """
+        A helper method that samples the memory once and updates the peak memory of all open stages.
+        """
+        rss = current_rss_mb()
+        if rss is None:
+            return
+
+        for record in list(self._open_records):
+            if record["peak_rss_mb"] is None or rss > record["peak_rss_mb"]:
+                record["peak_rss_mb"] = rss
+
+    @contextmanager
+    def stage(self, name: str, documents: int = None, tokens: int = None):
+        """
+        This context manager records a stage. The yielded record can be updated within the stage, e.g. with the number
+        of processed documents and tokens, if they are not known beforehand.
+
+        Args:
+            name: The name of the stage.
+            documents: The number of processed documents.
+            tokens: The number of processed tokens.
+
+        Yields:
+            The record of the stage (dict).
+        """
+        record = {"stage": name, "depth": self._depth, "documents": documents, "tokens": tokens}
+
+        if not self.enabled:
+            yield record
+            return
+
+        start_wall = time.perf_counter()
+        start_cpu = time.process_time()
+        start_children_cpu = children_cpu_seconds()
+        self._depth += 1
+
+        record["peak_rss_mb"] = current_rss_mb()
+        self._open_records.append(record)
+
+        try:
+            yield record
+        finally:
+            self._update_peak_memory()
+            self._open_records.remove(record)
+            self._depth -= 1
+            wall_seconds = time.perf_counter() - start_wall
+
+            record.update({
+                "start_seconds": start_wall - self._start,
+                "wall_seconds": wall_seconds,
+                "cpu_seconds": time.process_time() - start_cpu,
+                "children_cpu_seconds": children_cpu_seconds() - start_children_cpu,
+                "process_peak_rss_mb": process_peak_rss_mb(),
+                "process_peak_children_rss_mb": process_peak_rss_mb(children=True),
+                "documents_per_second": record["documents"] / wall_seconds
+                if record["documents"] is not None and wall_seconds > 0 else None,
+                "tokens_per_second": record["tokens"] / wall_seconds
+                if record["tokens"] is not None and wall_seconds > 0 else None
+            })
+            self.records.append(record)
+
+    def instrument(self, name: str = None, size=corpus_size):
+        """
+        This decorator records every call of a function or method as stage.
+
+        Args:
+            name: The name of the stage. By default, the qualified name of the function.
+            size: A function that returns the number of documents and tokens (tuple) for the arguments of the call. It
+                is called after the call, so the size of the result of a loading method is recorded. By default, the
+                corpus of the first argument (self) is counted.
+
+        Returns:
+            The decorator.
+        """
+        def decorator(function):
+            stage_name = name or function.__qualname__
+
+            @functools.wraps(function)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return function(*args, **kwargs)
+
+                with self.stage(stage_name) as record:
+                    result = function(*args, **kwargs)
+                    if size is not None and (args or kwargs):
+                        record["documents"], record["tokens"] = size(*args, **kwargs)
+                return result
+
+            return wrapper
+
+        return decorator
+
+    def save_report(self, path: str) -> None:
+        """
+        This method saves the records as run report. The stages are listed in the order in which they finished, i.e. a
+        nested stage precedes the stage that contains it. If the run is profiled, the cProfile statistics are saved as well
+        (see enable()).
+
+        Args:
+            path: The path and filename of the report. If it ends with .csv, a csv file with one row per stage is
+                written, otherwise a json file.
+        """
+        if path.endswith(".csv"):
+            columns = list(dict.fromkeys(column for record in self.records for column in record))
+            with open(path, mode='w', newline='', encoding='utf-8') as file:
+                writer = csv.DictWriter(file, fieldnames=columns)
+                writer.writeheader()
+                writer.writerows(self.records)
+        else:
+            with open(path, 'w', encoding='utf-8') as json_file:
+                json.dump({"created": datetime.now().isoformat(timespec='seconds'), "stages": self.records},
+                          json_file, indent=2, ensure_ascii=False)
+
+        print(f"The run report has been saved to '{path}'")
+
+        if self.profiler is not None:
+            self.profiler.disable()
+            self.profiler.dump_stats(self.profile_path)
+            self.profiler.enable()
+            print(f"The profile has been saved to '{self.profile_path}'")
+
+
+# The instrumentation of the pipeline. It is shared by all instrumented classes and functions.
+instrumentation = Instrumentation()
@@ -3,11 +3,43 @@ import os
 import logging
 from gensim.corpora import MmCorpus
 from corpus_manager import CorpusManager
+from coherence_index import CoherenceIndex
+from instrumentation import instrumentation
+from vocabulary import Vocabulary
 from gensim import corpora
 from gensim.models import LdaModel, CoherenceModel
 import pyLDAvis.gensim_models as gensimvis
 import pyLDAvis
 import statistics
+import numpy as np
+from scipy.optimize import linear_sum_assignment
+import multiprocessing
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+
+# The parameters of all LDA models besides the number of topics.
+LDA_PARAMETERS = {
+    "iterations": 300,  # Check if documents converge with the given parameters.
+    "passes": 30,  # Check if documents converge with the given parameters.
+    "chunksize": 64,  # Choose chunksize according to the available memory and corpus size. Chunksize has minor ramifications on the calculated distributions.
+    "alpha": 'asymmetric',  # Topic Distribution per document
+    "eta": 'auto',  # Automatic distribution of terms per topic
+    "eval_every": 1,  # Evaluation after every iteration
+    "random_state": 42
+}
+
+
+def dictionary_size(*args, **kwargs) -> tuple:
+    """
+    Counts the documents and tokens of the bag-of-words model of an instrumented function (see instrumentation), whose
+    dictionary is the first positional or keyword argument of type corpora.Dictionary. If there is no dictionary, the
+    size is unknown (None, None).
+    """
+    dictionary = next((arg for arg in (*args, *kwargs.values()) if isinstance(arg, corpora.Dictionary)), None)
+    if dictionary is None:
+        return None, None
+    return dictionary.num_docs, dictionary.num_pos
 
 def visualize_model(lda_model: LdaModel, bag_of_words_model: list, dictionary: corpora.dictionary, filename: str) -> None:
     """
@@ -27,6 +59,299 @@ def visualize_model(lda_model: LdaModel, bag_of_words_model: list, dictionary: c
     pyLDAvis.save_html(vis_data, os.path.join('data_outputs/lda_visualisation', filename))
 
 
+def iter_bag_of_words(corpus_manager: CorpusManager, dictionary: corpora.Dictionary):
+    """
+    Converts the documents of a preprocessed corpus to bag-of-words vectors one at a time and adds their terms to the
+    dictionary, like dictionary.doc2bow(doc, allow_update=True). Documents that are encoded as arrays of term ids are
+    counted by their ids, so the terms are neither decoded nor hashed. The ids of the dictionary are assigned in the same
+    order for both representations, i.e. both result in the same dictionary.
+
+    Args:
+        corpus_manager (CorpusManager): The preprocessed corpus.
+        dictionary (corpora.Dictionary): The dictionary, which is updated in place.
+
+    Yields:
+        list: The bag-of-words vector of the next document.
+    """
+    id2term = corpus_manager.vocabulary.id2term
+    vocabulary_to_dictionary = {}
+
+    for doc_data in corpus_manager.corpus.values():
+        processed_text = doc_data['processed_text']
+
+        if not Vocabulary.is_encoded(processed_text):
+            yield dictionary.doc2bow(processed_text, allow_update=True)
+            continue
+
+        term_counts = Counter(processed_text)
+
+        # New terms are numbered in alphabetical order per document like corpora.Dictionary does.
+        for term_id in sorted((term_id for term_id in term_counts if term_id not in vocabulary_to_dictionary),
+                              key=lambda term_id: id2term[term_id]):
+            vocabulary_to_dictionary[term_id] = dictionary.token2id.setdefault(id2term[term_id],
+                                                                               len(dictionary.token2id))
+
+        bag_of_words = sorted((vocabulary_to_dictionary[term_id], count) for term_id, count in term_counts.items())
+
+        dictionary.num_docs += 1
+        dictionary.num_pos += len(processed_text)
+        dictionary.num_nnz += len(bag_of_words)
+        for dictionary_id, count in bag_of_words:
+            dictionary.cfs[dictionary_id] = dictionary.cfs.get(dictionary_id, 0) + count
+            dictionary.dfs[dictionary_id] = dictionary.dfs.get(dictionary_id, 0) + 1
+
+        yield bag_of_words
+
+
+@instrumentation.instrument()
+def build_bag_of_words(corpus_manager: CorpusManager) -> tuple:
+    """
+    Builds the dictionary and the bag-of-words model of a preprocessed corpus in memory.
+
+    Args:
+        corpus_manager (CorpusManager): The preprocessed corpus.
+
+    Returns:
+        tuple: The dictionary (corpora.Dictionary) and the bag-of-words model (list).
+    """
+    dictionary = corpora.Dictionary()
+    bow_corpus = list(iter_bag_of_words(corpus_manager, dictionary))
+
+    return dictionary, bow_corpus
+
+
+@instrumentation.instrument()
+def stream_bag_of_words(corpus_manager: CorpusManager, path: str) -> tuple:
+    """
+    Builds the dictionary and the bag-of-words model of a preprocessed corpus in a single pass and writes the
+    bag-of-words model to disk in Matrix Market format instead of keeping it in memory. The returned MmCorpus reads the
+    documents from the file whenever it is iterated, so the memory used for training does not grow with the corpus.
+
+    Args:
+        corpus_manager (CorpusManager): The preprocessed corpus.
+        path (str): The path and filename of the Matrix Market file (.mm).
+
+    Returns:
+        tuple: The dictionary (corpora.Dictionary) and the streamed bag-of-words model (MmCorpus).
+    """
+    dictionary = corpora.Dictionary()
+
+    # The number of terms is unknown until the last document has been written, so it is taken from the largest id.
+    MmCorpus.serialize(path, iter_bag_of_words(corpus_manager, dictionary), id2word=None)
+
+    return dictionary, MmCorpus(path)
+
+
+@instrumentation.instrument(size=dictionary_size)
+def train_model(k: int, bag_of_words_model: list, dictionary: corpora.Dictionary, processed_texts: list,
+                coherence_index: CoherenceIndex = None, **lda_parameters) -> tuple:
+    """
+    Trains an LDA model with k topics and calculates its semantic coherence with the coherence metric C_V of Röder et al.
+    (2015). If a coherence index of the texts is given, the coherence is calculated from its precomputed window counts
+    instead of scanning the texts again.
+
+    Args:
+        k (int): The number of topics.
+        bag_of_words_model (list or MmCorpus): The bag-of-words representation of the corpus.
+        dictionary (corpora.Dictionary): The dictionary used to create the bag-of-words model.
+        processed_texts (list): The tokenized documents. They are only needed if no coherence index is given.
+        coherence_index (CoherenceIndex): The sliding window index of processed_texts, or None.
+        **lda_parameters: Parameters of LdaModel that override LDA_PARAMETERS.
+
+    Returns:
+        tuple: The trained model (LdaModel) and its coherence (float).
+    """
+    model = LdaModel(corpus=bag_of_words_model, id2word=dictionary, num_topics=k,
+                     **{**LDA_PARAMETERS, **lda_parameters})
+
+    if coherence_index is not None:
+        return model, coherence_index.coherence(model)
+
+    # The coherence is computed once. It runs in the current process, which may already be a worker of a sweep.
+    coherence = CoherenceModel(model=model, texts=processed_texts, dictionary=dictionary, coherence='c_v',
+                               processes=1).get_coherence()
+
+    return model, coherence
+
+
+# The bag-of-words model, dictionary, texts and coherence index of the worker processes of sweep_topic_numbers(). They are passed once per
+# worker by the pool initializer (and inherited without pickling if the processes are forked), not once per task.
+_worker_data = {}
+
+
+def _init_worker(bag_of_words_model: list, dictionary: corpora.Dictionary, processed_texts: list,
+                 coherence_index: CoherenceIndex = None) -> None:
+    """
+    Initializer of the worker processes of sweep_topic_numbers().
+    """
+    _worker_data["bag_of_words_model"] = bag_of_words_model
+    _worker_data["dictionary"] = dictionary
+    _worker_data["processed_texts"] = processed_texts
+    _worker_data["coherence_index"] = coherence_index
+
+    # The records and the profile of a forked worker would be lost. Its resources are recorded by the stage of the sweep.
+    instrumentation.disable()
+
+
+def _train_model_in_worker(k: int, lda_parameters: dict) -> tuple:
+    """
+    Trains a model of sweep_topic_numbers() with the data of the worker process.
+    """
+    model, coherence = train_model(k, _worker_data["bag_of_words_model"], _worker_data["dictionary"],
+                                   _worker_data["processed_texts"], _worker_data["coherence_index"], **lda_parameters)
+    return k, model, coherence
+
+
+@instrumentation.instrument(size=dictionary_size)
+def sweep_topic_numbers(bag_of_words_model: list, dictionary: corpora.Dictionary, processed_texts: list, k_values,
+                        workers: int = None, coherence_index: CoherenceIndex = None, **lda_parameters) -> tuple:
+    """
+    Trains an LDA model for every given number of topics k in a process pool and calculates their coherence. Every model
+    is trained with the same random_state, hence the results are reproducible and do not depend on the number of workers.
+
+    Args:
+        bag_of_words_model (list or MmCorpus): The bag-of-words representation of the corpus.
+        dictionary (corpora.Dictionary): The dictionary used to create the bag-of-words model.
+        processed_texts (list): The tokenized documents. They are only needed if no coherence index is given.
+        k_values: The numbers of topics to evaluate.
+        workers (int): The number of worker processes. If None, all CPUs are used; if 1, the models are trained in the
+            current process.
+        coherence_index (CoherenceIndex): The sliding window index of processed_texts. It is built once and shared by
+            all models; if None, every model scans the texts with CoherenceModel.
+        **lda_parameters: Parameters of LdaModel that override LDA_PARAMETERS.
+
+    Returns:
+        tuple: The coherence map (dict k -> coherence) and the trained models (dict k -> LdaModel).
+    """
+    k_values = list(k_values)
+    coherence_map = {}
+    models = {}
+
+    if workers == 1:
+        results = ((k, *train_model(k, bag_of_words_model, dictionary, processed_texts, coherence_index,
+                                    **lda_parameters))
+                   for k in k_values)
+        for k, model, coherence in results:
+            coherence_map[k] = coherence
+            models[k] = model
+            print(f'coherence score C_v with {k} topics: {coherence}')
+        return coherence_map, models
+
+    # Forked workers inherit the data of the initializer without pickling it.
+    mp_context = multiprocessing.get_context("fork") if "fork" in multiprocessing.get_all_start_methods() else None
+
+    with ProcessPoolExecutor(max_workers=workers, mp_context=mp_context, initializer=_init_worker,
+                             initargs=(bag_of_words_model, dictionary, processed_texts, coherence_index)) as executor:
+        for k, model, coherence in executor.map(_train_model_in_worker, k_values, repeat(lda_parameters)):
+            coherence_map[k] = coherence
+            models[k] = model
+            print(f'coherence score C_v with {k} topics: {coherence}')
+
+    return coherence_map, models
+
+
+@instrumentation.instrument(size=dictionary_size)
+def select_topic_number(bag_of_words_model: list, dictionary: corpora.Dictionary, processed_texts: list,
+                        k_min: int = 15, k_max: int = 34, coarse_step: int = 4, tolerance: float = 0.002,
+                        patience: int = 3, refine: int = 2, coherence_map: dict = None, workers: int = None,
+                        coherence_index: CoherenceIndex = None, **lda_parameters) -> tuple:
+    """
+    Searches the number of topics k with the highest coherence without training a model for every k in [k_min, k_max].
+    First, a coarse grid with step coarse_step is evaluated in parallel. Afterward, the intervals around the refine best
+    k of the grid are narrowed by a golden-section search over the integers. The search of an interval stops early if the
+    best coherence did not improve by more than tolerance for patience consecutive models.
+    The coherence is not unimodal in k, hence the result is the best k of the refined neighbourhoods, i.e. a local
+    optimum. It can differ from the best k of a full sweep (see sweep_topic_numbers()) if the global optimum lies
+    outside the neighbourhoods; a larger refine or a smaller coarse_step reduces this risk.
+    Every model is trained and evaluated once; the coherence of every k is cached in coherence_map, which can be passed
+    again to continue a search without retraining.
+
+    Args:
+        bag_of_words_model (list or MmCorpus): The bag-of-words representation of the corpus.
+        dictionary (corpora.Dictionary): The dictionary used to create the bag-of-words model.
+        processed_texts (list): The tokenized documents. They are only needed if no coherence index is given.
+        k_min (int): The smallest number of topics.
+        k_max (int): The largest number of topics.
+        coarse_step (int): The step of the coarse grid.
+        tolerance (float): The minimal improvement of the coherence that resets the early stopping.
+        patience (int): The number of models without improvement after which the search of an interval stops.
+        refine (int): The number of best points of the coarse grid whose neighbourhoods are refined.
+        coherence_map (dict): The coherences of already evaluated k (k -> coherence). It is updated in place.
+        workers (int): The number of worker processes (see sweep_topic_numbers()).
+        coherence_index (CoherenceIndex): The sliding window index of processed_texts (see sweep_topic_numbers()).
+        **lda_parameters: Parameters of LdaModel that override LDA_PARAMETERS.
+
+    Returns:
+        tuple: The best k (int), the coherence map (dict k -> coherence) and the best model (LdaModel). If the best k
+            was taken from the passed coherence_map, its model is trained again.
+    """
+    coherence_map = {} if coherence_map is None else coherence_map
+    state = {"best_k": None, "best_model": None, "stale": 0}
+
+    def evaluate(k_values) -> None:
+        # Train only the models whose coherence is not cached.
+        k_values = [k for k in dict.fromkeys(k_values) if k_min <= k <= k_max and k not in coherence_map]
+        if not k_values:
+            return
+
+        new_coherences, models = sweep_topic_numbers(bag_of_words_model, dictionary, processed_texts, k_values,
+                                                     workers=workers, coherence_index=coherence_index,
+                                                     **lda_parameters)
+
+        for k in k_values:
+            best_k = state["best_k"]
+            if best_k is None or new_coherences[k] > coherence_map.get(best_k, float("-inf")):
+                improved = best_k is None or new_coherences[k] - coherence_map[best_k] > tolerance
+                state["best_k"] = k
+                state["best_model"] = models[k]
+                state["stale"] = 0 if improved else state["stale"] + 1
+            else:
+                state["stale"] += 1
+            coherence_map[k] = new_coherences[k]
+
+    if coherence_map:
+        state["best_k"] = max(coherence_map, key=coherence_map.get)
+
+    # coarse grid
+    grid = sorted(set(range(k_min, k_max + 1, coarse_step)) | {k_max})
+    evaluate(grid)
+
+    # golden-section search in the neighbourhoods of the best k of the grid
+    inverse_phi = (5 ** 0.5 - 1) / 2
+
+    for centre in sorted(grid, key=coherence_map.get, reverse=True)[:refine]:
+        lower = max(k_min, centre - coarse_step)
+        upper = min(k_max, centre + coarse_step)
+        state["stale"] = 0
+
+        while upper - lower > 2 and state["stale"] < patience:
+            left = int(round(upper - inverse_phi * (upper - lower)))
+            right = int(round(lower + inverse_phi * (upper - lower)))
+            if left == right:
+                right = left + 1
+
+            evaluate([left, right])
+
+            if coherence_map[left] >= coherence_map[right]:
+                upper = right
+            else:
+                lower = left
+
+        if state["stale"] < patience:
+            evaluate(range(lower, upper + 1))
+
+    best_k = max(coherence_map, key=coherence_map.get)
+    print(f"best number of topics: {best_k} (C_v {coherence_map[best_k]}) after {len(coherence_map)} models")
+
+    best_model = state["best_model"] if state["best_k"] == best_k else None
+    if best_model is None:
+        # The coherence of the best k was passed in coherence_map, but not its model.
+        best_model, _ = train_model(best_k, bag_of_words_model, dictionary, processed_texts, coherence_index,
+                                    **lda_parameters)
+
+    return best_k, coherence_map, best_model
+
+
 def save_model(lda_model: LdaModel, bag_of_words_model: list, dictionary: corpora.dictionary, filename: str) -> None:
     """
     Save the LDA model, bag of words model, and dictionary to disk.
@@ -45,12 +370,178 @@ def save_model(lda_model: LdaModel, bag_of_words_model: list, dictionary: corpor
     MmCorpus.serialize(os.path.join(f'data_outputs/models', f'bow_corpus_{filename}.mm'), bag_of_words_model)
 
 
+def load_model(filename: str) -> tuple:
+    """
+    Loads an LDA model and its dictionary that were saved with save_model().
+
+    Args:
+        filename (str): The base filename that was used for saving the model and dictionary.
+
+    Returns:
+        tuple: The LDA model (LdaModel), the dictionary (corpora.Dictionary) and the bag-of-words model (MmCorpus).
+    """
+    dictionary = corpora.Dictionary.load(os.path.join('data_outputs/models', f'dictionary_{filename}.dict'))
+    lda_model = LdaModel.load(os.path.join('data_outputs/models', f'topic_model_{filename}.lda'))
+    lda_model.id2word = dictionary
+
+    return lda_model, dictionary, MmCorpus(os.path.join('data_outputs/models', f'bow_corpus_{filename}.mm'))
+
+
+def extend_dictionary(dictionary: corpora.Dictionary, processed_texts: list, no_below: int = 5,
+                      max_new_terms: int = 1000) -> tuple:
+    """
+    Adds the terms of new documents to an existing dictionary in a controlled way. The ids of the known terms do not
+    change. A new term is only added if it occurs in at least no_below of the new documents; at most max_new_terms terms
+    with the highest document frequency are added. All other unknown terms are dropped from the new documents. The
+    document and collection frequencies of the dictionary are updated like by dictionary.doc2bow(doc, allow_update=True).
+
+    Args:
+        dictionary (corpora.Dictionary): The dictionary of the model. It is extended in place.
+        processed_texts (list): The new tokenized documents.
+        no_below (int): The minimal document frequency of a new term in the new documents.
+        max_new_terms (int): The maximal number of new terms.
+
+    Returns:
+        tuple: The added terms (list) and the bag-of-words representation of the new documents (list).
+    """
+    document_frequencies = Counter(term for doc in processed_texts for term in set(doc)
+                                   if term not in dictionary.token2id)
+    candidates = sorted((term for term, frequency in document_frequencies.items() if frequency >= no_below),
+                        key=lambda term: (-document_frequencies[term], term))
+    new_terms = candidates[:max_new_terms]
+
+    for term in new_terms:
+        dictionary.token2id[term] = len(dictionary.token2id)
+
+    bag_of_words_model = []
+    for doc in processed_texts:
+        bag_of_words = dictionary.doc2bow(doc)
+        bag_of_words_model.append(bag_of_words)
+
+        dictionary.num_docs += 1
+        dictionary.num_pos += len(doc)
+        dictionary.num_nnz += len(bag_of_words)
+        for term_id, count in bag_of_words:
+            dictionary.cfs[term_id] = dictionary.cfs.get(term_id, 0) + count
+            dictionary.dfs[term_id] = dictionary.dfs.get(term_id, 0) + 1
+
+    return new_terms, bag_of_words_model
+
+
+def resize_model(lda_model: LdaModel, dictionary: corpora.Dictionary) -> None:
+    """
+    Resizes the topic-term statistics of a trained model to an extended dictionary, so the model can be updated with
+    documents that contain the new terms. The sufficient statistics of the new terms are zero and their prior eta is the
+    mean prior of the known terms. The topics of the known terms are not changed.
+
+    Args:
+        lda_model (LdaModel): The trained model. It is resized in place.
+        dictionary (corpora.Dictionary): The extended dictionary.
+    """
+    n_new_terms = len(dictionary) - lda_model.num_terms
+    lda_model.id2word = dictionary
+
+    if n_new_terms <= 0:
+        return
+
+    state = lda_model.state
+    state.sstats = np.hstack((state.sstats, np.zeros((lda_model.num_topics, n_new_terms), dtype=state.sstats.dtype)))
+
+    eta = lda_model.eta
+    if eta.ndim == 1:
+        eta = np.concatenate((eta, np.full(n_new_terms, eta.mean(), dtype=eta.dtype)))
+    else:
+        eta = np.hstack((eta, np.repeat(eta.mean(axis=1, keepdims=True), n_new_terms, axis=1)))
+    lda_model.eta = state.eta = eta
+
+    lda_model.num_terms = len(dictionary)
+    lda_model.sync_state()
+
+
+def update_model(lda_model: LdaModel, dictionary: corpora.Dictionary, processed_texts: list, no_below: int = 5,
+                 max_new_terms: int = 1000, **update_parameters) -> list:
+    """
+    Updates a trained model with new documents instead of training a new model on the whole corpus (warm start). The
+    dictionary is extended with extend_dictionary() and the model is resized accordingly. Afterward, the online
+    variational Bayes algorithm of LdaModel.update() runs only over the new documents, hence the duration depends on the
+    number of new documents and not on the size of the corpus.
+
+    Args:
+        lda_model (LdaModel): The trained model. It is updated in place.
+        dictionary (corpora.Dictionary): The dictionary of the model. It is extended in place.
+        processed_texts (list): The new tokenized documents.
+        no_below (int): The minimal document frequency of a new term in the new documents.
+        max_new_terms (int): The maximal number of new terms.
+        **update_parameters: Parameters of LdaModel.update(), e.g. passes or iterations. By default, the passes,
+            iterations and chunksize of LDA_PARAMETERS are used.
+
+    Returns:
+        list: The bag-of-words representation of the new documents.
+    """
+    new_terms, bag_of_words_model = extend_dictionary(dictionary, processed_texts, no_below=no_below,
+                                                      max_new_terms=max_new_terms)
+    resize_model(lda_model, dictionary)
+    print(f"{len(new_terms)} new terms were added to the dictionary ({len(dictionary)} terms).")
+
+    parameters = {key: LDA_PARAMETERS[key] for key in ("passes", "iterations", "chunksize")}
+    lda_model.update(bag_of_words_model, **{**parameters, **update_parameters})
+
+    return bag_of_words_model
+
+
+def topic_drift(reference_model: LdaModel, lda_model: LdaModel) -> dict:
+    """
+    Measures how far the topics of a model drifted from the topics of a reference model, e.g. the model before an
+    incremental update or a model that was retrained on the whole corpus. The topics of both models are aligned by their
+    terms, so the models may use different dictionaries. Every topic of the model is matched to a distinct topic of the
+    reference model, such that the sum of the Hellinger distances of the pairs is minimal.
+
+    Args:
+        reference_model (LdaModel): The reference model.
+        lda_model (LdaModel): The model that is compared with the reference model.
+
+    Returns:
+        dict: The matched topics (list of tuples (reference topic, topic, Hellinger distance)) and the mean and maximal
+            Hellinger distance of the pairs.
+    """
+    terms = sorted(set(reference_model.id2word.values()) | set(lda_model.id2word.values()))
+    term_index = {term: i for i, term in enumerate(terms)}
+
+    def aligned_topics(model: LdaModel) -> np.ndarray:
+        topics = np.zeros((model.num_topics, len(terms)))
+        topics[:, [term_index[model.id2word[term_id]] for term_id in range(model.num_terms)]] = model.get_topics()
+        return np.sqrt(topics)
+
+    reference_topics = aligned_topics(reference_model)
+    topics = aligned_topics(lda_model)
+
+    # The Hellinger distance of all pairs of topics: sqrt(1 - sum(sqrt(p) * sqrt(q))) for normalized distributions.
+    distances = np.sqrt(np.clip(1 - reference_topics @ topics.T, 0, 1))
+    reference_ids, topic_ids = linear_sum_assignment(distances)
+    pairs = [(int(i), int(j), float(distances[i, j])) for i, j in zip(reference_ids, topic_ids)]
+
+    return {
+        "pairs": pairs,
+        "mean_distance": float(np.mean([distance for _, _, distance in pairs])),
+        "max_distance": float(np.max([distance for _, _, distance in pairs]))
+    }
+
+
 if __name__ == "__main__":
 
     # Enable logging to track conversion time to monitor if the parameters iterations and passes are sufficiently high.
     logging.basicConfig(format='%(asctime)s : %(levelname)s : %(message)s', level=logging.INFO)
 
-    corpus_dateninstitut = CorpusManager(name="dateninstitut", filename="dateninstitut_full_final.json", from_xml=False)
+    # Record the resources of every stage of the run and profile it.
+    instrumentation.enable(profile_path="data_outputs/lda_run.prof")
+
+    # Prefer the binary columnar corpus and load only the fields needed for the topic modeling.
+    if os.path.isdir(os.path.join("data/processed", "dateninstitut_full_final")):
+        corpus_dateninstitut = CorpusManager(name="dateninstitut", filename="dateninstitut_full_final", from_binary=True,
+                                             columns=["processed_text", "relevance_dateninstitut"])
+    else:
+        corpus_dateninstitut = CorpusManager(name="dateninstitut", filename="dateninstitut_full_final.json",
+                                             from_xml=False)
 
     relevance = []
     for doc in corpus_dateninstitut.corpus.values():
@@ -70,84 +561,28 @@ if __name__ == "__main__":
     print(
         f"Das vorverarbeitete Korpus umfasst {len(list(corpus_dateninstitut.corpus.keys()))} Dokumente mit durchschnittlich {sum(doc_lengths) / len(doc_lengths)} Token.")
 
-    processed_texts = []
-    document_dates = []
+    # The bag-of-words model is streamed to disk and read from there during the training.
+    dictionary, bow_corpus = stream_bag_of_words(corpus_dateninstitut,
+                                                 os.path.join('data_outputs/models', 'bow_corpus_dateninstitut.mm'))
 
-    for doc_id, doc_data in corpus_dateninstitut.corpus.items():
-        processed_texts.append(doc_data['processed_text'])
+    # The sliding window counts for the coherence are computed once and shared by all models of the search. The tokenized
+    # documents are streamed into the index instead of being collected in a list.
+    with instrumentation.stage("CoherenceIndex.from_texts", documents=dictionary.num_docs,
+                               tokens=dictionary.num_pos):
+        coherence_index = CoherenceIndex.from_texts((corpus_dateninstitut.get_tokens(doc_id)
+                                                     for doc_id in corpus_dateninstitut.corpus), dictionary)
+    coherence_index.save(os.path.join('data_outputs/models', 'coherence_index.npz'))
 
-    dictionary = corpora.Dictionary(processed_texts)
-    bow_corpus = [dictionary.doc2bow(doc) for doc in processed_texts]
+    # We search the number of topics in the interval [15, 34] with a coarse grid that is refined adaptively.
+    max_coherence_k, coherence_map, most_coherent_model = select_topic_number(bow_corpus, dictionary, None,
+                                                                              k_min=15, k_max=34,
+                                                                              coherence_index=coherence_index)
 
-    coherence_map = {}
-    my_models = {}
-    # We implement the interval of k as for loop.
-    for k in range(15, 35):
-        model = LdaModel(
-            corpus=bow_corpus,
-            id2word=dictionary,
-            num_topics=k,
-            iterations=300,  # Check if documents converge with the given parameters.
-            passes=30,  # Check if documents converge with the given parameters.
-            chunksize=64,  # Choose chunksize according to the available memory and corpus size. Chunksize has minor ramifications on the calculated distributions.
-            alpha='asymmetric',  # Topic Distribution per document
-            eta='auto',  # Automatic distribution of terms per topic
-            eval_every=1,  # Evaluation after every iteration
-            random_state=42
-        )
-
-        # We calculate the semantic coherence of the topic model with k topics with the coherence metric C_V of Röder et al. (2015).
-        coherence_model = CoherenceModel(model=model, texts=processed_texts, dictionary=dictionary,
-                                         coherence='c_v')
-
-        my_models[coherence_model.get_coherence()] = model  # collisions are unlikely.
-
-        # We save the coherence for every given k.
-        coherence_map[k] = coherence_model.get_coherence()
-        print(f'coherence score C_v with {k} topics: {coherence_model.get_coherence()}')
-
-    with open("data_outputs/coherence_map_big_I", "w", encoding="utf-8") as f:
-        json.dump(coherence_map, f, indent=2, ensure_ascii=False)
-
-    # determine the best model of the first run
-    max_coherence_k = my_models[max(my_models.keys())].num_topics
-
-    coherence_map = {}
-    my_models = {}
-
-    # narrow the interval using the data from the first run
-    for k in range(max_coherence_k - 3, max_coherence_k + 3):
-        # we use the same parameters besides k
-        model = LdaModel(
-            corpus=bow_corpus,
-            id2word=dictionary,
-            num_topics=k,
-            iterations=300,
-            passes=30,
-            chunksize=64,
-            alpha='asymmetric',
-            eta='auto',
-            eval_every=1,
-            random_state=42
-        )
-
-        # We calculate the semantic coherence of the topic model with k topics with the coherence metric C_V of Röder et al. (2015).
-        coherence_model = CoherenceModel(model=model, texts=processed_texts, dictionary=dictionary,
-                                         coherence='c_v')
-
-        my_models[coherence_model.get_coherence()] = model  # collisions are unlikely.
-
-        # We save the coherence for every given k.
-        coherence_map[k] = coherence_model.get_coherence()
-        print(f'coherence score C_v with {k} topics: {coherence_model.get_coherence()}')
-
-    with open("data_outputs/coherence_map_big_II", "w", encoding="utf-8") as f:
+    with open("data_outputs/coherence_map_adaptive", "w", encoding="utf-8") as f:
         json.dump(coherence_map, f, indent=2, ensure_ascii=False)
 
     # determine the best performing model
-    max_coherence = max(my_models.keys())
-
-    most_coherent_model = my_models[max_coherence]
+    max_coherence = coherence_map[max_coherence_k]
 
     # save the best performing model
     save_model(most_coherent_model, bow_corpus, dictionary,
@@ -156,3 +591,5 @@ if __name__ == "__main__":
     # visualize the best performing model and save the figure as html document
     visualize_model(most_coherent_model, bow_corpus, dictionary,
                     filename=f"k{most_coherent_model.num_topics}_c_v_{max_coherence}.html")
+
+    instrumentation.save_report("data_outputs/lda_run_report.json")
@@ -0,0 +1,80 @@
+"""
+Incremental update of a saved LDA model with newly ingested documents.
+
+Instead of running lda.py again on the whole corpus, the model that was saved by lda.save_model() is loaded, its
+dictionary is extended with the frequent terms of the new documents and the model is updated with online passes over the
+new documents only. The drift of the topics during the update is reported. Optionally, a model with the same number of
+topics is retrained on the whole corpus to measure how far the updated topics are from a full retrain. The new documents
+have to be preprocessed like the corpus of the model (see corpus_preprocessor.py). The script has to be run from the root
+directory of the project:
+
+    python lda_update.py k20_c_v_0.55 dateninstitut_new_final.json --retrain
+"""
+import argparse
+import copy
+import logging
+import time
+from datetime import date
+from itertools import chain
+from gensim.corpora import MmCorpus
+from gensim.models import LdaModel
+from corpus_manager import CorpusManager
+from lda import LDA_PARAMETERS, load_model, save_model, topic_drift, update_model
+
+
+def print_drift(drift: dict, description: str) -> None:
+    """
+    Prints the result of lda.topic_drift().
+
+    Args:
+        drift: The topic drift.
+        description: The description of the compared models.
+    """
+    print(f"topic drift {description}: mean Hellinger distance {drift['mean_distance']:.4f}, "
+          f"max {drift['max_distance']:.4f}")
+    for reference_topic, topic, distance in drift["pairs"]:
+        print(f"    topic {topic:3d} <-> {reference_topic:3d}: {distance:.4f}")
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("model", help="the base filename of the model in data_outputs/models")
+    parser.add_argument("corpus", help="the preprocessed JSON corpus of the new documents in data/processed")
+    parser.add_argument("--no-below", type=int, default=5,
+                        help="the minimal number of new documents that contain a new term")
+    parser.add_argument("--max-new-terms", type=int, default=1000)
+    parser.add_argument("--retrain", action="store_true",
+                        help="retrain a model on the whole corpus and compare it with the updated model")
+    args = parser.parse_args()
+
+    logging.basicConfig(format='%(asctime)s : %(levelname)s : %(message)s', level=logging.INFO)
+
+    lda_model, dictionary, bow_corpus = load_model(args.model)
+    previous_model = copy.deepcopy(lda_model)
+
+    new_documents = CorpusManager(name="dateninstitut", filename=args.corpus, from_xml=False)
+    processed_texts = [new_documents.get_tokens(doc_id) for doc_id in new_documents.corpus]
+    print(f"{len(processed_texts)} new documents, {len(bow_corpus)} documents in the model")
+
+    start = time.perf_counter()
+    new_bow_corpus = update_model(lda_model, dictionary, processed_texts, no_below=args.no_below,
+                                  max_new_terms=args.max_new_terms)
+    print(f"incremental update: {time.perf_counter() - start:.1f}s")
+
+    print_drift(topic_drift(previous_model, lda_model), "of the update")
+
+    filename = f"{args.model}_update_{date.today().isoformat()}"
+
+    # The bag-of-words model of the whole corpus is streamed to disk, so the next update can retrain from it as well.
+    save_model(lda_model, chain(bow_corpus, new_bow_corpus), dictionary, filename=filename)
+
+    if args.retrain:
+        full_bow_corpus = MmCorpus(f"data_outputs/models/bow_corpus_{filename}.mm")
+
+        start = time.perf_counter()
+        retrained_model = LdaModel(corpus=full_bow_corpus, id2word=dictionary, num_topics=lda_model.num_topics,
+                                   **LDA_PARAMETERS)
+        print(f"full retrain: {time.perf_counter() - start:.1f}s")
+
+        print_drift(topic_drift(retrained_model, lda_model), "compared to a full retrain")
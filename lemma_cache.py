@@ -0,0 +1,142 @@
+import hashlib
+import os
+import sqlite3
+import time
+
+
+class LemmaCache:
+    """
+    This class provides a persistent, content addressed cache for lemmatized documents. The cache is stored as SQLite
+    database. Every entry is addressed by a hash of the document text, the name and version of the language model and
+    the parameters of the lemmatization. Unchanged documents can therefore skip the lemmatization when a corpus is
+    preprocessed again.
+    The size of the cache is bounded by max_bytes. If the stored lemmas exceed this size, the least recently used
+    entries are evicted.
+    """
+
+    def __init__(self, path: str = "data/processed/lemma_cache.sqlite", max_bytes: int = 2 * 1024 ** 3):
+        """
+        The constructor of the class LemmaCache.
+
+        Args:
+            path: The path and filename of the SQLite database.
+            max_bytes: The maximal size of the stored lemmas in bytes.
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        self.connection = sqlite3.connect(path)
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS lemmas ("
+            "key TEXT PRIMARY KEY, "
+            "lemmas TEXT NOT NULL, "
+            "size INTEGER NOT NULL, "
+            "last_access INTEGER NOT NULL)"
+        )
+        self.connection.execute("CREATE INDEX IF NOT EXISTS lemmas_last_access ON lemmas (last_access)")
+        self.connection.commit()
+
+    @staticmethod
+    def make_key(text: str, *parameters) -> str:
+        """
+        Static helper method to calculate the address of a document in the cache.
+
+        Args:
+            text: The text of the document.
+            *parameters: All parameters which influence the lemmatization, e.g. the name and version of the model.
+
+        Returns:
+            The sha256 hash of the text and the parameters as hex string.
+        """
+        sha = hashlib.sha256()
+        for parameter in parameters:
+            sha.update(str(parameter).encode("utf-8"))
+            sha.update(b"\0")
+        sha.update(text.encode("utf-8"))
+        return sha.hexdigest()
+
+    def get(self, key: str) -> str or None:
+        """
+        This method looks up the lemmatized document for a given key and updates the hit and miss statistics.
+
+        Args:
+            key: The key calculated with make_key().
+
+        Returns:
+            The lemmatized document or None, if the key is not cached.
+        """
+        row = self.connection.execute("SELECT lemmas FROM lemmas WHERE key = ?", (key,)).fetchone()
+
+        if row is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self.connection.execute("UPDATE lemmas SET last_access = ? WHERE key = ?", (time.time_ns(), key))
+        return row[0]
+
+    def put(self, key: str, lemmas: str) -> None:
+        """
+        This method saves a lemmatized document in the cache. The changes are written to disk by commit().
+
+        Args:
+            key: The key calculated with make_key().
+            lemmas: The lemmatized document.
+        """
+        self.connection.execute(
+            "INSERT OR REPLACE INTO lemmas (key, lemmas, size, last_access) VALUES (?, ?, ?, ?)",
+            (key, lemmas, len(lemmas.encode("utf-8")), time.time_ns())
+        )
+
+    def commit(self) -> None:
+        """
+        This method evicts the least recently used entries, if the cache exceeds its maximal size, and writes all
+        changes to disk.
+        """
+        size = self.connection.execute("SELECT COALESCE(SUM(size), 0) FROM lemmas").fetchone()[0]
+
+        if size > self.max_bytes:
+            freed = 0
+            keys_to_delete = []
+            for key, entry_size in self.connection.execute("SELECT key, size FROM lemmas ORDER BY last_access"):
+                keys_to_delete.append((key,))
+                freed += entry_size
+                if size - freed <= self.max_bytes:
+                    break
+
+            self.connection.executemany("DELETE FROM lemmas WHERE key = ?", keys_to_delete)
+            self.evictions += len(keys_to_delete)
+
+        self.connection.commit()
+
+    def statistics(self) -> dict:
+        """
+        This method summarizes the usage of the cache.
+
+        Returns:
+            A dictionary with the hits, misses, hit rate, evictions, number of entries and size in bytes of the cache.
+        """
+        entries, size = self.connection.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM lemmas").fetchone()
+        lookups = self.hits + self.misses
+
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "entries": entries,
+            "bytes": size
+        }
+
+    def close(self) -> None:
+        """
+        This method writes all changes to disk and closes the database.
+        """
+        self.commit()
+        self.connection.close()
@@ -0,0 +1,114 @@
+import json
+from vocabulary import Vocabulary
+
+
+class MultiwordExpressionMatcher:
+    """
+    This class merges Multiword Expressions (MWE) in tokenized documents. All expressions are compiled into a trie, so
+    every token is only compared with the expressions that share its prefix instead of the whole list of expressions.
+    Expressions of any length are supported. If several expressions start at the same token, the longest one is merged
+    (greedy longest match).
+    """
+
+    # Marks the end of an expression in the trie. Tokens are never None.
+    _END = None
+
+    def __init__(self, expressions: dict):
+        """
+        The constructor of the class MultiwordExpressionMatcher.
+
+        Args:
+            expressions: A dictionary that maps the tokens of an expression (tuple) to the merged token.
+        """
+        self.expressions = {}
+        self.trie = {}
+        self.max_length = 0
+
+        for tokens, merged in expressions.items():
+            if len(tokens) < 2:
+                continue
+
+            self.expressions[tokens] = merged
+
+            node = self.trie
+            for token in tokens:
+                node = node.setdefault(token, {})
+            node[MultiwordExpressionMatcher._END] = merged
+
+            self.max_length = max(self.max_length, len(tokens))
+
+    @classmethod
+    def from_files(cls, mwe_path: str = 'data_preprocessing/MWE.json',
+                   mwe_reversed_path: str = 'data_preprocessing/MWE_reversed.json') -> 'MultiwordExpressionMatcher':
+        """
+        This method compiles the Multiword Expressions of the project. MWE.json contains the tokens of every expression,
+        MWE_reversed.json maps the string representation of the tokens to the merged token.
+
+        Args:
+            mwe_path: The path and filename of MWE.json.
+            mwe_reversed_path: The path and filename of MWE_reversed.json.
+
+        Returns:
+            The compiled matcher.
+        """
+        with open(mwe_path, 'r', encoding='utf-8') as json_file:
+            MWE = json.load(json_file)
+        with open(mwe_reversed_path, 'r', encoding='utf-8') as json_file:
+            MWE_reversed = json.load(json_file)
+
+        return cls({tuple(entry): MWE_reversed.get(str(entry), key) for key, entry in MWE.items()})
+
+    def encode(self, vocabulary: Vocabulary) -> 'MultiwordExpressionMatcher':
+        """
+        This method compiles the expressions for documents that are encoded as arrays of term ids. Expressions that
+        contain a term which is not part of the vocabulary cannot occur and are skipped. The merged tokens are added to
+        the vocabulary.
+
+        Args:
+            vocabulary: The vocabulary of the corpus.
+
+        Returns:
+            The matcher for encoded documents.
+        """
+        return MultiwordExpressionMatcher({
+            tuple(vocabulary.term2id[token] for token in tokens): vocabulary.add(merged)
+            for tokens, merged in self.expressions.items()
+            if all(token in vocabulary for token in tokens)
+        })
+
+    def merge(self, tokens) -> list:
+        """
+        This method replaces all Multiword Expressions in a tokenized document with the merged token.
+
+        Args:
+            tokens: The tokenized document.
+
+        Returns:
+            The tokenized document with merged Multiword Expressions.
+        """
+        trie = self.trie
+        end_marker = MultiwordExpressionMatcher._END
+        n_tokens = len(tokens)
+
+        new_doc = []
+        i = 0
+        while i < n_tokens:
+            node = trie.get(tokens[i])
+            match = None
+            match_end = i + 1
+            j = i + 1
+
+            # Walk along the trie as long as the following tokens continue an expression.
+            while node is not None:
+                if end_marker in node:
+                    match = node[end_marker]
+                    match_end = j
+                if j == n_tokens:
+                    break
+                node = node.get(tokens[j])
+                j += 1
+
+            new_doc.append(tokens[i] if match is None else match)
+            i = match_end
+
+        return new_doc
@@ -0,0 +1,285 @@
+import glob
+import hashlib
+import json
+import os
+import pickle
+import time
+import spacy
+from vocabulary import Vocabulary
+
+
+class PipelineStage:
+    """
+    This class describes a stage of the PreprocessingPipeline, i.e. a call of a method of CorpusPreprocessor.
+    """
+
+    def __init__(self, name: str, parameters: dict = None, options: dict = None, files: tuple = ()):
+        """
+        The constructor of the class PipelineStage.
+
+        Args:
+            name: The name of the CorpusPreprocessor method.
+            parameters: The arguments of the method which influence its result. They are part of the checkpoint key.
+            options: The arguments of the method which do not influence its result, e.g. the number of processes.
+            files: The files which are read by the method. Their content is part of the checkpoint key.
+        """
+        self.name = name
+        self.parameters = parameters or {}
+        self.options = options or {}
+        self.files = files
+
+
+class PreprocessingPipeline:
+    """
+    This class runs the preprocessing of a CorpusPreprocessor as a sequence of named stages and checkpoints the processed
+    texts after every stage. Each checkpoint is addressed by a key, which chains the key of the previous stage (starting
+    with a hash of the input texts) with the name and parameters of the stage and the content of the files it reads. A
+    run resumes after the last stage whose checkpoint matches its key, so an interrupted run does not start from scratch
+    and changing the parameters of a stage only repeats this stage and the following ones. For example, changing the
+    parameters of clean() does not repeat the lemmatization.
+    Documents that were lemmatized before a crash within the lemmatization stage are recovered by a LemmaCache.
+    Every checkpoint contains the processed texts of the whole corpus. Hence, only the most recent checkpoints of every
+    stage are kept and superseded ones are deleted when a new checkpoint of the stage is written.
+    """
+
+    def __init__(self, preprocessor, stages: list, checkpoint_dir: str = "data/processed/checkpoints",
+                 keep_checkpoints: int = 1):
+        """
+        The constructor of the class PreprocessingPipeline.
+
+        Args:
+            preprocessor: The CorpusPreprocessor object.
+            stages: The stages (list of PipelineStage) in the order of their execution.
+            checkpoint_dir: The directory of the checkpoints.
+            keep_checkpoints: The number of checkpoints that are kept per stage, e.g. 2 to switch between two parameter
+                sets without repeating stages. If None, no checkpoint is deleted.
+        """
+        self.preprocessor = preprocessor
+        self.stages = stages
+        self.checkpoint_dir = checkpoint_dir
+        self.keep_checkpoints = keep_checkpoints
+
+        os.makedirs(checkpoint_dir, exist_ok=True)
+
+    @staticmethod
+    def topic_modeling_stages(batch_size: int = None, n_process: int = 1, lemma_cache=None,
+                              encode: bool = False) -> list:
+        """
+        This method returns the stages of CorpusPreprocessor.prepare_for_topic_modeling().
+
+        Args:
+            batch_size: The number of documents which are lemmatized by spacy as one batch.
+            n_process: The number of processes used for the lemmatization.
+            lemma_cache: A LemmaCache for the lemmatized documents.
+            encode: If true, the tokenized documents are encoded as arrays of term ids.
+
+        Returns:
+            The list of stages.
+        """
+        return [
+            PipelineStage('pre_clean'),
+            PipelineStage('lemmatize', parameters={"remove_stopwords": True, "chunk_size": 100000},
+                          options={"batch_size": batch_size, "n_process": n_process, "lemma_cache": lemma_cache}),
+            PipelineStage('normalize'),
+            PipelineStage('tokenize', parameters={"encode": encode}),
+            PipelineStage('n_gram_inclusion',
+                          parameters={"mwe_path": 'data_preprocessing/MWE.json',
+                                      "mwe_reversed_path": 'data_preprocessing/MWE_reversed.json'},
+                          files=('data_preprocessing/MWE.json', 'data_preprocessing/MWE_reversed.json')),
+            PipelineStage('clean',
+                          parameters={"custom_stopwords": True, "remove_rare_terms": 3,
+                                      "stopwords_path": "data_preprocessing/stopwords_di_unfiltered.txt"},
+                          files=("data_preprocessing/stopwords_di_unfiltered.txt",))
+        ]
+
+    def input_key(self) -> str:
+        """
+        This method hashes the keys and processed texts of the corpus before the first stage.
+
+        Returns:
+            The sha256 hash as hex string.
+        """
+        sha = hashlib.sha256()
+        for key, doc_data in self.preprocessor.corpus.items():
+            sha.update(key.encode("utf-8"))
+            sha.update(b"\0")
+            sha.update(pickle.dumps(doc_data['processed_text'], protocol=4))
+        return sha.hexdigest()
+
+    def stage_keys(self) -> list:
+        """
+        This method calculates the checkpoint keys of all stages.
+
+        Returns:
+            The list of keys (sha256 hashes as hex strings) in the order of the stages.
+        """
+        keys = []
+        previous_key = self.input_key()
+
+        for stage in self.stages:
+            sha = hashlib.sha256(previous_key.encode("utf-8"))
+            sha.update(stage.name.encode("utf-8"))
+            sha.update(json.dumps(stage.parameters, sort_keys=True, default=str).encode("utf-8"))
+
+            for path in stage.files:
+                sha.update(PreprocessingPipeline._file_fingerprint(path).encode("utf-8"))
+
+            if stage.name == 'lemmatize':
+                sha.update(json.dumps(self._lemmatization_fingerprint()).encode("utf-8"))
+
+            previous_key = sha.hexdigest()
+            keys.append(previous_key)
+
+        return keys
+
+    @staticmethod
+    def _file_fingerprint(path: str) -> str:
+        """
+        A helper method that hashes the content of a file. Files that do not exist are identified by their path.
+        """
+        if not os.path.exists(path):
+            return f"missing:{path}"
+
+        sha = hashlib.sha256()
+        with open(path, 'rb') as file:
+            for block in iter(lambda: file.read(1 << 20), b""):
+                sha.update(block)
+        return sha.hexdigest()
+
+    def _lemmatization_fingerprint(self) -> list:
+        """
+        A helper method that identifies the spacy model and the stop word list of the lemmatization without loading the
+        model, if it was not loaded yet.
+        """
+        preprocessor_class = type(self.preprocessor)
+        model = preprocessor_class.german_model
+
+        if model is not None:
+            model_name = f"{model.meta.get('lang')}_{model.meta.get('name')}"
+            model_version = model.meta.get('version')
+        else:
+            model_name = preprocessor_class.german_model_name
+            try:
+                model_version = spacy.util.get_package_version(model_name)
+            except Exception:
+                model_version = None
+
+        return [model_name, model_version, sorted(preprocessor_class.german_stop_words)]
+
+    def checkpoint_path(self, index: int, key: str) -> str:
+        """
+        This method returns the path of the checkpoint of a stage.
+
+        Args:
+            index: The position of the stage.
+            key: The checkpoint key of the stage.
+
+        Returns:
+            The path and filename of the checkpoint.
+        """
+        return os.path.join(self.checkpoint_dir, f"{index:02d}_{self.stages[index].name}_{key[:16]}.pkl")
+
+    def save_checkpoint(self, index: int, key: str) -> None:
+        """
+        This method saves the processed texts and the vocabulary after a stage. The checkpoint is written to a temporary
+        file first, so an interrupted write does not leave an invalid checkpoint. Afterward, superseded checkpoints of
+        the stage are deleted (see prune_checkpoints()).
+
+        Args:
+            index: The position of the stage.
+            key: The checkpoint key of the stage.
+        """
+        checkpoint = {
+            "key": key,
+            "processed_texts": {doc: doc_data['processed_text'] for doc, doc_data in self.preprocessor.corpus.items()},
+            "vocabulary": self.preprocessor.vocabulary.id2term
+        }
+
+        path = self.checkpoint_path(index, key)
+        with open(path + ".tmp", 'wb') as file:
+            pickle.dump(checkpoint, file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(path + ".tmp", path)
+
+        if self.keep_checkpoints is not None:
+            self.prune_checkpoints(index, self.keep_checkpoints)
+
+    def prune_checkpoints(self, index: int, keep: int = 1) -> list:
+        """
+        This method deletes the oldest checkpoints of a stage, e.g. the checkpoints of previous parameters or input
+        texts, and leftover temporary files of interrupted writes.
+
+        Args:
+            index: The position of the stage.
+            keep: The number of most recent checkpoints that are kept.
+
+        Returns:
+            The list of deleted files.
+        """
+        pattern = os.path.join(glob.escape(self.checkpoint_dir), f"{index:02d}_{glob.escape(self.stages[index].name)}_*")
+        checkpoints = sorted(glob.glob(pattern + ".pkl"), key=os.path.getmtime, reverse=True)
+        superseded = checkpoints[max(keep, 0):] + glob.glob(pattern + ".pkl.tmp")
+
+        for path in superseded:
+            os.remove(path)
+
+        return superseded
+
+    def load_checkpoint(self, index: int, key: str) -> bool:
+        """
+        This method restores the processed texts and the vocabulary from the checkpoint of a stage.
+
+        Args:
+            index: The position of the stage.
+            key: The checkpoint key of the stage.
+
+        Returns:
+            True, if a valid checkpoint was loaded.
+        """
+        path = self.checkpoint_path(index, key)
+        if not os.path.exists(path):
+            return False
+
+        try:
+            with open(path, 'rb') as file:
+                checkpoint = pickle.load(file)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            return False
+
+        corpus = self.preprocessor.corpus
+        if checkpoint.get("key") != key or checkpoint["processed_texts"].keys() != corpus.keys():
+            return False
+
+        for doc, processed_text in checkpoint["processed_texts"].items():
+            corpus[doc]['processed_text'] = processed_text
+
+        # The vocabulary is shared with the CorpusManager, so it is restored in place.
+        vocabulary = self.preprocessor.vocabulary
+        restored = Vocabulary(checkpoint["vocabulary"])
+        vocabulary.id2term = restored.id2term
+        vocabulary.term2id = restored.term2id
+
+        return True
+
+    def run(self) -> None:
+        """
+        This method runs the pipeline. It resumes after the last stage with a valid checkpoint and saves a checkpoint
+        after every stage that is executed.
+        """
+        keys = self.stage_keys()
+
+        first_stage = 0
+        for index in reversed(range(len(self.stages))):
+            if self.load_checkpoint(index, keys[index]):
+                print(f"Resuming after stage '{self.stages[index].name}' from checkpoint "
+                      f"'{self.checkpoint_path(index, keys[index])}'.")
+                first_stage = index + 1
+                break
+
+        for index in range(first_stage, len(self.stages)):
+            stage = self.stages[index]
+
+            start = time.perf_counter()
+            getattr(self.preprocessor, stage.name)(**stage.parameters, **stage.options)
+            self.save_checkpoint(index, keys[index])
+
+            print(f"Stage '{stage.name}' finished in {time.perf_counter() - start:.2f}s.")
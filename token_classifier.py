@@ -0,0 +1,101 @@
+import functools
+import re
+import weakref
+import numpy as np
+from vocabulary import Vocabulary
+
+
+class TokenClassifier:
+    """
+    This class decides which terms are noise for CorpusPreprocessor.clean(), i.e. terms without alphabetic character
+    (punctuation, digits, numbers, ...), e-mail addresses and phone numbers. Every distinct term is classified only once:
+    The results are memoized per term and, for encoded corpora, as boolean mask over the term ids of a Vocabulary. Hence,
+    the cost of the classification depends on the size of the vocabulary instead of the number of tokens, and the mask can
+    be applied to the arrays of term ids of all documents at once.
+    The memo of the terms is a bounded LRU cache, since a classifier is shared by all preprocessors of a long-lived
+    process (e.g. the TopicInferenceService), which sees new terms with every batch.
+    """
+
+    # The maximal number of memoized terms.
+    MAX_MEMOIZED_TERMS = 1 << 18
+
+    # Tokens with these characters are e-mail addresses or phone numbers.
+    CONTACT_PATTERN = re.compile(r'[@+]')
+    # Matches every alphabetic character, but also a few numeric characters like '²', which are checked by isalpha().
+    LETTER_PATTERN = re.compile(r'[^\W\d_]')
+
+    def __init__(self, max_memoized_terms: int = MAX_MEMOIZED_TERMS):
+        """
+        The constructor of the class TokenClassifier.
+
+        Args:
+            max_memoized_terms: The maximal number of memoized terms. The least recently used terms are discarded first.
+        """
+        # The memoized is_noise() (term -> True, if the term is noise)
+        self._memoized_is_noise = functools.lru_cache(maxsize=max_memoized_terms)(TokenClassifier.is_noise)
+        # Vocabulary -> (the list id2term of the vocabulary, the noise mask of its first terms)
+        self._masks = weakref.WeakKeyDictionary()
+
+    @staticmethod
+    def is_noise(term: str) -> bool:
+        """
+        Static helper method to classify a single term without memoization. A term that contains no alphabetic character
+        is noise; this includes all terms that consist of punctuation marks and all digits.
+
+        Args:
+            term: The term.
+
+        Returns:
+            True, if the term is noise.
+        """
+        if TokenClassifier.CONTACT_PATTERN.search(term):
+            return True
+        return not any(match.group().isalpha() for match in TokenClassifier.LETTER_PATTERN.finditer(term))
+
+    def classify(self, term: str) -> bool:
+        """
+        This method classifies a term and memoizes the result.
+
+        Args:
+            term: The term.
+
+        Returns:
+            True, if the term is noise.
+        """
+        return self._memoized_is_noise(term)
+
+    def noise(self, terms) -> set:
+        """
+        This method selects the noise among distinct terms, e.g. the keys of a Counter of the corpus.
+
+        Args:
+            terms: An iterable of distinct terms.
+
+        Returns:
+            The set of terms that are noise.
+        """
+        return {term for term in terms if self.classify(term)}
+
+    def noise_mask(self, vocabulary: Vocabulary) -> np.ndarray:
+        """
+        This method classifies all terms of a vocabulary. The mask is cached per vocabulary; only terms that were added
+        since the last call are classified. If the terms of the vocabulary were replaced (e.g. by a checkpoint of the
+        PreprocessingPipeline), the mask is rebuilt from the memoized terms.
+
+        Args:
+            vocabulary: The vocabulary.
+
+        Returns:
+            A boolean array with one entry per term id, which is True for noise. It must not be modified.
+        """
+        id2term = vocabulary.id2term
+        cached = self._masks.get(vocabulary)
+        mask = cached[1] if cached is not None and cached[0] is id2term else np.zeros(0, dtype=bool)
+
+        if len(mask) < len(id2term):
+            new_terms = id2term[len(mask):]
+            mask = np.concatenate((mask, np.fromiter((self.classify(term) for term in new_terms), dtype=bool,
+                                                     count=len(new_terms))))
+            self._masks[vocabulary] = (id2term, mask)
+
+        return mask
@@ -0,0 +1,227 @@
+"""
+Batch topic inference with a saved LDA model.
+
+The model and dictionary saved by lda.save_model() are loaded once; the large arrays of the model are memory-mapped.
+Afterward, batches of documents are read from stdin as JSON lines and the topic distribution of every document is written
+to stdout as JSON line. A batch is either a list of documents or an object {"documents": [...]}. A document is an object
+with an optional "id" and either the raw "text", which is preprocessed with the pipeline of CorpusPreprocessor, or the
+already preprocessed "tokens". Invalid documents result in an object with their "id" and an "error" instead of the
+topics; malformed lines and failed batches result in a line {"error": ..., "line": ...}, and the service continues with
+the next line. The latency percentiles of the batches are written to stderr. The script has to be run from the root
+directory of the project:
+
+    python topic_inference.py k20_c_v_0.55 < batches.jsonl > topics.jsonl
+"""
+import argparse
+import json
+import sys
+import time
+from contextlib import redirect_stdout
+import numpy as np
+from gensim import corpora
+from gensim.models import LdaModel
+from corpus_manager import CorpusManager
+from corpus_preprocessor import CorpusPreprocessor
+from lemma_cache import LemmaCache
+from multiword_expressions import MultiwordExpressionMatcher
+
+
+class TopicInferenceService:
+    """
+    This class infers the topic distributions of new documents with a saved LDA model. The model, the dictionary, the
+    spacy model and the Multiword Expressions are loaded once and reused for every batch. The documents of a batch are
+    preprocessed together and their topic distributions are inferred with a single call of LdaModel.inference().
+    """
+
+    def __init__(self, filename: str, mmap: str = 'r', lemma_cache: LemmaCache = None,
+                 mwe_path: str = 'data_preprocessing/MWE.json',
+                 mwe_reversed_path: str = 'data_preprocessing/MWE_reversed.json',
+                 stopwords_path: str = "data_preprocessing/stopwords_di_unfiltered.txt"):
+        """
+        The constructor of the class TopicInferenceService.
+
+        Args:
+            filename: The base filename that was used for saving the model and dictionary with lda.save_model().
+            mmap: The mode for memory-mapping the arrays of the model (see LdaModel.load()), or None to load them into
+                memory.
+            lemma_cache: A LemmaCache for the lemmatized documents.
+            mwe_path: The path and filename of the Multiword Expressions.
+            mwe_reversed_path: The path and filename of the mapping from the Multiword Expressions to the merged tokens.
+            stopwords_path: The path and filename of the custom stop word list.
+        """
+        self.dictionary = corpora.Dictionary.load(f'data_outputs/models/dictionary_{filename}.dict')
+        self.model = LdaModel.load(f'data_outputs/models/topic_model_{filename}.lda', mmap=mmap)
+        self.model.id2word = self.dictionary
+
+        self.lemma_cache = lemma_cache
+        self.matcher = None
+        self.mwe_path = mwe_path
+        self.mwe_reversed_path = mwe_reversed_path
+        self.stopwords_path = stopwords_path
+
+        self.latencies = []
+
+    def preprocess(self, texts: list) -> list:
+        """
+        This method preprocesses raw texts like CorpusPreprocessor.prepare_for_topic_modeling(). Rare terms are not
+        removed, since their frequency in a batch says nothing about their frequency in the corpus of the model.
+
+        Args:
+            texts: The raw texts.
+
+        Returns:
+            The tokenized documents.
+        """
+        if self.matcher is None:
+            self.matcher = MultiwordExpressionMatcher.from_files(self.mwe_path, self.mwe_reversed_path)
+
+        corpus_manager = CorpusManager.from_documents("inference", {str(i): {'fulltext': text}
+                                                                    for i, text in enumerate(texts)})
+        preprocessor = CorpusPreprocessor(corpus_manager)
+
+        preprocessor.pre_clean()
+        preprocessor.lemmatize(lemma_cache=self.lemma_cache)
+        preprocessor.normalize()
+        preprocessor.tokenize()
+        preprocessor.n_gram_inclusion(matcher=self.matcher)
+        preprocessor.clean(custom_stopwords=True, remove_rare_terms=0, stopwords_path=self.stopwords_path)
+
+        return [corpus_manager.corpus[str(i)]['processed_text'] for i in range(len(texts))]
+
+    def infer(self, processed_texts: list) -> np.ndarray:
+        """
+        This method infers the topic distributions of tokenized documents. The variational parameters gamma of all
+        documents are estimated at once and normalized to probabilities.
+
+        Args:
+            processed_texts: The tokenized documents.
+
+        Returns:
+            A matrix with the topic distribution of every document (one row per document).
+        """
+        bag_of_words_model = [self.dictionary.doc2bow(tokens) for tokens in processed_texts]
+        gamma, _ = self.model.inference(bag_of_words_model)
+        return gamma / gamma.sum(axis=1, keepdims=True)
+
+    @staticmethod
+    def validate_document(document) -> str or None:
+        """
+        Static helper method for process_batch(). Checks that a document is a dictionary with either the raw "text" (a
+        string) or the "tokens" (a list of strings).
+
+        Args:
+            document: The document.
+
+        Returns:
+            The error message or None, if the document is valid.
+        """
+        if not isinstance(document, dict):
+            return "A document has to be an object."
+        if 'tokens' in document:
+            tokens = document['tokens']
+            if not isinstance(tokens, list) or not all(isinstance(token, str) for token in tokens):
+                return "'tokens' has to be a list of strings."
+            return None
+        if not isinstance(document.get('text'), str):
+            return "A document needs either 'text' (string) or 'tokens' (list of strings)."
+        return None
+
+    def process_batch(self, documents: list) -> list:
+        """
+        This method preprocesses the raw texts of a batch, infers the topic distributions of all documents and records
+        the latency of the batch. Invalid documents (see validate_document()) are skipped and reported in the results.
+
+        Args:
+            documents: The documents, i.e. dictionaries with an optional "id" and either "text" or "tokens".
+
+        Returns:
+            The results, i.e. dictionaries with the "id" and the "topics" (list of probabilities) of every valid document
+            and with the "id" and the "error" of every invalid document.
+        """
+        start = time.perf_counter()
+
+        errors = [TopicInferenceService.validate_document(document) for document in documents]
+        valid = [i for i, error in enumerate(errors) if error is None]
+
+        processed_texts = {i: documents[i].get('tokens') for i in valid}
+        raw = [i for i in valid if 'tokens' not in documents[i]]
+
+        if raw:
+            for i, tokens in zip(raw, self.preprocess([documents[i]['text'] for i in raw])):
+                processed_texts[i] = tokens
+
+        topics = dict(zip(valid, self.infer([processed_texts[i] for i in valid]))) if valid else {}
+
+        results = []
+        for i, document in enumerate(documents):
+            document_id = document.get('id', i) if isinstance(document, dict) else i
+            if errors[i] is None:
+                results.append({"id": document_id, "topics": topics[i].tolist()})
+            else:
+                results.append({"id": document_id, "error": errors[i]})
+
+        self.latencies.append(time.perf_counter() - start)
+
+        return results
+
+    def latency_percentiles(self, percentiles: tuple = (50, 90, 99)) -> dict:
+        """
+        This method summarizes the latencies of all processed batches.
+
+        Args:
+            percentiles: The percentiles.
+
+        Returns:
+            A dictionary with the number of batches and the latency percentiles in milliseconds.
+        """
+        if not self.latencies:
+            return {"batches": 0}
+
+        values = np.percentile(np.array(self.latencies) * 1000, percentiles)
+        return {"batches": len(self.latencies), **{f"p{p}_ms": float(value) for p, value in zip(percentiles, values)}}
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("model", help="the base filename of the model in data_outputs/models")
+    parser.add_argument("--no-mmap", action="store_true", help="load the model into memory")
+    parser.add_argument("--lemma-cache", default=None, help="the path and filename of a lemma cache")
+    parser.add_argument("--report-every", type=int, default=100,
+                        help="the number of batches after which the latency percentiles are reported")
+    args = parser.parse_args()
+
+    lemma_cache = LemmaCache(args.lemma_cache) if args.lemma_cache else None
+    service = TopicInferenceService(args.model, mmap=None if args.no_mmap else 'r', lemma_cache=lemma_cache)
+
+    for line_number, line in enumerate(sys.stdin, start=1):
+        if not line.strip():
+            continue
+
+        # A malformed line or a failed batch must not stop the service, hence the error is reported as result.
+        try:
+            batch = json.loads(line)
+            documents = batch.get('documents') if isinstance(batch, dict) else batch
+            if not isinstance(documents, list):
+                raise ValueError("A batch has to be a list of documents or an object {\"documents\": [...]}.")
+
+            # stdout is reserved for the results, the progress messages of the preprocessing are written to stderr.
+            with redirect_stdout(sys.stderr):
+                results = service.process_batch(documents)
+
+        except Exception as e:
+            print(json.dumps({"error": f"{type(e).__name__}: {e}", "line": line_number}, ensure_ascii=False),
+                  flush=True)
+            print(f"line {line_number} failed: {type(e).__name__}: {e}", file=sys.stderr)
+            continue
+
+        print(json.dumps({"results": results, "latency_ms": service.latencies[-1] * 1000}, ensure_ascii=False),
+              flush=True)
+
+        if len(service.latencies) % args.report_every == 0:
+            print(f"latency: {service.latency_percentiles()}", file=sys.stderr)
+
+    print(f"latency: {service.latency_percentiles()}", file=sys.stderr)
+
+    if lemma_cache is not None:
+        lemma_cache.close()
@@ -0,0 +1,110 @@
+from array import array
+
+
+class Vocabulary:
+    """
+    This class interns the terms of a corpus. Every term is mapped to an integer id, so a tokenized document can be
+    stored as compact array of unsigned 32-bit integers (array('I') or a numpy uint32 array) instead of a list of
+    strings. A Vocabulary is shared by a CorpusManager and all CorpusPreprocessor and CorpusAnalyzer objects that work
+    on the same corpus.
+    """
+
+    def __init__(self, terms: list = None):
+        """
+        The constructor of the class Vocabulary.
+
+        Args:
+            terms: The terms of the vocabulary. The position of a term in the list is its id.
+        """
+        self.id2term = []
+        self.term2id = {}
+
+        for term in terms or []:
+            self.add(term)
+
+    def __len__(self) -> int:
+        return len(self.id2term)
+
+    def __contains__(self, term: str) -> bool:
+        return term in self.term2id
+
+    def add(self, term: str) -> int:
+        """
+        This method adds a term to the vocabulary, if it is not already part of it.
+
+        Args:
+            term: The term.
+
+        Returns:
+            The id of the term.
+        """
+        term_id = self.term2id.get(term)
+
+        if term_id is None:
+            term_id = len(self.id2term)
+            self.term2id[term] = term_id
+            self.id2term.append(term)
+
+        return term_id
+
+    def encode(self, tokens: list) -> array:
+        """
+        This method converts a tokenized document to an array of term ids. Unknown terms are added to the vocabulary.
+
+        Args:
+            tokens: The tokenized document.
+
+        Returns:
+            The document as array('I').
+        """
+        return array('I', [self.add(token) for token in tokens])
+
+    def decode(self, token_ids) -> list:
+        """
+        This method converts an array of term ids back to a tokenized document.
+
+        Args:
+            token_ids: The document as array of term ids.
+
+        Returns:
+            The tokenized document as list of strings.
+        """
+        id2term = self.id2term
+        return [id2term[token_id] for token_id in token_ids]
+
+    def ids(self, terms) -> set:
+        """
+        This method looks up the ids of the given terms. Terms which are not part of the vocabulary are ignored.
+
+        Args:
+            terms: An iterable of terms.
+
+        Returns:
+            The set of term ids.
+        """
+        return {self.term2id[term] for term in terms if term in self.term2id}
+
+    def term(self, token) -> str:
+        """
+        This method returns the term of a token regardless of its representation.
+
+        Args:
+            token: A term or a term id.
+
+        Returns:
+            The term.
+        """
+        return token if isinstance(token, str) else self.id2term[token]
+
+    @staticmethod
+    def is_encoded(tokens) -> bool:
+        """
+        Static helper method to check if a tokenized document is stored as array of term ids.
+
+        Args:
+            tokens: The tokenized document.
+
+        Returns:
+            True, if the document is an array('I') or a numpy array.
+        """
+        return isinstance(tokens, array) or hasattr(tokens, 'dtype')